@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark waktu muat peta: jalur lama (YAML + PGM + distance field) vs bundle (.mapb).
+
+    python3 bench_map_bundle.py                     # semua peta di folder maps paket
+    python3 bench_map_bundle.py peta1.yaml peta2.yaml
+    python3 bench_map_bundle.py --synthetic 4000    # peta sintetis 4000x4000 di folder sementara
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import yaml
+
+from map_bundle import MapBundle, build_bundle
+from map_tools import MapCatalog, OccupancyMap, load_pgm, save_map
+
+DEFAULT_MAPS_DIR = os.path.expanduser("~/catkin_ws/src/autonomus_mobile_robot/maps")
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def make_synthetic(maps_dir, size):
+    rng = np.random.default_rng(0)
+    grid = np.full((size, size), 254, dtype=np.uint8)
+    grid[:, :4] = grid[:, -4:] = grid[:4, :] = grid[-4:, :] = 0
+    for x in range(200, size, 300):
+        grid[:, x:x + 4] = 0
+        grid[100:140, x:x + 4] = 254
+    for _ in range(size // 10):
+        y, x = rng.integers(0, size - 20, 2)
+        grid[y:y + 12, x:x + 12] = 0
+    grid[: size // 8, : size // 8] = 205
+    save_map(os.path.join(maps_dir, 'synthetic'), grid, 0.05, (0.0, 0.0, 0.0))
+
+
+def load_legacy(entry):
+    with open(entry['yaml_path'], 'r') as f:
+        metadata = yaml.safe_load(f)
+    OccupancyMap(load_pgm(entry['image_path']), metadata)
+
+
+def load_bundle(path):
+    bundle = MapBundle(path)
+    analysis = bundle.occupancy_map()
+    analysis.safe.any()
+
+
+def display_legacy(entry):
+    np.ascontiguousarray(load_pgm(entry['display_path'], mmap=True)[::-1])
+
+
+def display_bundle(path):
+    bundle = MapBundle(path)
+    pixels = bundle.overlay if bundle.has('overlay') else bundle.display
+    np.ascontiguousarray(pixels[::-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('maps', nargs='*', help="file YAML peta")
+    parser.add_argument('--synthetic', type=int, metavar='SIZE', help="pakai peta sintetis SIZE x SIZE piksel")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix='mapb_bench_')
+    try:
+        if args.synthetic:
+            make_synthetic(tmp_dir, args.synthetic)
+            entries = [MapCatalog(tmp_dir, visual_maps=()).get('synthetic')]
+        else:
+            dirs = {}
+            for path in args.maps:
+                dirs.setdefault(os.path.dirname(os.path.abspath(path)), []).append(
+                    os.path.splitext(os.path.basename(path))[0])
+            if not dirs:
+                dirs[DEFAULT_MAPS_DIR] = None
+            entries = []
+            for maps_dir, names in dirs.items():
+                catalog = MapCatalog(maps_dir)
+                catalog.refresh(force=True)
+                entries.extend(catalog.get(name) for name in (names or catalog.names()))
+            entries = [e for e in entries if e and e['image_path']]
+
+        if not entries:
+            print("Tidak ada peta untuk di-benchmark.")
+            return
+
+        print(f"{'peta':<20} {'ukuran':>11} {'pgm KB':>8} {'mapb KB':>8} {'build s':>8} "
+              f"{'analisis lama':>14} {'analisis mapb':>14} {'tampilan lama':>14} {'tampilan mapb':>14}")
+        for entry in entries:
+            bundle_path = os.path.join(tmp_dir, f"{entry['name']}.mapb")
+            start = time.perf_counter()
+            build_bundle(bundle_path, entry)
+            build_time = time.perf_counter() - start
+
+            legacy = best_of(args.repeat, lambda: load_legacy(entry))
+            bundled = best_of(args.repeat, lambda: load_bundle(bundle_path))
+            legacy_display = best_of(args.repeat, lambda: display_legacy(entry))
+            bundled_display = best_of(args.repeat, lambda: display_bundle(bundle_path))
+
+            size = f"{entry['width']}x{entry['height']}"
+            pgm_kb = os.path.getsize(entry['image_path']) / 1024
+            mapb_kb = os.path.getsize(bundle_path) / 1024
+            print(f"{entry['name']:<20} {size:>11} {pgm_kb:>8.0f} {mapb_kb:>8.0f} {build_time:>8.2f} "
+                  f"{legacy * 1000:>11.1f} ms {bundled * 1000:>11.1f} ms "
+                  f"{legacy_display * 1000:>11.1f} ms {bundled_display * 1000:>11.1f} ms")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import shutil
+import time
+
+import numpy as np
+import yaml
+
+from map_tools import CACHE_DIR, load_pgm, occupancy_to_pgm, save_map
+
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, 'checkpoints')
+
+
+class MapCheckpointer(object):
+    """
+    Checkpoint berkala peta yang sedang dibuat: satu folder per nama peta berisi maksimal
+    `keep` pasangan ckpt_<waktu>.pgm/.yaml. Checkpoint baru ditulis jika sudah lewat `interval`
+    detik atau sudah `changed_cells` sel berubah, dan hanya jika isi peta (hash) berbeda.
+    Folder dihapus saat mapping selesai normal; folder yang tersisa saat aplikasi dibuka
+    berarti sesi sebelumnya terputus.
+    """
+    PREFIX = 'ckpt_'
+
+    def __init__(self, root_dir=CHECKPOINT_DIR, interval=60.0, changed_cells=5000, keep=3):
+        self.root_dir = root_dir
+        self.interval = interval
+        self.changed_cells = changed_cells
+        self.keep = keep
+        self.reset()
+
+    def reset(self):
+        self._last_grid = None
+        self._last_hash = None
+        self._last_time = time.monotonic()
+
+    def session_dir(self, map_name):
+        """Folder sesi map_name. ValueError jika nama bukan satu komponen path biasa (/, .., .x)."""
+        if (not map_name or map_name != os.path.basename(map_name) or map_name.startswith('.')
+                or (os.altsep and os.altsep in map_name)):
+            raise ValueError(f"Nama peta tidak valid: {map_name!r}")
+        return os.path.join(self.root_dir, map_name)
+
+    # --- Selama mapping ---
+    def changed_since_last(self, grid):
+        if self._last_grid is None or self._last_grid.shape != grid.shape:
+            return grid.size
+        return int(np.count_nonzero(grid != self._last_grid))
+
+    def maybe_checkpoint(self, map_name, grid, resolution, origin, force=False):
+        """Mengembalikan path YAML checkpoint baru, atau None jika belum perlu / isi sama."""
+        now = time.monotonic()
+        due = force or now - self._last_time >= self.interval or self.changed_since_last(grid) >= self.changed_cells
+        if not due: return None
+
+        digest = hashlib.blake2b(grid.tobytes(), digest_size=16)
+        digest.update(repr((grid.shape, resolution, tuple(origin))).encode('ascii'))
+        digest = digest.hexdigest()
+        self._last_time = now
+        if digest == self._last_hash: return None
+
+        session = self.session_dir(map_name)
+        os.makedirs(session, exist_ok=True)
+        stamp = time.time()
+        base = os.path.join(session, f"{self.PREFIX}{time.strftime('%Y%m%d-%H%M%S', time.localtime(stamp))}"
+                                     f"-{int(stamp * 1000) % 1000:03d}")
+        yaml_path = save_map(base, occupancy_to_pgm(grid), resolution, origin)
+        self._last_grid = grid.copy()
+        self._last_hash = digest
+        self._rotate(session)
+        return yaml_path
+
+    def _checkpoints(self, session):
+        try:
+            names = os.listdir(session)
+        except OSError:
+            return []
+        return sorted(os.path.join(session, n[:-5]) for n in names
+                      if n.startswith(self.PREFIX) and n.endswith('.yaml'))
+
+    def _rotate(self, session):
+        for base in self._checkpoints(session)[:-self.keep]:
+            for ext in ('.yaml', '.pgm'):
+                try:
+                    os.remove(base + ext)
+                except OSError:
+                    pass
+
+    # --- Pemulihan ---
+    def pending(self):
+        """[{'map_name', 'base', 'mtime', 'count'}] untuk sesi yang tidak selesai, terbaru dulu."""
+        sessions = []
+        try:
+            names = os.listdir(self.root_dir)
+        except OSError:
+            return sessions
+        for map_name in names:
+            if map_name.startswith('.'): continue
+            checkpoints = self._checkpoints(self.session_dir(map_name))
+            if not checkpoints: continue
+            newest = checkpoints[-1]
+            sessions.append({
+                'map_name': map_name,
+                'base': newest,
+                'mtime': os.path.getmtime(newest + '.yaml'),
+                'count': len(checkpoints),
+            })
+        sessions.sort(key=lambda s: s['mtime'], reverse=True)
+        return sessions
+
+    def restore(self, map_name, maps_dir):
+        """Menyalin checkpoint terbaru ke <maps_dir>/<map_name>.pgm/.yaml, lalu membuang sesinya."""
+        checkpoints = self._checkpoints(self.session_dir(map_name))
+        if not checkpoints: return None
+        newest = checkpoints[-1]
+        with open(newest + '.yaml', 'r') as f:
+            metadata = yaml.safe_load(f)
+        yaml_path = save_map(os.path.join(maps_dir, map_name), load_pgm(newest + '.pgm'),
+                             metadata['resolution'], metadata['origin'])
+        self.discard(map_name)
+        return yaml_path
+
+    def discard(self, map_name):
+        try:
+            session = self.session_dir(map_name)
+        except ValueError as e:
+            print(f"WARNING: Checkpoint tidak dihapus: {e}")
+            return
+        # Jangan pernah menghapus di luar root_dir (mis. folder sesi berupa symlink)
+        if os.path.dirname(os.path.realpath(session)) != os.path.realpath(self.root_dir):
+            print(f"WARNING: Checkpoint '{session}' di luar {self.root_dir}, tidak dihapus.")
+            return
+        shutil.rmtree(session, ignore_errors=True)
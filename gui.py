@@ -13,26 +13,288 @@ from kivy.lang import Builder
 from kivy.uix.screenmanager import Screen
 from kivy.uix.button import Button
 from kivy.uix.label import Label
+from kivy.uix.popup import Popup
+from kivy.uix.boxlayout import BoxLayout
 from kivy.clock import mainthread, Clock
 from functools import partial
 from kivy.uix.image import Image
 from kivy.uix.behaviors import TouchRippleBehavior, ButtonBehavior
-from kivy.properties import ObjectProperty, NumericProperty, BooleanProperty
+from kivy.properties import ObjectProperty, NumericProperty, BooleanProperty, ListProperty
 from kivy.core.window import Window
 from kivy.uix.widget import Widget 
 from kivy.core.audio import SoundLoader
-from kivy.graphics import Color, Line
+from kivy.graphics import Color, Line, InstructionGroup, Mesh, Point, Rectangle
+from kivy.graphics.texture import Texture
+from kivy.core.image import Image as CoreImage
 
 import yaml
 import math
 import os
 import subprocess
 import threading
+import time
+from collections import OrderedDict
+import numpy as np
 from manager import RosManager
+from map_tools import RobotTrail, MapTransform, MapTilePyramid, load_pgm, transform_points
+from mission import MissionCatalog, MissionRunner, Route
+
+class MapTextureEntry(object):
+    def __init__(self, texture, nbytes, size, pyramid=None):
+        self.texture = texture
+        self.nbytes = nbytes
+        self.size = size
+        self.pyramid = pyramid
+
+class MapTextureCache(object):
+    """
+    Cache LRU tekstur peta dengan key (path, mtime) dan batas memori.
+    Decode PGM dilakukan di thread latar; upload ke GPU tetap di main thread.
+    Peta besar dibuat piramida tile, yang di-upload hanya overview-nya.
+    """
+    TILED_THRESHOLD = 2048
+
+    def __init__(self, budget_bytes=256 * 1024 * 1024, loader=None):
+        self.budget_bytes = budget_bytes
+        # loader(path) -> piksel uint8 top-down (default: PGM di-memmap)
+        self.loader = loader or (lambda path: load_pgm(path, mmap=True))
+        self.used_bytes = 0
+        self._entries = OrderedDict()
+        self._callbacks = {}
+
+    def _key(self, path):
+        try:
+            return (path, os.path.getmtime(path))
+        except OSError:
+            return None
+
+    def request(self, path, callback=None):
+        """Memanggil callback(entry) di main thread begitu tekstur siap (langsung jika sudah di cache)."""
+        key = self._key(path)
+        if key is None: return
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            if callback: callback(self._entries[key])
+            return
+        pending = key in self._callbacks
+        self._callbacks.setdefault(key, [])
+        if callback: self._callbacks[key].append(callback)
+        if pending: return
+
+        if not path.endswith('.pgm'):
+            Clock.schedule_once(lambda dt: self._finish(key, None, None))
+            return
+        threading.Thread(target=self._decode_in_background, args=(key,), daemon=True).start()
+
+    def prefetch(self, path):
+        self.request(path)
+
+    def _decode_in_background(self, key):
+        pixels, pyramid = None, None
+        try:
+            pixels = self.loader(key[0])
+            if max(pixels.shape) > self.TILED_THRESHOLD:
+                pyramid = MapTilePyramid(pixels)
+                pixels = pyramid.overview
+            else:
+                pixels = np.ascontiguousarray(pixels[::-1])
+        except Exception as e:
+            print(f"WARNING: Decode peta '{key[0]}' gagal: {e}")
+        Clock.schedule_once(lambda dt: self._finish(key, pixels, pyramid))
+
+    def _finish(self, key, pixels, pyramid):
+        callbacks = self._callbacks.pop(key, [])
+        entry = self._entries.get(key)
+        if entry is None:
+            try:
+                entry = self._create_entry(key[0], pixels, pyramid)
+            except Exception as e:
+                print(f"ERROR: Gagal memuat tekstur peta '{key[0]}': {e}")
+                return
+            self._insert(key, entry)
+        for callback in callbacks:
+            callback(entry)
+
+    def _create_entry(self, path, pixels, pyramid):
+        if pixels is None:
+            texture = CoreImage(path).texture
+            return MapTextureEntry(texture, texture.width * texture.height * 4, tuple(texture.size))
+        if pyramid is not None:
+            # Overview masih top-down, balik untuk tekstur
+            pixels = np.ascontiguousarray(pixels[::-1])
+        height, width = pixels.shape
+        texture = Texture.create(size=(width, height), colorfmt='luminance')
+        texture.blit_buffer(pixels.tobytes(), colorfmt='luminance', bufferfmt='ubyte')
+        size = (pyramid.width, pyramid.height) if pyramid else (width, height)
+        return MapTextureEntry(texture, width * height, size, pyramid)
+
+    def _insert(self, key, entry):
+        while self._entries and self.used_bytes + entry.nbytes > self.budget_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.used_bytes -= old.nbytes
+        self._entries[key] = entry
+        self.used_bytes += entry.nbytes
+
+class TiledMapLayer(object):
+    """
+    Menggambar tile piramida yang terlihat saja, pada level detail sesuai zoom scatter.
+    Jumlah tekstur tile dibatasi (LRU) dan upload per frame dibatasi agar frame rate stabil.
+    """
+    MAX_TILE_TEXTURES = 48
+    MAX_UPLOADS_PER_FRAME = 4
+
+    def __init__(self, canvas, transform):
+        self.transform = transform
+        self.group = InstructionGroup()
+        canvas.add(self.group)
+        self.pyramid = None
+        self._tiles = OrderedDict()
+        self._last_view = None
+        self._trigger_more = Clock.create_trigger(self._upload_more, 0)
+
+    def set_pyramid(self, pyramid):
+        if pyramid is self.pyramid: return
+        self.pyramid = pyramid
+        self._tiles.clear()
+        self.group.clear()
+
+    def _upload_more(self, dt):
+        if self._last_view:
+            self.update(*self._last_view)
+
+    def _make_tile(self, key):
+        pixels, bounds = self.pyramid.tile(*key)
+        height, width = pixels.shape
+        texture = Texture.create(size=(width, height), colorfmt='luminance')
+        texture.blit_buffer(np.ascontiguousarray(pixels[::-1]).tobytes(), colorfmt='luminance', bufferfmt='ubyte')
+        if key[0] == 0:
+            texture.mag_filter = 'nearest'
+        return (Rectangle(texture=texture), bounds)
+
+    def update(self, view_rect, scatter_scale):
+        """view_rect: (x0, y0, x1, y1) area terlihat dalam koordinat widget peta."""
+        self.group.clear()
+        if not self.pyramid or not self.transform.valid or scatter_scale <= 0: return
+        self._last_view = (view_rect, scatter_scale)
+
+        level = self.pyramid.level_for(1.0 / (self.transform.scale * scatter_scale))
+        # Level terkasar sudah digambar Image sebagai overview
+        if level >= len(self.pyramid.levels) - 1: return
+
+        px0, py0 = self.transform.screen_to_pixel(view_rect[0], view_rect[1])
+        px1, py1 = self.transform.screen_to_pixel(view_rect[2], view_rect[3])
+        wanted = self.pyramid.tiles_in_rect(level, px0, py0, px1, py1)
+
+        self.group.add(Color(1, 1, 1, 1))
+        uploads = 0
+        for key in wanted:
+            tile = self._tiles.get(key)
+            if tile is None:
+                if uploads >= self.MAX_UPLOADS_PER_FRAME:
+                    self._trigger_more()
+                    continue
+                tile = self._make_tile(key)
+                self._tiles[key] = tile
+                uploads += 1
+            else:
+                self._tiles.move_to_end(key)
+            rect, (x0, y0, x1, y1) = tile
+            sx0, sy0 = self.transform.pixel_to_screen(x0, y0)
+            sx1, sy1 = self.transform.pixel_to_screen(x1, y1)
+            rect.pos = (sx0, sy0)
+            rect.size = (sx1 - sx0, sy1 - sy0)
+            self.group.add(rect)
+
+        wanted = set(wanted)
+        while len(self._tiles) > self.MAX_TILE_TEXTURES:
+            oldest = next(iter(self._tiles))
+            if oldest in wanted: break
+            self._tiles.pop(oldest)
+
+class AudioBank(object):
+    """
+    Bank klip audio: cue di-load sekali saat startup dan disimpan. SoundLoader tidak dijamin
+    thread-safe, jadi preload berjalan di main thread, satu klip per tick Clock agar UI tidak tersendat.
+    Batas bank dihitung dari ukuran PCM hasil decode (durasi x byte/detik), bukan ukuran file mp3.
+    Playback cukup lookup; file hilang dilaporkan sekali saja.
+    """
+    # PCM 16-bit stereo 44.1 kHz: perkiraan memori per detik klip yang sudah di-decode
+    DECODED_BYTES_PER_SECOND = 44100 * 2 * 2
+    # Jika provider belum tahu durasinya: mp3 ~ 1:10 terhadap PCM
+    COMPRESSION_RATIO = 10
+
+    def __init__(self, file_names, max_bytes=32 * 1024 * 1024):
+        self.file_names = list(OrderedDict.fromkeys(file_names))
+        self.max_bytes = max_bytes
+        self.loaded_bytes = 0
+        self.active_sound = None
+        self._clips = {}
+        self._missing = set()
+        self._queue = []
+
+    def preload(self, interval=0.05):
+        self._queue = [name for name in self.file_names if name not in self._clips]
+        Clock.schedule_interval(self._preload_next, interval)
+
+    def _preload_next(self, dt):
+        while self._queue:
+            file_name = self._queue.pop(0)
+            if self._preload_one(file_name): break
+        if self._queue: return True
+        print(f"INFO: {len(self._clips)} klip audio siap (~{self.loaded_bytes / 1024:.0f} KB PCM).")
+        return False
+
+    def _preload_one(self, file_name):
+        """True jika SoundLoader benar-benar dipanggil (pekerjaan satu tick)."""
+        if file_name in self._clips: return False
+        if not os.path.exists(file_name):
+            self._report_missing(file_name, "TIDAK DITEMUKAN")
+            return False
+        sound = SoundLoader.load(file_name)
+        if not sound:
+            self._report_missing(file_name, "gagal dimuat SoundLoader")
+            return True
+        size = self._decoded_bytes(sound, file_name)
+        if self.loaded_bytes + size > self.max_bytes:
+            print(f"INFO: Audio '{file_name}' melebihi batas bank, dimuat saat dipakai.")
+            sound.unload()
+            return True
+        self._clips[file_name] = sound
+        self.loaded_bytes += size
+        return True
+
+    def _decoded_bytes(self, sound, file_name):
+        if sound.length and sound.length > 0:
+            return int(sound.length * self.DECODED_BYTES_PER_SECOND)
+        return os.path.getsize(file_name) * self.COMPRESSION_RATIO
+
+    def _report_missing(self, file_name, reason):
+        if file_name in self._missing: return
+        self._missing.add(file_name)
+        print(f"WARNING: File audio '{file_name}' {reason}. Abaikan.")
+
+    def play(self, file_name):
+        sound = self._clips.get(file_name)
+        if sound is None:
+            if file_name in self._missing: return
+            if not os.path.exists(file_name):
+                self._report_missing(file_name, "TIDAK DITEMUKAN")
+                return
+            # Di luar bank (melebihi batas / preload belum sampai)
+            sound = SoundLoader.load(file_name)
+            if not sound:
+                self._report_missing(file_name, "gagal dimuat SoundLoader")
+                return
+
+        if self.active_sound:
+            self.active_sound.stop()
+        self.active_sound = sound
+        sound.play()
 
 class NavSelectionScreen(Screen):
     def on_enter(self):
         self.show_main_menu()
+        App.get_running_app().prefetch_likely_maps()
 
     def show_main_menu(self):
         grid = self.ids.nav_map_grid
@@ -77,26 +339,20 @@ class NavSelectionScreen(Screen):
 
         PADDING_POINT = 1300
 
-        # Point A
-        grid.add_widget(create_menu_btn(
-            "    POINT A | JAPAN CORNER", (0, 0.4, 1, 1), 
-            partial(app.start_preset_navigation, 'A'),
-            'left', PADDING_POINT
-        ))
-
-        # Point B
-        grid.add_widget(create_menu_btn(
-            "    POINT B | JURNAL TEPAT", (0, 0.4, 1, 1), 
-            partial(app.start_preset_navigation, 'B'),
-            'left', PADDING_POINT
-        ))
-
-        # Point C
-        grid.add_widget(create_menu_btn(
-            "    POINT C | WAREHOUSE", (0, 0.4, 1, 1), 
-            partial(app.start_preset_navigation, 'C'),
-            'left', PADDING_POINT
-        ))
+        # Point preset & rute dari missions.yaml
+        for wp in app.missions.waypoints(app.PRESET_MAP):
+            grid.add_widget(create_menu_btn(
+                f"    POINT {wp.name} | {wp.label}", (0, 0.4, 1, 1), 
+                partial(app.start_preset_navigation, wp.name),
+                'left', PADDING_POINT
+            ))
+
+        for route in app.missions.routes(app.PRESET_MAP):
+            grid.add_widget(create_menu_btn(
+                f"    RUTE | {route.label}", (0, 0.3, 0.7, 1), 
+                partial(app.start_route_navigation, route.name),
+                'left', PADDING_POINT
+            ))
 
         
         # Region Map
@@ -132,18 +388,7 @@ class NavSelectionScreen(Screen):
         
 
 
-        maps_folder = os.path.expanduser("~/catkin_ws/src/autonomus_mobile_robot/maps")
-        map_names = []
-
-        if os.path.exists(maps_folder):
-            try:
-                files = os.listdir(maps_folder)
-                map_names = [f.replace('.yaml', '') for f in files if f.endswith('.yaml')]
-                map_names.sort()
-            except Exception as e:
-                print(f"Error reading maps: {e}")
-        else:
-            print(f"WARNING: Folder {maps_folder} tidak ditemukan.")
+        map_names = app.manager.get_available_maps()
 
         if not map_names:
             grid.add_widget(Label(text="Tidak ada peta ditemukan.", color=(0,0,0,1)))
@@ -164,6 +409,55 @@ class ImageButton(ButtonBehavior, Image):
 class MapImage(TouchRippleBehavior, Image):
     marker = ObjectProperty(None, allownone=True)
     locked = BooleanProperty(False)
+    # Ukuran peta dalam piksel asli; bisa beda dari tekstur jika yang tampil hanya overview
+    map_pixel_size = ListProperty([0, 0])
+    requested_path = None # path tekstur peta yang terakhir diminta (lihat request_map_texture)
+
+    def __init__(self, **kwargs):
+        self.map_transform = MapTransform()
+        super().__init__(**kwargs)
+        self.tile_layer = TiledMapLayer(self.canvas, self.map_transform)
+        self._tile_trigger = Clock.create_trigger(self.update_tiles, 0)
+        self.bind(pos=self._update_transform_geometry, size=self._update_transform_geometry,
+                  texture=self._update_transform_image, map_pixel_size=self._update_transform_image)
+        self._update_transform_geometry()
+        self._update_transform_image()
+
+    def _update_transform_geometry(self, *args):
+        self.map_transform.set_widget_geometry(self.pos, self.size)
+        self._tile_trigger()
+
+    def _update_transform_image(self, *args):
+        if self.map_pixel_size[0]:
+            self.map_transform.set_image_size(self.map_pixel_size)
+        else:
+            self.map_transform.set_image_size(self.texture.size if self.texture else None)
+        self._tile_trigger()
+
+    def request_map_texture(self, textures, path):
+        """Meminta tekstur path dari MapTextureCache; hasil request lama yang selesai belakangan dibuang."""
+        self.requested_path = path
+        textures.request(path, lambda entry: self.set_map_texture(entry, path))
+
+    def set_map_texture(self, entry, path=None):
+        if path is not None and path != self.requested_path:
+            return
+        self.source = ''
+        self.map_pixel_size = list(entry.size)
+        self.texture = entry.texture
+        self.tile_layer.set_pyramid(entry.pyramid)
+        self._tile_trigger()
+
+    def schedule_tile_update(self, *args):
+        self._tile_trigger()
+
+    def update_tiles(self, *args):
+        scatter = self.parent
+        if not self.tile_layer.pyramid or scatter is None or scatter.parent is None: return
+        container = scatter.parent
+        x0, y0 = scatter.to_local(container.x, container.y)
+        x1, y1 = scatter.to_local(container.right, container.top)
+        self.tile_layer.update((x0, y0, x1, y1), scatter.scale)
 
     def on_touch_down(self, touch):
         if self.collide_point(*touch.pos):
@@ -184,53 +478,282 @@ class MapImage(TouchRippleBehavior, Image):
         return False
 
     def save_map_coords_to_marker(self, touch, marker_widget):
-        app = App.get_running_app()
-        if not app.manager.map_metadata: return
-
-        meta = app.manager.map_metadata
-        resolution = meta['resolution']
-        origin_x = meta['origin'][0]
-        origin_y = meta['origin'][1]
-        
-        norm_w, norm_h = self.texture.size
-        widget_w, widget_h = self.size
-        if norm_w == 0 or norm_h == 0: return
-
-        img_ratio = norm_w / norm_h
-        widget_ratio = widget_w / widget_h
-        
-        if widget_ratio > img_ratio:
-            scale = widget_h / norm_h
-            offset_x = (widget_w - norm_w * scale) / 2.0
-            offset_y = 0.0
-        else:
-            scale = widget_w / norm_w
-            offset_x = 0.0
-            offset_y = (widget_h - norm_h * scale) / 2.0
-            
-        touch_on_image_x = touch.pos[0] - self.x - offset_x
-        touch_on_image_y = touch.pos[1] - self.y - offset_y
-        
-        pixel_x = touch_on_image_x / scale
-        pixel_y = touch_on_image_y / scale
-        
-        map_x = (pixel_x * resolution) + origin_x
-        map_y = (pixel_y * resolution) + origin_y
-        
-        marker_widget.map_coords = (map_x, map_y)
+        map_coords = self.map_transform.screen_to_map(*touch.pos)
+        if map_coords:
+            marker_widget.map_coords = map_coords
 
 class RobotMarker(Image):
     angle = NumericProperty(0)
 
+class TrailRenderer(object):
+    """Menggambar RobotTrail: satu Line per chunk, hanya chunk aktif yang di-upload ulang."""
+    def __init__(self, canvas, transform, color=(0, 1, 1, 1), width=2):
+        self.transform = transform
+        self.width = width
+        self.group = InstructionGroup()
+        self.group.add(Color(*color))
+        canvas.add(self.group)
+        self.frozen_lines = {}
+        self.live_line = Line(points=[], width=width)
+        self.group.add(self.live_line)
+
+    def _to_screen(self, points):
+        if not points: return []
+        screen = self.transform.map_to_screen_array(points)
+        return screen.ravel().tolist() if screen is not None else []
+
+    def sync(self, trail):
+        alive = set()
+        for chunk in trail.chunks:
+            if not chunk.frozen: continue
+            alive.add(chunk.id)
+            if chunk.id not in self.frozen_lines:
+                line = Line(points=self._to_screen(chunk.points), width=self.width)
+                self.group.insert(len(self.group.children) - 1, line)
+                self.frozen_lines[chunk.id] = line
+        for chunk_id in list(self.frozen_lines):
+            if chunk_id not in alive:
+                self.group.remove(self.frozen_lines.pop(chunk_id))
+        self.live_line.points = self._to_screen(trail.active.points)
+
+    def refresh(self, trail):
+        """Proyeksi ulang semua chunk (dipanggil saat ukuran/posisi peta berubah)."""
+        for chunk in trail.chunks:
+            line = self.frozen_lines.get(chunk.id)
+            if line is not None:
+                line.points = self._to_screen(chunk.points)
+        self.live_line.points = self._to_screen(trail.active.points)
+
+    def clear(self):
+        for line in self.frozen_lines.values():
+            self.group.remove(line)
+        self.frozen_lines = {}
+        self.live_line.points = []
+
+class PathPreviewRenderer(object):
+    """Satu Line untuk jalur (list / array Nx2 koordinat peta), diproyeksi ulang saat peta bergeser."""
+    def __init__(self, canvas, transform, color=(1, 1, 0, 0.9), width=1.5):
+        self.transform = transform
+        self.path = []
+        self.group = InstructionGroup()
+        self.group.add(Color(*color))
+        self.line = Line(points=[], width=width)
+        self.group.add(self.line)
+        canvas.add(self.group)
+
+    def set_path(self, path):
+        self.path = path if path is not None else []
+        self.refresh()
+
+    def refresh(self):
+        screen = self.transform.map_to_screen_array(self.path) if len(self.path) else None
+        self.line.points = screen.ravel().tolist() if screen is not None else []
+
+    def clear(self):
+        self.set_path([])
+
+class CostmapRenderer(object):
+    """
+    Satu layer costmap (RGBA) sebagai Mesh bertekstur 4 sudut, jadi origin berputar (frame odom) tetap pas.
+    Hanya persegi yang berubah di-upload, maksimal max_upload_bytes per tick seperti preview mapping.
+    """
+    def __init__(self, canvas, transform, opacity=0.7, max_upload_bytes=2 * 1024 * 1024):
+        self.transform = transform
+        self.max_upload_bytes = max_upload_bytes
+        self.texture = None
+        self.placement = None
+        self.pending_rects = []
+        self.group = InstructionGroup()
+        self.group.add(Color(1, 1, 1, opacity))
+        self.mesh = Mesh(vertices=[], indices=[0, 1, 2, 3], mode='triangle_fan')
+        self.group.add(self.mesh)
+        canvas.add(self.group)
+
+    def update(self, update):
+        """update = (perubahan, (resolution, origin)) dari RosManager.get_costmap_changes, atau None."""
+        if update is not None:
+            (size, resized, rects), placement = update
+            if self.texture is None or tuple(self.texture.size) != size:
+                self.texture = Texture.create(size=size, colorfmt='rgba')
+                self.texture.mag_filter = 'nearest'
+                self.mesh.texture = self.texture
+                self.pending_rects = []
+            elif resized:
+                self.pending_rects = []
+            self.pending_rects.extend(rects)
+            if placement is not None and (size, placement) != self.placement:
+                self.placement = (size, placement)
+                self.refresh()
+
+        budget = self.max_upload_bytes
+        while self.pending_rects and budget > 0:
+            x, y, w, h, data = self.pending_rects.pop(0)
+            self.texture.blit_buffer(data, pos=(x, y), size=(w, h), colorfmt='rgba', bufferfmt='ubyte')
+            budget -= len(data)
+
+    def refresh(self):
+        if self.placement is None:
+            self.mesh.vertices = []
+            return
+        (w, h), (resolution, origin) = self.placement
+        corners = transform_points([(0, 0), (w * resolution, 0), (w * resolution, h * resolution),
+                                    (0, h * resolution)], origin)
+        screen = self.transform.map_to_screen_array(corners)
+        if screen is None:
+            self.mesh.vertices = []
+            return
+        uv = ((0, 0), (1, 0), (1, 1), (0, 1))
+        self.mesh.vertices = [v for (sx, sy), (u, t) in zip(screen.tolist(), uv) for v in (sx, sy, u, t)]
+
+    def clear(self):
+        self.texture = None
+        self.placement = None
+        self.pending_rects = []
+        self.mesh.texture = None
+        self.mesh.vertices = []
+
+class ScanRenderer(object):
+    """Titik scan laser (array Nx2 koordinat peta) sebagai SATU instruksi Point, tanpa widget per titik."""
+    def __init__(self, canvas, transform, color=(1, 0, 0, 0.9), point_size=1.5):
+        self.transform = transform
+        self.points = None
+        self.group = InstructionGroup()
+        self.group.add(Color(*color))
+        self.point = Point(points=[], pointsize=point_size)
+        self.group.add(self.point)
+        canvas.add(self.group)
+
+    def set_points(self, points):
+        self.points = points
+        self.refresh()
+
+    def refresh(self):
+        if self.points is None or not len(self.points):
+            self.point.points = []
+            return
+        screen = self.transform.map_to_screen_array(self.points)
+        self.point.points = screen.ravel().tolist() if screen is not None else []
+
+    def clear(self):
+        self.set_points(None)
+
+class LocalizationRenderer(object):
+    """
+    Partikel AMCL (satu Point) dan elips kovarians pose (satu Line). Buffer koordinat layar dialokasikan
+    sekali untuk max_particles titik dan dipakai ulang setiap update / pergeseran peta.
+    """
+    def __init__(self, canvas, transform, max_particles=500, color=(1, 0.5, 0, 0.8),
+                 ellipse_color=(1, 0, 1, 0.9), point_size=1.5):
+        self.transform = transform
+        self.particles = None
+        self.ellipse = None
+        self._particle_buffer = np.empty((max_particles, 2), dtype=np.float64)
+        self._ellipse_buffer = None
+        self.group = InstructionGroup()
+        self.group.add(Color(*color))
+        self.point = Point(points=[], pointsize=point_size)
+        self.group.add(self.point)
+        self.group.add(Color(*ellipse_color))
+        self.ellipse_line = Line(points=[], width=1.5)
+        self.group.add(self.ellipse_line)
+        canvas.add(self.group)
+
+    def _project(self, points, buffer):
+        if points is None or not len(points): return []
+        screen = self.transform.map_to_screen_array(points, out=buffer[:len(points)])
+        return screen.ravel().tolist() if screen is not None else []
+
+    def set_particles(self, points):
+        self.particles = None if points is None else points[:len(self._particle_buffer)]
+        self.point.points = self._project(self.particles, self._particle_buffer)
+
+    def set_ellipse(self, points):
+        self.ellipse = points
+        if points is not None and (self._ellipse_buffer is None or len(self._ellipse_buffer) < len(points)):
+            self._ellipse_buffer = np.empty((len(points), 2), dtype=np.float64)
+        self.ellipse_line.points = self._project(points, self._ellipse_buffer)
+
+    def refresh(self):
+        self.set_particles(self.particles)
+        self.set_ellipse(self.ellipse)
+
+    def clear(self):
+        self.set_particles(None)
+        self.set_ellipse(None)
+
 class HomeScreen(Screen):
     pass
 
+class MappingScreen(Screen):
+    """Preview peta live selama mapping: hanya persegi yang berubah di-upload, dibatasi per tick."""
+    PREVIEW_INTERVAL = 0.25
+    MAX_UPLOAD_BYTES = 4 * 1024 * 1024
+    live_texture = None
+    preview_event = None
+
+    def on_enter(self):
+        self.live_texture = None
+        self.pending_rects = []
+        self.ids.live_map.opacity = 0
+        self.ids.mapping_banner.opacity = 1
+        self.preview_event = Clock.schedule_interval(self.update_live_map, self.PREVIEW_INTERVAL)
+
+    def on_leave(self):
+        if self.preview_event:
+            self.preview_event.cancel()
+            self.preview_event = None
+        self.pending_rects = []
+
+    def update_live_map(self, dt):
+        changes = App.get_running_app().manager.get_live_map_changes()
+        if changes:
+            size, resized, rects = changes
+            if resized or self.live_texture is None or tuple(self.live_texture.size) != size:
+                self.live_texture = Texture.create(size=size, colorfmt='luminance')
+                self.live_texture.mag_filter = 'nearest'
+                self.pending_rects = []
+                self.ids.live_map.texture = self.live_texture
+            self.pending_rects.extend(rects)
+        if not self.pending_rects: return
+
+        # Sisa persegi di-upload tick berikutnya agar peta besar tidak menahan loop Kivy
+        budget = self.MAX_UPLOAD_BYTES
+        while self.pending_rects and budget > 0:
+            x, y, w, h, data = self.pending_rects.pop(0)
+            self.live_texture.blit_buffer(data, pos=(x, y), size=(w, h), colorfmt='luminance', bufferfmt='ubyte')
+            budget -= len(data)
+        self.ids.live_map.canvas.ask_update()
+        if self.ids.live_map.opacity == 0:
+            self.ids.live_map.opacity = 1
+            self.ids.mapping_banner.opacity = 0
+
 class NavigationScreen(Screen):
     selected_goal_coords = None
     robot_marker = ObjectProperty(None, allownone=True)
     pending_preset_target = None
+    pending_route = None
+    active_route = None
     use_image_marker = BooleanProperty(False) 
-    path_line = None
+    trail = None
+    trail_renderer = None
+    path_preview = None
+    preview_goal = None
+    preview_text = ''
+    global_plan = None
+    global_plan_seq = None
+    costmap_renderers = None
+    costmap_visible = BooleanProperty(False)
+    COSTMAP_LAYERS = (('global_costmap', 0.45), ('local_costmap', 0.8))
+    scan_renderer = None
+    scan_seq = None
+    scan_event = None
+    scan_visible = BooleanProperty(False)
+    # Scan digambar di clock sendiri (lebih cepat dari loop pose 10 Hz) hanya selama layer tampil
+    SCAN_DRAW_INTERVAL = 1 / 20.0
+    localization_renderer = None
+    particles_visible = BooleanProperty(False)
+    particle_seq = None
+    localization_seq = None
 
     def on_enter(self):
         app = App.get_running_app()
@@ -244,55 +767,278 @@ class NavigationScreen(Screen):
         scatter = self.ids.scatter_map
         scatter.scale = 1.0
         scatter.pos = self.ids.map_container.pos 
-        if not self.path_line:
-            with scatter.canvas:
-                Color(0, 1, 1, 1) # Warna Cyan (R, G, B, A)
-                self.path_line = Line(points=[], width=2)
-                
+        if not self.costmap_renderers:
+            # Costmap dibuat paling awal agar berada di bawah jejak, plan, dan marker
+            self.costmap_renderers = {name: CostmapRenderer(scatter.canvas, map_viewer.map_transform, opacity)
+                                      for name, opacity in self.COSTMAP_LAYERS}
+        self.set_costmap_visible(self.costmap_visible)
+        if not self.trail:
+            self.trail = RobotTrail()
+            # Warna Cyan (R, G, B, A)
+            self.trail_renderer = TrailRenderer(scatter.canvas, self.ids.map_viewer.map_transform, color=(0, 1, 1, 1))
+        if not self.scan_renderer:
+            self.scan_renderer = ScanRenderer(scatter.canvas, map_viewer.map_transform)
+        self.set_scan_visible(self.scan_visible)
+        if not self.localization_renderer:
+            self.localization_renderer = LocalizationRenderer(scatter.canvas, map_viewer.map_transform,
+                                                              max_particles=app.manager.MAX_PARTICLES_DRAWN)
+        # Kovarians AMCL selalu dipantau (status lokalisasi); partikel hanya saat layer tampil
+        app.manager.set_overlay_enabled('localization', True)
+        self.set_particles_visible(self.particles_visible)
+        if not self.path_preview:
+            # Warna Kuning: jalur prediksi ke goal terpilih
+            self.path_preview = PathPreviewRenderer(scatter.canvas, self.ids.map_viewer.map_transform)
+        if not self.global_plan:
+            # Warna Hijau: rencana jalur global dari move_base
+            self.global_plan = PathPreviewRenderer(scatter.canvas, self.ids.map_viewer.map_transform,
+                                                   color=(0, 0.8, 0.2, 0.9), width=2)
+        app.manager.set_overlay_enabled('global_plan', True)
                 
         if not self.robot_marker:
             source = 'robot_arrow.png' if os.path.exists('robot_arrow.png') else 'atlas://data/images/defaulttheme/checkbox_on'
             self.robot_marker = RobotMarker(source=source, size_hint=(None, None), size=(30, 30), allow_stretch=True, opacity=0)
             self.ids.scatter_map.add_widget(self.robot_marker)
 
-        if self.pending_preset_target:
+        if self.pending_route:
+            Clock.schedule_once(lambda dt: self.setup_route_mode(self.pending_route), 0)
+        elif self.pending_preset_target:
             Clock.schedule_once(lambda dt: self.setup_preset_mode(self.pending_preset_target), 0)
         else:
             self.setup_manual_mode()
         
         map_viewer.bind(size=self.update_marker_position, pos=self.update_marker_position)
+        scatter.bind(transform=map_viewer.schedule_tile_update)
         app.set_dpad_visibility(False)
         self.update_event = Clock.schedule_interval(self.update_robot_display, 0.1)
 
     def clear_path(self):
-        if self.path_line:
-            self.path_line.points = []
+        if self.trail:
+            self.trail.clear()
+            self.trail_renderer.clear()
+
+    def clear_global_plan(self):
+        """Menghapus plan yang tampil; seq tetap disimpan agar plan lama tidak digambar lagi."""
+        if self.global_plan:
+            self.global_plan.clear()
+
+    def set_costmap_visible(self, visible):
+        """Menampilkan / menyembunyikan costmap; saat disembunyikan topiknya di-unsubscribe."""
+        self.costmap_visible = visible
+        manager = App.get_running_app().manager
+        for name, _ in self.COSTMAP_LAYERS:
+            manager.set_overlay_enabled(name, visible)
+            if not visible and self.costmap_renderers:
+                self.costmap_renderers[name].clear()
+
+    def set_scan_visible(self, visible):
+        """Menampilkan / menyembunyikan scan laser; saat disembunyikan topiknya di-unsubscribe."""
+        self.scan_visible = visible
+        App.get_running_app().manager.set_overlay_enabled('scan', visible)
+        if self.scan_event:
+            self.scan_event.cancel()
+            self.scan_event = None
+        if visible:
+            self.scan_event = Clock.schedule_interval(self.update_scan, self.SCAN_DRAW_INTERVAL)
+        elif self.scan_renderer:
+            self.scan_renderer.clear()
+
+    def set_particles_visible(self, visible):
+        """Menampilkan / menyembunyikan partikel AMCL & elips kovarians (topik partikel di-unsubscribe)."""
+        self.particles_visible = visible
+        App.get_running_app().manager.set_overlay_enabled('particles', visible)
+        self.particle_seq = None
+        # Elips digambar ulang dari data kovarians terakhir pada update berikutnya
+        self.localization_seq = None
+        if not visible and self.localization_renderer:
+            self.localization_renderer.clear()
+
+    def show_localization_status(self, info):
+        warning = self.ids.localization_warning
+        if info and info['degraded']:
+            warning.text = (f"LOKALISASI MENURUN\n±{info['stddev']:.2f} m / "
+                            f"±{math.degrees(info['yaw_stddev']):.0f}°")
+            warning.opacity = 1
+        else:
+            warning.opacity = 0
+
+    def update_scan(self, dt):
+        latest = App.get_running_app().manager.get_overlay('scan', self.scan_seq)
+        if latest is not None:
+            self.scan_seq, points = latest
+            self.scan_renderer.set_points(points)
+
+    def update_overlays(self, manager):
+        """Menggambar ulang overlay hanya jika ada data baru (konversi sudah dilakukan di thread ROS/feed)."""
+        latest = manager.get_overlay('global_plan', self.global_plan_seq)
+        if latest is not None:
+            self.global_plan_seq, plan = latest
+            self.global_plan.set_path(plan)
+        if self.costmap_visible and self.costmap_renderers:
+            for name, renderer in self.costmap_renderers.items():
+                renderer.update(manager.get_costmap_changes(name))
+        latest = manager.get_overlay('localization', self.localization_seq)
+        if latest is not None:
+            self.localization_seq, info = latest
+            self.show_localization_status(info)
+            if self.particles_visible:
+                self.localization_renderer.set_ellipse(info['ellipse'] if info else None)
+        if self.particles_visible:
+            latest = manager.get_overlay('particles', self.particle_seq)
+            if latest is not None:
+                self.particle_seq, particles = latest
+                self.localization_renderer.set_particles(particles)
 
     def setup_manual_mode(self):
         self.ids.map_viewer.locked = False
         self.use_image_marker = False
+        self.active_route = None
         self.selected_goal_coords = None
         self.ids.navigate_button.disabled = True
-        self.ids.navigation_status_label.text = "Status: Pilih titik di peta"
+        self.clear_path_preview()
+        self.set_prompt("Status: Pilih titik di peta")
+
+    def set_prompt(self, text):
+        """Teks status utama; dipulihkan lagi setelah pesan progres kesiapan navigasi."""
+        self.prompt_text = text
+        self.ids.navigation_status_label.text = self._prompt_with_preview()
+
+    def _prompt_with_preview(self, default=''):
+        text = getattr(self, 'prompt_text', default)
+        return f"{text}\n{self.preview_text}" if self.preview_text else text
+
+    def on_navigation_ready(self, ok, message):
+        if ok:
+            self.ids.navigation_status_label.text = self._prompt_with_preview(message)
+            App.get_running_app().manager.prepare_path_preview()
+            self.request_path_preview()
+        else:
+            self.ids.navigation_status_label.text = message
+
+    # --- Preview jalur (planner di thread latar) ---
+    def request_path_preview(self, *args):
+        Clock.unschedule(self.request_path_preview)
+        goal = self.selected_goal_coords
+        self.preview_goal = goal
+        if not goal:
+            self.clear_path_preview()
+            return
+        app = App.get_running_app()
+        if not app.manager.request_path_preview(goal[0], goal[1], self.on_path_preview):
+            # Planner/pose belum siap: coba lagi sebentar lagi
+            Clock.schedule_once(self.request_path_preview, 1.0)
+
+    @mainthread
+    def on_path_preview(self, result):
+        if self.preview_goal != self.selected_goal_coords or not self.path_preview: return
+        if result is None:
+            self.path_preview.clear()
+            self.preview_text = "Jalur: tidak ditemukan"
+        else:
+            self.path_preview.set_path(result.path)
+            self.preview_text = f"Jalur: ±{result.length:.1f} m"
+        self.ids.navigation_status_label.text = self._prompt_with_preview()
+
+    def clear_path_preview(self):
+        Clock.unschedule(self.request_path_preview)
+        self.preview_goal = None
+        self.preview_text = ''
+        if self.path_preview:
+            self.path_preview.clear()
 
     def setup_preset_mode(self, target_data):
         x, y, name = target_data
         self.ids.map_viewer.locked = True
         self.use_image_marker = True
+        self.active_route = None
         
         self.selected_goal_coords = (x, y)
         self.ids.navigate_button.disabled = False
-        self.ids.navigation_status_label.text = f"Tujuan: Point {name}\nTekan START untuk jalan."
+        self.preview_text = ''
+        self.set_prompt(f"Tujuan: Point {name}\nTekan START untuk jalan.")
         self.show_goal_marker(x, y)
+        self.request_path_preview()
+
+    def setup_route_mode(self, route):
+        self.ids.map_viewer.locked = True
+        self.use_image_marker = True
+        if route.optimize:
+            self.optimize_route(route)
+            return
+        self.active_route = route
+
+        first = route.stops[0]
+        self.selected_goal_coords = (first.x, first.y)
+        self.ids.navigate_button.disabled = False
+        stops = " > ".join(wp.name for wp in route.stops)
+        self.preview_text = ''
+        self.set_prompt(f"Rute: {route.label} ({stops})\nTekan START untuk jalan.")
+        self.show_goal_marker(first.x, first.y)
+        self.request_path_preview()
+
+    def optimize_route(self, route):
+        self.active_route = None
+        self.optimizing_route = route
+        self.selected_goal_coords = None
+        self.ids.navigate_button.disabled = True
+        self.clear_path_preview()
+        self.set_prompt(f"Rute: {route.label}\nMenghitung urutan terpendek...")
+        App.get_running_app().manager.optimize_visit_order(
+            route.stops, lambda result: self.on_route_optimized(route, result))
+
+    @mainthread
+    def on_route_optimized(self, route, result):
+        if getattr(self, 'optimizing_route', None) is not route: return
+        self.optimizing_route = None
+        stops = route.stops
+        unreachable = []
+        if result is not None:
+            stops, length, unreachable = result
+            if math.isfinite(length):
+                print(f"INFO: Urutan {route.name}: {' > '.join(wp.name for wp in stops)} (±{length:.1f} m)")
+        self.setup_route_mode(Route(route.name, stops, route.label, route.approach_radius))
+        if result is not None and not math.isfinite(length):
+            # Urutan YAML dipakai apa adanya; pengguna diberi tahu titik mana yang tidak ada jalurnya
+            names = ", ".join(wp.name for wp in unreachable) or "sebagian titik"
+            print(f"WARNING: Rute {route.name}: {names} tak terjangkau, urutan asli dipakai.")
+            self.set_prompt(f"Rute: {route.label}\nPERINGATAN: Point {names} tak terjangkau!\n"
+                            f"Urutan asli dipakai. Tekan START untuk jalan.")
 
     def on_leave(self):
+        self.optimizing_route = None
         if hasattr(self, 'update_event'):
             self.update_event.cancel()
         if self.robot_marker:
             self.robot_marker.opacity = 0
         self.ids.map_viewer.unbind(size=self.update_marker_position, pos=self.update_marker_position)
+        self.ids.scatter_map.unbind(transform=self.ids.map_viewer.schedule_tile_update)
+        self.ids.map_viewer.map_transform.set_metadata(None)
+        self.ids.map_viewer.requested_path = None
         self.pending_preset_target = None
+        self.pending_route = None
         self.clear_path()
+        self.clear_path_preview()
+        manager = App.get_running_app().manager
+        manager.set_overlay_enabled('global_plan', False)
+        self.global_plan_seq = None
+        self.clear_global_plan()
+        for name, _ in self.COSTMAP_LAYERS:
+            manager.set_overlay_enabled(name, False)
+        for renderer in (self.costmap_renderers or {}).values():
+            renderer.clear()
+        if self.scan_event:
+            self.scan_event.cancel()
+            self.scan_event = None
+        manager.set_overlay_enabled('scan', False)
+        self.scan_seq = None
+        if self.scan_renderer:
+            self.scan_renderer.clear()
+        manager.set_overlay_enabled('particles', False)
+        manager.set_overlay_enabled('localization', False)
+        self.particle_seq = None
+        self.localization_seq = None
+        if self.localization_renderer:
+            self.localization_renderer.clear()
+        self.show_localization_status(None)
 
     def update_marker_position(self, *args):
         map_viewer = self.ids.map_viewer
@@ -301,45 +1047,27 @@ class NavigationScreen(Screen):
             screen_pos = self.calculate_screen_pos(map_x, map_y)
             if screen_pos:
                 map_viewer.marker.center = screen_pos
+        if self.trail:
+            self.trail_renderer.refresh(self.trail)
+        if self.path_preview:
+            self.path_preview.refresh()
+        if self.global_plan:
+            self.global_plan.refresh()
+        for renderer in (self.costmap_renderers or {}).values():
+            renderer.refresh()
+        if self.scan_renderer:
+            self.scan_renderer.refresh()
+        if self.localization_renderer:
+            self.localization_renderer.refresh()
 
     def calculate_screen_pos(self, map_x, map_y):
-        app = App.get_running_app()
-        map_viewer = self.ids.map_viewer
-        if not app.manager.map_metadata or not map_viewer.texture: return None
-
-        meta = app.manager.map_metadata
-        resolution = meta['resolution']
-        origin_x = meta['origin'][0]
-        origin_y = meta['origin'][1]
-        
-        pixel_x = (map_x - origin_x) / resolution
-        pixel_y = (map_y - origin_y) / resolution
-        
-        norm_w, norm_h = map_viewer.texture.size
-        widget_w, widget_h = map_viewer.size
-        if norm_w == 0 or norm_h == 0: return None
-        
-        img_ratio = norm_w / norm_h
-        widget_ratio = widget_w / widget_h
-        
-        if widget_ratio > img_ratio:
-            scale = widget_h / norm_h
-            offset_x = (widget_w - norm_w * scale) / 2.0
-            offset_y = 0.0
-        else:
-            scale = widget_w / norm_w
-            offset_x = 0.0
-            offset_y = (widget_h - norm_h * scale) / 2.0
-            
-        screen_x = (pixel_x * scale) + offset_x + map_viewer.x
-        screen_y = (pixel_y * scale) + offset_y + map_viewer.y
-        return (screen_x, screen_y)
+        return self.ids.map_viewer.map_transform.map_to_screen(map_x, map_y)
 
     def show_goal_marker(self, map_x, map_y):
         app = App.get_running_app()
         map_viewer = self.ids.map_viewer
         
-        if (not map_viewer.texture or map_viewer.texture.size[0] <= 1 or not app.manager.map_metadata):
+        if (not map_viewer.texture or map_viewer.texture.size[0] <= 1 or not map_viewer.map_transform.valid):
             Clock.schedule_once(lambda dt: self.show_goal_marker(map_x, map_y), 0.5)
             return
 
@@ -365,13 +1093,14 @@ class NavigationScreen(Screen):
             app = App.get_running_app()
             map_image_path = app.manager.get_map_image_path(map_name)
             if map_image_path:
-                self.ids.map_viewer.source = map_image_path
                 app.manager.load_map_metadata(map_name)
-                self.ids.map_viewer.reload()
+                self.ids.map_viewer.map_transform.set_metadata(app.manager.map_metadata)
+                self.ids.map_viewer.request_map_texture(app.map_textures, map_image_path)
 
     @mainthread
     def update_robot_display(self, dt):
         app = App.get_running_app()
+        self.update_overlays(app.manager)
         pose = app.manager.get_robot_pose()
         if pose is None: return
         screen_pos = self.calculate_screen_pos(pose['x'], pose['y'])
@@ -379,17 +1108,37 @@ class NavigationScreen(Screen):
             self.robot_marker.opacity = 1
             self.robot_marker.center = screen_pos
             self.robot_marker.angle = math.degrees(pose['yaw'])
-            if self.path_line:
-                self.path_line.points += [screen_pos[0], screen_pos[1]]
+            if self.trail and self.trail.append(pose['x'], pose['y']):
+                self.trail_renderer.sync(self.trail)
+            app.manager.record_pose_drawn(pose)
+        if app.mission_runner:
+            app.mission_runner.update_pose(pose)
 
 class MainApp(App):
     PAN_STEP = 50 
+    # Peta region tempat waypoint preset (missions.yaml) berada
+    PRESET_MAP = 'test1'
+    # Peta yang kemungkinan besar dibuka berikutnya (peta region untuk preset)
+    PREFETCH_MAPS = (PRESET_MAP,)
+    # Cue menu / mode; cue waypoint diambil dari missions.yaml (MissionCatalog.audio_files)
+    AUDIO_CUES = (
+        'start.mp3', 'control_robot.mp3', 'make_a_map.mp3', 'do_navigation.mp3',
+        'start_mapping.mp3', 'done_save_map.mp3', 'others_map.mp3', 'making_navigation.mp3',
+        'start_navigation.mp3',
+    )
 
     def build(self):
         self.manager = RosManager(status_callback=self.update_status_label)
+        self.map_textures = MapTextureCache(loader=self.manager.load_display_pixels)
+        Clock.schedule_once(lambda dt: self.prefetch_likely_maps(), 1.0)
         self.nav_goal_coords = None
+        self.nav_goal_handle = None
         self.nav_status_event = None
-        self.active_sound = None
+        self.missions = MissionCatalog()
+        self.mission_runner = None
+        self.audio_bank = AudioBank(self.AUDIO_CUES + tuple(self.missions.audio_files()))
+        self.audio_bank.preload()
+        Clock.schedule_once(lambda dt: self.offer_map_recovery(), 2.0)
         Window.fullscreen = 'auto'
         
         kv_design = """
@@ -551,6 +1300,42 @@ class MainApp(App):
                     MapControlButton:
                         text: "-"
                         on_press: app.zoom_out()
+                BoxLayout:
+                    orientation: 'vertical'
+                    size_hint: (None, None)
+                    size: ('140dp', '200dp')
+                    pos_hint: {'right': 0.98, 'y': 0.02}
+                    spacing: 10
+                    ToggleButton:
+                        text: 'COSTMAP'
+                        font_size: '18sp'
+                        background_color: 0.2, 0.2, 0.2, 0.5
+                        state: 'down' if root.costmap_visible else 'normal'
+                        on_release: root.set_costmap_visible(self.state == 'down')
+                    ToggleButton:
+                        text: 'LASER'
+                        font_size: '18sp'
+                        background_color: 0.2, 0.2, 0.2, 0.5
+                        state: 'down' if root.scan_visible else 'normal'
+                        on_release: root.set_scan_visible(self.state == 'down')
+                    ToggleButton:
+                        text: 'AMCL'
+                        font_size: '18sp'
+                        background_color: 0.2, 0.2, 0.2, 0.5
+                        state: 'down' if root.particles_visible else 'normal'
+                        on_release: root.set_particles_visible(self.state == 'down')
+                Label:
+                    id: localization_warning
+                    text: ''
+                    opacity: 0
+                    color: 1, 0, 0, 1
+                    bold: True
+                    font_size: '20sp'
+                    halign: 'left'
+                    size_hint: (None, None)
+                    size: ('320dp', '60dp')
+                    text_size: self.size
+                    pos_hint: {'x': 0.02, 'top': 0.98}
                 ImageButton:
                     id: dpad_up
                     source: 'scroll_up.png'
@@ -715,18 +1500,28 @@ ScreenManager:
                     on_press: app.exit_controller_mode()
             WindowToggleBtn:
 
-    Screen:
+    MappingScreen:
         name: 'mapping'
         FloatLayout:
             BoxLayout:
                 orientation: 'vertical'
                 padding: 40
                 spacing: 20
-                Image:
-                    source: 'mapping_on_progress.png'
-                    allow_stretch: True
-                    keep_ratio: True
+                FloatLayout:
                     size_hint_y: 0.8
+                    Image:
+                        id: mapping_banner
+                        source: 'mapping_on_progress.png'
+                        allow_stretch: True
+                        keep_ratio: True
+                        pos_hint: {'x': 0, 'y': 0}
+                    Image:
+                        # Preview peta live, tampil begitu /map pertama diterima
+                        id: live_map
+                        allow_stretch: True
+                        keep_ratio: True
+                        opacity: 0
+                        pos_hint: {'x': 0, 'y': 0}
                 BoxLayout:
                     orientation: 'horizontal'
                     spacing: 20
@@ -755,6 +1550,12 @@ ScreenManager:
 """
         return Builder.load_string(kv_design)
 
+    def prefetch_likely_maps(self):
+        for map_name in self.PREFETCH_MAPS:
+            path = self.manager.get_map_image_path(map_name)
+            if path:
+                self.map_textures.prefetch(path)
+
     def toggle_window_mode(self):
         if Window.fullscreen == 'auto':
             Window.fullscreen = False
@@ -834,62 +1635,129 @@ ScreenManager:
     
     def calculate_ros_goal(self, touch, image_widget):
         screen = self.root.get_screen('navigation')
-        if not image_widget.texture or not self.manager.map_metadata: return
-        meta = self.manager.map_metadata
-        resolution = meta['resolution']
-        origin_x = meta['origin'][0]
-        origin_y = meta['origin'][1]
-        
-        norm_w, norm_h = image_widget.texture.size
-        widget_w, widget_h = image_widget.size
-        if norm_w == 0 or norm_h == 0: return
-
-        img_ratio = norm_w / norm_h
-        widget_ratio = widget_w / widget_h
-        
-        if widget_ratio > img_ratio:
-            scale = widget_h / norm_h
-            offset_x = (widget_w - norm_w * scale) / 2.0
-            offset_y = 0.0
-        else:
-            scale = widget_w / norm_w
-            offset_x = 0.0
-            offset_y = (widget_h - norm_h * scale) / 2.0
-        
-        if scale == 0: return
-        touch_on_image_x = touch.pos[0] - image_widget.x - offset_x
-        touch_on_image_y = touch.pos[1] - image_widget.y - offset_y
-        
-        pixel_x = touch_on_image_x / scale
-        pixel_y = touch_on_image_y / scale
-        
-        map_x = (pixel_x * resolution) + origin_x
-        map_y = (pixel_y * resolution) + origin_y
+        map_coords = image_widget.map_transform.screen_to_map(*touch.pos)
+        if not map_coords: return
+        map_x, map_y = map_coords
+
+        status, coords = self.manager.validate_goal(map_x, map_y)
+        if status == 'invalid':
+            if image_widget.marker and image_widget.marker.parent:
+                image_widget.remove_widget(image_widget.marker)
+            image_widget.marker = None
+            screen.selected_goal_coords = None
+            screen.ids.navigate_button.disabled = True
+            screen.clear_path_preview()
+            screen.set_prompt("Titik tidak valid (dinding / area belum dipetakan).\nPilih titik lain.")
+            return
+        if status == 'snapped':
+            map_x, map_y = coords
+            if image_widget.marker:
+                image_widget.marker.map_coords = coords
+                image_widget.marker.center = image_widget.map_transform.map_to_screen(map_x, map_y)
         
         screen.selected_goal_coords = (map_x, map_y)
         screen.ids.navigate_button.disabled = False
-        screen.ids.navigation_status_label.text = f"Goal: ({map_x:.2f}, {map_y:.2f})"
+        screen.preview_text = ''
+        screen.request_path_preview()
+        if status == 'snapped':
+            screen.set_prompt(f"Goal digeser ke area aman: ({map_x:.2f}, {map_y:.2f})")
+        else:
+            screen.set_prompt(f"Goal: ({map_x:.2f}, {map_y:.2f})")
 
     def confirm_navigation_goal(self):
+        pressed_at = time.monotonic()
         screen = self.root.get_screen('navigation')
         screen.clear_path()
+        screen.clear_path_preview()
         self.play_audio('start_navigation.mp3')
+        if not self.manager.nav_ready.is_set():
+            screen.ids.navigation_status_label.text = "Status: Navigasi belum siap,\ntunggu sebentar..."
+            return
+        if screen.active_route:
+            self.start_mission(screen.active_route)
+            return
         if screen.selected_goal_coords:
             map_x, map_y = screen.selected_goal_coords
             
-            success = self.manager.send_navigation_goal(map_x, map_y)
+            handle = self.manager.send_navigation_goal(map_x, map_y, on_event=self.on_goal_event,
+                                                       pressed_at=pressed_at)
             
-            if success:
+            if handle:
                 print(f"INFO: Perintah GOAL ({map_x:.2f}, {map_y:.2f}) Terkirim!")
                 screen.ids.navigation_status_label.text = "Status: Robot Bergerak..."
+                self.nav_goal_handle = handle
                 self.nav_goal_coords = (map_x, map_y)
                 if self.nav_status_event:
                     self.nav_status_event.cancel()
-                self.nav_status_event = Clock.schedule_interval(self.check_navigation_status, 0.5)
+                    self.nav_status_event = None
+                # Tanpa action server tidak ada laporan hasil: fallback cek jarak
+                if not handle.tracked:
+                    self.nav_status_event = Clock.schedule_interval(self.check_navigation_status, 0.5)
                 screen.ids.navigate_button.disabled = True
             else:
                 screen.ids.navigation_status_label.text = "Status: Gagal Kirim Goal"
+
+    @mainthread
+    def on_goal_event(self, handle, event):
+        """Dipanggil (di main thread) setiap status goal dari move_base berubah."""
+        if handle is not self.nav_goal_handle: return
+        screen = self.root.get_screen('navigation')
+        label = screen.ids.navigation_status_label
+        if event == 'accepted':
+            label.text = "Status: Goal diterima"
+        elif event == 'active':
+            label.text = "Status: Robot Bergerak..."
+        elif event == 'succeeded':
+            print(f"TARGET TERCAPAI ({handle.x:.2f}, {handle.y:.2f}).")
+            self.finish_navigation_success()
+        elif event == 'preempted':
+            label.text = "Status: Navigasi dibatalkan"
+            screen.clear_global_plan()
+            screen.ids.navigate_button.disabled = screen.selected_goal_coords is None
+            self.nav_goal_handle = None
+            self.nav_goal_coords = None
+        else:
+            label.text = "Status: Gagal mencapai tujuan!\nPilih titik lain / coba lagi."
+            screen.clear_global_plan()
+            screen.ids.navigate_button.disabled = screen.selected_goal_coords is None
+            self.nav_goal_handle = None
+            self.nav_goal_coords = None
     
+    def start_mission(self, route):
+        screen = self.root.get_screen('navigation')
+        if self.mission_runner:
+            self.mission_runner.cancel()
+        self.mission_runner = MissionRunner(self.manager, route.stops, route.approach_radius,
+                                            on_event=self.on_mission_event)
+        if self.mission_runner.start():
+            screen.ids.navigate_button.disabled = True
+        else:
+            screen.ids.navigation_status_label.text = "Status: Gagal Kirim Goal"
+
+    @mainthread
+    def on_mission_event(self, runner, event, waypoint):
+        if runner is not self.mission_runner: return
+        screen = self.root.get_screen('navigation')
+        label = screen.ids.navigation_status_label
+        total = len(runner.stops)
+        if event == 'dispatched':
+            label.text = f"Status: Menuju Point {waypoint.name} ({runner.index + 1}/{total})"
+            screen.show_goal_marker(waypoint.x, waypoint.y)
+        elif event == 'passed':
+            print(f"INFO: Point {waypoint.name} terlewati, lanjut ke titik berikutnya.")
+        elif event == 'finished':
+            self.mission_runner = None
+            self.finish_navigation_success()
+        elif event == 'failed':
+            self.mission_runner = None
+            label.text = f"Status: Rute gagal di Point {waypoint.name}!"
+            screen.clear_global_plan()
+            screen.ids.navigate_button.disabled = False
+        elif event == 'cancelled':
+            self.mission_runner = None
+            label.text = "Status: Rute dibatalkan"
+            screen.clear_global_plan()
+
     def check_navigation_status(self, dt):
         if not self.nav_goal_coords: return False 
         current_pose = self.manager.get_robot_pose()
@@ -912,29 +1780,21 @@ ScreenManager:
                 map_viewer.marker = None
         except Exception: pass
 
-        if hasattr(self.manager, '_send_stop_command'):
-            self.manager._send_stop_command()
+        self.manager.emergency_stop()
+        # Robot diam di posisi baru: siapkan medan jarak untuk preview goal berikutnya
+        self.manager.prepare_path_preview()
 
         screen = self.root.get_screen('navigation')
+        screen.clear_global_plan()
         screen.ids.navigation_status_label.text = "Status: Target Tercapai!"
         screen.ids.navigate_button.disabled = True
         self.nav_goal_coords = None
+        self.nav_goal_handle = None
         
     def play_audio(self, file_name):
-        """Memainkan audio dengan pengecekan aman agar tidak crash."""
+        """Memainkan audio dari bank dengan pengecekan aman agar tidak crash."""
         try:
-            if os.path.exists(file_name):
-                if self.active_sound:
-                    self.active_sound.stop()
-                
-                self.active_sound = SoundLoader.load(file_name)
-                
-                if self.active_sound:
-                    self.active_sound.play()
-                else:
-                    print(f"WARNING: SoundLoader gagal memuat '{file_name}'.")
-            else:
-                print(f"WARNING: File audio '{file_name}' TIDAK DITEMUKAN. Abaikan.")
+            self.audio_bank.play(file_name)
         except Exception as e:
             print(f"ERROR Audio (Ignored): {e}")
             
@@ -960,6 +1820,40 @@ ScreenManager:
         self.manager.stop_controller()
         self.root.current = 'main_menu'
 
+    def offer_map_recovery(self):
+        """Jika sesi mapping sebelumnya terputus, tawarkan memulihkan checkpoint terbarunya."""
+        sessions = self.manager.get_map_checkpoints()
+        if not sessions: return
+        session = sessions[0]
+        saved_at = time.strftime('%d-%m-%Y %H:%M', time.localtime(session['mtime']))
+
+        content = BoxLayout(orientation='vertical', spacing=20, padding=20)
+        content.add_widget(Label(
+            text=f"Pemetaan '{session['map_name']}' terputus.\nCheckpoint terakhir: {saved_at}",
+            font_size='30sp', color=(1, 1, 1, 1), halign='center'))
+        buttons = BoxLayout(spacing=20, size_hint_y=None, height='100dp')
+        restore_btn = Button(text="PULIHKAN PETA", font_size='28sp', background_color=(0, 0.8, 0, 1))
+        discard_btn = Button(text="BUANG", font_size='28sp', background_color=(0.8, 0, 0, 1))
+        buttons.add_widget(restore_btn)
+        buttons.add_widget(discard_btn)
+        content.add_widget(buttons)
+
+        popup = Popup(title="Pemulihan Peta", content=content, size_hint=(0.7, 0.5), auto_dismiss=False)
+
+        def finish(restore, *args):
+            popup.dismiss()
+            if restore:
+                if self.manager.restore_map_checkpoint(session['map_name']):
+                    print(f"INFO: Peta '{session['map_name']}' dipulihkan dari checkpoint.")
+            else:
+                self.manager.discard_map_checkpoint(session['map_name'])
+            # Sesi terputus lainnya (jika ada) ditawarkan berikutnya
+            Clock.schedule_once(lambda dt: self.offer_map_recovery(), 0.3)
+
+        restore_btn.bind(on_press=partial(finish, True))
+        discard_btn.bind(on_press=partial(finish, False))
+        popup.open()
+
     def go_to_mapping_mode(self, map_name):
         if not map_name.strip(): return
         status = self.manager.start_mapping(map_name)
@@ -1000,10 +1894,18 @@ ScreenManager:
         self.root.current = 'main_menu'
 
     def exit_navigation_mode(self):
+        pressed_at = time.monotonic()
         if self.nav_status_event:
             self.nav_status_event.cancel()
             self.nav_status_event = None
-        self.manager.stop_navigation()
+        self.nav_goal_handle = None
+        self.nav_goal_coords = None
+        if self.mission_runner:
+            # Dibatalkan dulu agar goal aktif & callback-nya tidak tertinggal di sesi berikutnya
+            self.mission_runner.cancel()
+            self.mission_runner = None
+        # Stack navigasi dibiarkan hidup (standby) agar masuk lagi / ganti peta cepat
+        self.manager.stop_navigation(pressed_at=pressed_at, keep_warm=True)
         self.root.current = 'main_menu'
 
     def on_stop(self):
@@ -1023,35 +1925,49 @@ ScreenManager:
         Clock.schedule_once(lambda dt: self._proceed_start_nav(map_name), 0.2)
 
     def _proceed_start_nav(self, map_name):
-        self.manager.start_navigation(map_name)
+        self.manager.start_navigation(map_name, ready_callback=self.on_navigation_ready)
         self.root.current = 'navigation'
         
         screen = self.root.get_screen('navigation')
         screen.ids.map_viewer.locked = False
         screen.selected_goal_coords = None
         screen.ids.navigate_button.disabled = True
-        screen.ids.navigation_status_label.text = "Status: Pilih titik di peta"
+        screen.set_prompt("Status: Pilih titik di peta")
+
+    @mainthread
+    def on_navigation_ready(self, ok, message):
+        if self.root.current == 'navigation':
+            self.root.get_screen('navigation').on_navigation_ready(ok, message)
 
     def start_preset_navigation(self, point_name, *args):
-        target_x, target_y = 0.0, 0.0
-        
-        if point_name == 'A':
-            target_x, target_y = -14.75, 6.24
-            self.play_audio('point_a.mp3')
-        elif point_name == 'B':
-            target_x, target_y = -27.49, 7.03
-            self.play_audio('point_b.mp3')
-        elif point_name == 'C':
-            target_x, target_y = -30.93, 3.02
-            self.play_audio('point_c.mp3')
-
-        print(f"INFO: Preset Point {point_name} dipilih ({target_x}, {target_y})")
+        waypoint = self.missions.waypoint(self.PRESET_MAP, point_name)
+        if not waypoint:
+            print(f"ERROR: Point {point_name} tidak ada di {self.missions.path}")
+            return
+        if waypoint.audio:
+            self.play_audio(waypoint.audio)
+
+        print(f"INFO: Preset Point {point_name} dipilih ({waypoint.x}, {waypoint.y})")
         
-        self.manager.start_navigation('test1')
+        self.manager.start_navigation(self.PRESET_MAP, ready_callback=self.on_navigation_ready)
         screen = self.root.get_screen('navigation')
-        screen.pending_preset_target = (target_x, target_y, point_name)
+        screen.pending_preset_target = (waypoint.x, waypoint.y, point_name)
         screen.use_image_marker = True 
         self.root.current = 'navigation'
 
+    def start_route_navigation(self, route_name, *args):
+        route = self.missions.route(self.PRESET_MAP, route_name)
+        if not route:
+            print(f"ERROR: Rute {route_name} tidak ada di {self.missions.path}")
+            return
+        self.play_audio('making_navigation.mp3')
+        print(f"INFO: Rute {route_name} dipilih ({' > '.join(wp.name for wp in route.stops)})")
+
+        self.manager.start_navigation(self.PRESET_MAP, ready_callback=self.on_navigation_ready)
+        screen = self.root.get_screen('navigation')
+        screen.pending_route = route
+        screen.use_image_marker = True
+        self.root.current = 'navigation'
+
 if __name__ == '__main__':
     MainApp().run()
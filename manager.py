@@ -2,31 +2,153 @@
 import subprocess
 import time
 import os
-import signal
 import rospkg
-import glob
-import yaml
 import threading
 import math
+from collections import deque
+
+import numpy as np
+
+from map_tools import (MapCatalog, OccupancyMap, LiveMapImage, COSTMAP_LUT, ScanProjector, compose_poses,
+                       covariance_ellipse, douglas_peucker_array, load_pgm, occupancy_to_pgm, save_map,
+                       transform_points)
+from planner import GridPlanner, PlannerWorker
+from route_optimizer import RouteOptimizer
+from checkpoint import MapCheckpointer
+from map_bundle import MapBundleStore
+from metrics import LatencyMetrics, METRICS_FILE
+from supervisor import ProcessSupervisor, RESTARTING, RUNNING, FAILED
 
 # Import Pustaka ROS
 try:
     import rospy
+    import rosgraph
     import tf
     from tf.transformations import euler_from_quaternion
     # Import Pesan Penting untuk Navigasi
-    from geometry_msgs.msg import Twist, PoseStamped 
+    from geometry_msgs.msg import Twist, PoseStamped, PoseWithCovarianceStamped, PoseArray
+    from std_srvs.srv import Empty
+    from tf2_msgs.msg import TFMessage
+    from nav_msgs.msg import OccupancyGrid, Path
+    from sensor_msgs.msg import LaserScan
+    from actionlib_msgs.msg import GoalID
 except ImportError:
     print("PERINGATAN: Pustaka ROS tidak lengkap. Fitur real-time non-aktif.")
     rospy = None
+    rosgraph = None
     tf = None
 
+# Client action move_base (opsional, fallback ke /move_base_simple/goal)
+try:
+    import actionlib
+    from actionlib_msgs.msg import GoalStatus
+    from move_base_msgs.msg import MoveBaseAction, MoveBaseGoal
+except ImportError:
+    actionlib = None
+
+# Update parsial peta (opsional, tidak semua SLAM mempublikasikannya)
+try:
+    from map_msgs.msg import OccupancyGridUpdate
+except ImportError:
+    OccupancyGridUpdate = None
+
+# Service ganti peta map_server (nav_msgs/LoadMap, ROS Noetic ke atas)
+try:
+    from nav_msgs.srv import LoadMap
+except ImportError:
+    LoadMap = None
+
+class NavigationGoalHandle(object):
+    """
+    Handle satu goal navigasi. Status diperbarui dari callback actionlib (thread ROS):
+    sent -> accepted -> active -> succeeded / aborted / preempted / rejected / lost.
+    """
+    TERMINAL = ('succeeded', 'aborted', 'preempted', 'rejected', 'lost')
+
+    def __init__(self, x, y, on_event=None, on_feedback=None):
+        self.x = x
+        self.y = y
+        self.status = 'sent'
+        self.feedback = None
+        self.result = None
+        self.tracked = False  # True jika status dilaporkan action server
+        self.sent_time = time.monotonic()
+        self.on_event = on_event
+        self.on_feedback = on_feedback
+        self.done = threading.Event()
+        self._client_handle = None
+
+    @property
+    def is_done(self):
+        return self.done.is_set()
+
+    def _set_status(self, status):
+        if status == self.status or self.is_done: return
+        if status == 'active' and self.status == 'sent':
+            self._set_status('accepted')
+        self.status = status
+        if status in self.TERMINAL:
+            self.done.set()
+        if self.on_event:
+            self.on_event(self, status)
+
+    def _set_feedback(self, feedback):
+        self.feedback = feedback
+        if self.on_feedback:
+            self.on_feedback(self, feedback)
+
+    def cancel(self):
+        if self._client_handle and not self.is_done:
+            self._client_handle.cancel()
+
+class PoseRingBuffer(object):
+    """Ring buffer pose ber-timestamp. Satu penulis (callback TF), banyak pembaca tanpa lock."""
+    def __init__(self, depth=200):
+        self.depth = max(1, int(depth))
+        self._slots = [None] * self.depth
+        self._count = 0
+        self._base = 0
+
+    def push(self, pose):
+        seq = self._count
+        pose['seq'] = seq
+        self._slots[seq % self.depth] = pose
+        # Counter dinaikkan SETELAH slot terisi, jadi pembaca tidak pernah melihat slot setengah jadi
+        self._count = seq + 1
+
+    def clear(self):
+        self._base = self._count
+
+    def latest(self):
+        count = self._count
+        if count <= self._base: return None
+        return self._slots[(count - 1) % self.depth]
+
+    def history(self, n):
+        """Mengembalikan maksimal n pose terakhir, urut dari yang paling lama."""
+        count = self._count
+        first = max(count - int(n), count - self.depth, self._base)
+        poses = [self._slots[seq % self.depth] for seq in range(first, count)]
+        # Slot yang sudah ditimpa penulis saat dibaca dibuang (cek lewat nomor seq)
+        return [p for p in poses if p is not None and first <= p['seq'] < count]
+
 class RosPoseListener(threading.Thread):
-    def __init__(self):
+    """Pose robot (map -> base_link) yang diperbarui setiap ada transform baru di /tf."""
+    # Frame anak yang memicu lookup ulang (rantai map -> odom -> base_link)
+    TRIGGER_FRAMES = ('odom', 'base_link', 'base_footprint')
+    # Pose lebih tua dari ini (detik sejak diterima) dianggap basi: TF berhenti / lokalisasi mati
+    STALE_AFTER = 2.0
+
+    def __init__(self, depth=200, target_frame='map', robot_frame='base_link', on_pose=None):
         super(RosPoseListener, self).__init__()
         self.daemon = True
         self.listener = None
-        self.robot_pose = None
+        self.target_frame = target_frame
+        self.robot_frame = robot_frame
+        self.on_pose = on_pose # dipanggil dari thread ROS setiap pose baru (instrumentasi)
+        self.poses = PoseRingBuffer(depth)
+        self._tf_subs = []
+        self._last_stamp = None
         self._stop_event = threading.Event()
         self._run_event = threading.Event()
 
@@ -36,71 +158,476 @@ class RosPoseListener(threading.Thread):
             rospy.init_node('kivy_ros_manager', anonymous=True, disable_signals=True)
         
         self.listener = tf.TransformListener()
-        rate = rospy.Rate(10.0)
+        # Callback kedua di /tf: listener di atas sudah mengisi buffer-nya sendiri,
+        # di sini kita hanya bereaksi saat transform yang relevan datang. Sengaja hanya /tf
+        # (tanpa /tf_static): satu subscriber = satu thread callback, jadi PoseRingBuffer dan
+        # _last_stamp tetap punya satu penulis. Transform statis tetap dibaca lewat listener.
+        self._tf_subs = [rospy.Subscriber('/tf', TFMessage, self._on_tf, queue_size=10)]
+        self._stop_event.wait()
+        for sub in self._tf_subs:
+            sub.unregister()
+        self._tf_subs = []
 
-        while not self._stop_event.is_set():
-            self._run_event.wait()
-            if self._stop_event.is_set(): break
-            try:
-                (trans, rot) = self.listener.lookupTransform('/map', '/base_link', rospy.Time(0))
-                _, _, yaw = euler_from_quaternion(rot)
-                self.robot_pose = {'x': trans[0], 'y': trans[1], 'yaw': yaw}
-            except (tf.LookupException, tf.ConnectivityException, tf.ExtrapolationException):
-                self.robot_pose = None
-                continue
-            finally:
-                rate.sleep()
+    def _on_tf(self, msg):
+        if not self._run_event.is_set() or self._stop_event.is_set(): return
+        if not any(t.child_frame_id.lstrip('/') in self.TRIGGER_FRAMES for t in msg.transforms):
+            return
+        try:
+            stamp = self.listener.getLatestCommonTime(self.target_frame, self.robot_frame)
+            if self._last_stamp is not None and stamp <= self._last_stamp:
+                return
+            (trans, rot) = self.listener.lookupTransform(self.target_frame, self.robot_frame, stamp)
+        except (tf.Exception, tf.LookupException, tf.ConnectivityException, tf.ExtrapolationException):
+            return
+        self._last_stamp = stamp
+        _, _, yaw = euler_from_quaternion(rot)
+        pose = {
+            'x': trans[0], 'y': trans[1], 'yaw': yaw,
+            'stamp': stamp.to_sec(),
+            'recv_time': time.monotonic(),
+            'tf_age': (rospy.Time.now() - stamp).to_sec(),
+        }
+        self.poses.push(pose)
+        if self.on_pose:
+            self.on_pose(pose)
 
     def start_listening(self):
         self._run_event.set()
 
     def stop_listening(self):
         self._run_event.clear()
-        self.robot_pose = None
+        self._last_stamp = None
+        self.poses.clear()
 
     def stop_thread(self):
         self._stop_event.set()
         self._run_event.set()
 
     def get_pose(self):
-        return self.robot_pose
+        """Pose terbaru, atau None jika belum ada / sudah basi (lebih tua dari STALE_AFTER)."""
+        pose = self.poses.latest()
+        if pose is None or time.monotonic() - pose['recv_time'] > self.STALE_AFTER:
+            return None
+        return pose
+
+    def get_pose_history(self, n):
+        return self.poses.history(n)
+
+class RosMapListener(object):
+    """
+    Menyimpan OccupancyGrid terbaru dari /map selama mapping. Callback hanya menyimpan referensi
+    pesan; konversi ke NumPy dilakukan oleh pemakai (mis. thread penyimpan) saat dibutuhkan.
+    Jika preview (LiveMapImage) diberikan, /map dan /map_updates juga dikonversi untuk tampilan.
+    """
+    def __init__(self, topic='/map', preview=None):
+        self.topic = topic
+        self.preview = preview
+        self.latest = None
+        self.seq = 0
+        self.recv_time = None
+        self._subs = []
+
+    @property
+    def active(self):
+        return bool(self._subs)
+
+    def start(self):
+        if not rospy or self._subs: return False
+        self.latest = None
+        if self.preview:
+            self.preview.clear()
+        self._subs = [rospy.Subscriber(self.topic, OccupancyGrid, self._on_map, queue_size=1, buff_size=2 ** 24)]
+        if self.preview and OccupancyGridUpdate:
+            self._subs.append(rospy.Subscriber(f"{self.topic}_updates", OccupancyGridUpdate,
+                                               self._on_map_update, queue_size=10))
+        return True
+
+    def stop(self):
+        for sub in self._subs:
+            sub.unregister()
+        self._subs = []
+
+    def _on_map(self, msg):
+        self.latest = msg
+        self.seq += 1
+        self.recv_time = time.monotonic()
+        if self.preview:
+            try:
+                self.preview.set_grid(*occupancy_grid_arrays(msg))
+            except Exception as e:
+                print(f"WARNING: Preview peta gagal: {e}")
+
+    def _on_map_update(self, msg):
+        self.preview.apply_update(msg.x, msg.y, msg.width, msg.height, msg.data)
+
+class RosCostmapListener(RosMapListener):
+    """
+    Costmap move_base (global/local) untuk overlay peta. Grid langsung dikonversi ke RGBA (COSTMAP_LUT)
+    di thread ROS; origin dibawa ke frame map (costmap lokal biasanya di frame odom).
+    Pesan tidak disimpan, dan gambar dibuang saat berhenti: layer yang disembunyikan tidak memakan memori.
+    """
+    def __init__(self, topic, transform_to_map):
+        super(RosCostmapListener, self).__init__(topic, preview=LiveMapImage(COSTMAP_LUT))
+        self.transform_to_map = transform_to_map
+
+    def stop(self):
+        super(RosCostmapListener, self).stop()
+        self.preview.clear()
+
+    def _on_map(self, msg):
+        self.seq += 1
+        self.recv_time = time.monotonic()
+        frame = self.transform_to_map(msg.header.frame_id)
+        if frame is None: return
+        try:
+            grid, resolution, origin = occupancy_grid_arrays(msg)
+            x, y = transform_points([origin[:2]], frame)[0]
+            self.preview.set_grid(grid, resolution, (float(x), float(y), origin[2] + frame[2]))
+        except Exception as e:
+            print(f"WARNING: Costmap {self.topic} gagal dikonversi: {e}")
+
+def occupancy_grid_arrays(msg):
+    """OccupancyGrid -> (grid int8 (height, width) baris bawah-ke-atas, resolution, (x, y, yaw) origin)."""
+    info = msg.info
+    grid = np.asarray(msg.data, dtype=np.int8).reshape(info.height, info.width)
+    q = info.origin.orientation
+    _, _, yaw = euler_from_quaternion((q.x, q.y, q.z, q.w))
+    return grid, info.resolution, (info.origin.position.x, info.origin.position.y, yaw)
+
+class RosOverlayFeed(object):
+    """
+    Satu topik overlay peta (plan, scan, dll.) yang hanya di-subscribe selama overlay ditampilkan.
+    Callback ROS hanya menyimpan pesan terbaru; konversi ke NumPy (convert) berjalan di thread feed,
+    paling sering sekali per min_interval, jadi pesan yang datang beruntun cukup dikonversi yang terakhir.
+    Hasil dibaca GUI lewat get() tanpa lock: latest = (seq, value) diganti sebagai satu objek.
+    """
+    def __init__(self, topic, msg_class, convert, min_interval=0.0, queue_size=1):
+        self.topic = topic
+        self.msg_class = msg_class
+        self.convert = convert
+        self.min_interval = min_interval
+        self.queue_size = queue_size
+        self.latest = (0, None)
+        self.recv_time = None
+        self._sub = None
+        self._pending = None
+        self._wake = None
+        self._stop_event = None
+
+    @property
+    def active(self):
+        return self._sub is not None
+
+    def start(self):
+        if not rospy or self._sub is not None: return False
+        self._pending = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        threading.Thread(target=self._convert_loop, args=(self._wake, self._stop_event), daemon=True).start()
+        self._sub = rospy.Subscriber(self.topic, self.msg_class, self._on_msg,
+                                     queue_size=self.queue_size, buff_size=2 ** 24)
+        return True
+
+    def stop(self):
+        if self._sub is None: return
+        self._sub.unregister()
+        self._sub = None
+        self._stop_event.set()
+        self._wake.set()
+        self._pending = None
+        self.latest = (self.latest[0] + 1, None)
+
+    def get(self, since_seq=None):
+        """(seq, value) terbaru, atau None jika seq masih sama dengan since_seq."""
+        latest = self.latest
+        return None if latest[0] == since_seq else latest
+
+    def _on_msg(self, msg):
+        self._pending = msg
+        self._wake.set()
+
+    def _convert_loop(self, wake, stop_event):
+        last = 0.0
+        while not stop_event.is_set():
+            wake.wait()
+            wake.clear()
+            delay = self.min_interval - (time.monotonic() - last)
+            if stop_event.is_set() or (delay > 0 and stop_event.wait(delay)): break
+            msg, self._pending = self._pending, None
+            if msg is None: continue
+            last = time.monotonic()
+            try:
+                value = self.convert(msg)
+            except Exception as e:
+                print(f"WARNING: Overlay {self.topic} gagal dikonversi: {e}")
+                continue
+            if value is None or stop_event.is_set(): continue
+            self.recv_time = last
+            self.latest = (self.latest[0] + 1, value)
 
 class RosManager:
+    POSE_HISTORY_DEPTH = 200
+    ROBOT_RADIUS = 0.25       # meter, jarak minimal goal ke halangan/unknown
+    GOAL_SNAP_RADIUS = 2.0    # meter, jarak maksimal goal digeser ke area aman
+    ROUTE_OPTIMIZE_TIMEOUT = 30.0
+    ROUTE_POSE_TIMEOUT = 10.0
+    ROSCORE_TIMEOUT = 15.0
+    STOP_BURST_COUNT = 10
+    STOP_BURST_INTERVAL = 0.01
+    READY_POLL_INTERVAL = 0.1
+    # Tahapan kesiapan navigasi: (kunci probe, label, timeout detik)
+    NAV_READY_STAGES = (
+        ('master', 'Master ROS', 10.0),
+        ('map_frame', 'Frame map', 30.0),
+        ('move_base', 'Node move_base', 45.0),
+        ('robot_pose', 'Transform map -> base_link', 30.0),
+    )
+
+    # Kebijakan per launch: crash navigasi/controller di-restart, mapping tidak (peta akan hilang)
+    LAUNCH_OPTIONS = {
+        'roscore': {'restart': False},
+        'controller': {'restart': True, 'max_restarts': 3},
+        'navigation': {'restart': True, 'max_restarts': 2, 'quiet': False},
+        'mapping': {'restart': False, 'quiet': False},
+    }
+    # Label status tempat crash / restart dilaporkan
+    LAUNCH_STATUS_LABELS = {
+        'controller': ('controller', 'controller_status_label'),
+        'navigation': ('navigation', 'navigation_status_label'),
+        'mapping': ('mapping', 'mapping_status_label'),
+    }
+    LAUNCH_STOP_TIMEOUT = 2.0
+    MAP_SAVE_TIMEOUT = 5.0
+
+    # Checkpoint peta selama mapping: tiap interval detik atau jika sel berubah >= ambang
+    CHECKPOINT_INTERVAL = 60.0
+    CHECKPOINT_CHANGED_CELLS = 5000
+    CHECKPOINT_KEEP = 3
+    CHECKPOINT_POLL = 5.0
+
+    # Warm standby: keluar dari layar navigasi tidak mematikan move_base/amcl; ganti peta lewat
+    # service map_server (butuh amcl dengan use_map_topic: true agar peta baru ikut dipakai)
+    NAV_WARM_STANDBY = True
+    CHANGE_MAP_SERVICE = '/change_map'
+    GLOBAL_LOCALIZATION_SERVICE = '/global_localization'
+    CLEAR_COSTMAPS_SERVICE = '/move_base/clear_costmaps'
+    SERVICE_TIMEOUT = 2.0
+    # Kovarians awal saat pose awal diambil dari metadata peta (initial_pose: [x, y, yaw])
+    INITIAL_POSE_STDDEV = (0.25, 0.25, math.radians(15))
+    ROSCORE_STOP_TIMEOUT = 1.0
+
+    # Overlay peta: topik hanya di-subscribe selama overlay ditampilkan
+    GLOBAL_PLAN_TOPIC = '/move_base/NavfnROS/plan'  # GlobalPlanner: /move_base/GlobalPlanner/plan
+    GLOBAL_PLAN_INTERVAL = 0.5     # detik, jarak minimal antar konversi plan
+    GLOBAL_PLAN_TOLERANCE = 0.03   # meter, toleransi penyederhanaan Douglas-Peucker
+    SCAN_TOPIC = '/scan'
+    PARTICLE_TOPIC = '/particlecloud'
+    PARTICLE_INTERVAL = 0.2
+    MAX_PARTICLES_DRAWN = 500      # partikel AMCL didesimasi sebelum dikonversi
+    AMCL_POSE_TOPIC = '/amcl_pose'
+    # Lokalisasi dianggap menurun jika salah satu simpangan baku melewati batas ini
+    LOCALIZATION_DEGRADED_STDDEV = 0.5               # meter, sumbu terpanjang elips posisi
+    LOCALIZATION_DEGRADED_YAW = math.radians(25)
+    LOCALIZATION_ELLIPSE_SIGMA = 2.0
+
+    # Instrumentasi latensi (lihat metrics.py)
+    METRICS_FILE = METRICS_FILE
+    METRICS_EXPORT_INTERVAL = 10.0
+    METRICS_HTTP_PORT = None       # mis. 9102: endpoint Prometheus di http://127.0.0.1:9102/metrics
+    FIRST_MOTION_DISTANCE = 0.02   # meter, pergeseran yang dihitung sebagai "robot mulai bergerak"
+    FIRST_MOTION_ANGLE = math.radians(2)
+    FIRST_MOTION_TIMEOUT = 30.0
+    # refresh = detik minimal antar pengambilan perubahan tekstur oleh GUI
+    COSTMAP_LAYERS = {
+        'global_costmap': {'topic': '/move_base/global_costmap/costmap', 'refresh': 1.0},
+        'local_costmap': {'topic': '/move_base/local_costmap/costmap', 'refresh': 0.2},
+    }
+
     def __init__(self, status_callback):
-        self.roscore_process = None
-        self.controller_process = None
-        self.mapping_process = None
-        self.navigation_process = None
-
-        self.is_controller_running = False
-        self.is_mapping_running = False
-        self.is_navigation_running = False
+        self.supervisor = ProcessSupervisor(on_event=self._on_launch_event)
+        self._nav_ready_callback = None
+        self.nav_standby = False
         
         self.status_callback = status_callback
         self.rospack = rospkg.RosPack()
+        self.maps_dir = self._find_maps_dir()
+        self.map_catalog = MapCatalog(self.maps_dir)
+        threading.Thread(target=self.map_catalog.refresh, kwargs={'force': True}, daemon=True).start()
         
         self.current_map_name = None
         self.map_metadata = None
+        self.map_analysis = None
+        self.map_bundles = MapBundleStore(robot_radius=self.ROBOT_RADIUS)
+        self.path_planner = None
+        self.planner_worker = PlannerWorker()
+        self.route_optimizer = RouteOptimizer()
+        self._analysis_key = None
         self.pose_listener = None
         
         self.cmd_vel_pub = None 
         self.goal_pub = None # Publisher untuk Goal Navigasi
+        self.cancel_pub = None # Publisher cancel move_base (dibuat di awal agar siap saat STOP)
+        self.initialpose_pub = None
+        self.map_listener = None # /map terbaru selama mapping (untuk simpan peta in-process)
+        self.live_map = LiveMapImage() # Preview peta di layar mapping
+        self._map_save_thread = None
+        self.checkpointer = MapCheckpointer(interval=self.CHECKPOINT_INTERVAL,
+                                            changed_cells=self.CHECKPOINT_CHANGED_CELLS, keep=self.CHECKPOINT_KEEP)
+        self._checkpoint_stop = threading.Event()
+        self._checkpoint_thread = None
+        self.overlay_feeds = {} # Topik overlay peta (plan, dll.), dibuat saat node ROS siap
+        self.costmap_layers = {}
+        self._costmap_next_refresh = {}
+        self.scan_projector = ScanProjector()
+        self.localization_degraded = False
+        self._sensor_offsets = {} # frame sensor -> pose statis relatif base_link
+        self.move_base_client = None # Client action move_base
+        self.move_base_available = threading.Event() # action server terhubung (diset probe kesiapan)
+        self.active_goal = None
+        self.stop_latencies = deque(maxlen=100)
+        self.metrics = LatencyMetrics()
+        self.metrics.start_exporter(self.METRICS_FILE, self.METRICS_EXPORT_INTERVAL, self.METRICS_HTTP_PORT)
+        self._motion_watch = None # goal terakhir yang ditunggu gerakan pertamanya
+        self._last_drawn_pose_seq = None
+        self._nav_started_at = None
+        self._stop_burst_event = threading.Event()
+
+        self.nav_ready = threading.Event()
+        self._nav_ready_cancel = threading.Event()
         
         self.start_roscore_if_needed()
         self._init_ros_node()
         print("INFO: RosManager siap.")
 
+    @property
+    def is_controller_running(self):
+        return self.supervisor.is_running('controller')
+
+    @property
+    def is_navigation_running(self):
+        return self.supervisor.is_running('navigation')
+
+    @property
+    def is_mapping_running(self):
+        return self.supervisor.is_running('mapping')
+
+    def _start_launch(self, name, command):
+        return self.supervisor.start(name, command, **self.LAUNCH_OPTIONS.get(name, {}))
+
+    def _on_launch_event(self, name, state, launch):
+        """Dipanggil dari thread supervisor saat launch crash / di-restart."""
+        if state == RESTARTING:
+            text = f"PERINGATAN: {name} crash,\nrestart dalam {launch.restart_at - time.monotonic():.0f} detik..."
+        elif state == RUNNING:
+            text = f"INFO: {name} berjalan lagi\n(restart ke-{launch.restarts})"
+        elif state == FAILED:
+            text = f"GAGAL: {name} berhenti (exit {launch.exit_code}).\nKembali ke menu & coba lagi."
+        else:
+            return
+
+        if name == 'navigation':
+            self._nav_ready_cancel.set()
+            self.nav_ready.clear()
+            self.move_base_available.clear()
+            if state == RUNNING and rospy and self.pose_listener and not self.nav_standby:
+                # Node baru: kesiapan dicek ulang dari awal
+                self._start_readiness_check(self._nav_ready_callback)
+        if state != RUNNING and name in ('navigation', 'mapping'):
+            self._send_stop_command()
+
+        screen, label = self.LAUNCH_STATUS_LABELS.get(name, (None, None))
+        if screen and self.status_callback:
+            self.status_callback(screen, label, text)
+
+    def _find_maps_dir(self):
+        try:
+            return os.path.join(self.rospack.get_path('autonomus_mobile_robot'), 'maps')
+        except Exception as e:
+            print(f"WARNING: Paket autonomus_mobile_robot tidak ditemukan ({e}), memakai path default.")
+            return os.path.expanduser("~/catkin_ws/src/autonomus_mobile_robot/maps")
+
     def start_roscore_if_needed(self):
         try:
             subprocess.check_output(["pidof", "roscore"])
         except subprocess.CalledProcessError:
             print("INFO: roscore belum berjalan, memulai di latar belakang...")
             try:
-                self.roscore_process = subprocess.Popen("roscore", preexec_fn=os.setsid, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                time.sleep(4)
+                self._start_launch('roscore', "roscore")
+                start = time.monotonic()
+                if self._wait_for(self._probe_master, self.ROSCORE_TIMEOUT):
+                    print(f"INFO: roscore siap dalam {time.monotonic() - start:.1f} detik.")
+                else:
+                    print(f"ERROR: roscore belum merespon setelah {self.ROSCORE_TIMEOUT:.0f} detik.")
             except Exception as e:
                 print(f"FATAL: Gagal memulai roscore: {e}")
 
+    # --- PROBE KESIAPAN ---
+    def _wait_for(self, probe, timeout, cancel_event=None):
+        """Memanggil probe berulang sampai True, timeout, atau dibatalkan."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if probe(): return True
+            except Exception:
+                pass
+            if time.monotonic() >= deadline: return False
+            if cancel_event:
+                if cancel_event.wait(self.READY_POLL_INTERVAL): return False
+            else:
+                time.sleep(self.READY_POLL_INTERVAL)
+
+    def _tf_listener(self):
+        return self.pose_listener.listener if self.pose_listener else None
+
+    def _probe_master(self):
+        if not rosgraph: return True
+        return rosgraph.is_master_online()
+
+    def _probe_map_frame(self):
+        listener = self._tf_listener()
+        return listener is not None and listener.frameExists('map')
+
+    def _probe_move_base(self):
+        rosgraph.Master(rospy.get_name()).lookupNode('/move_base')
+        if not self.move_base_client: return True
+        # Action server ditunggu di sini (thread latar), send_navigation_goal cukup cek flag
+        if self.move_base_client.wait_for_server(rospy.Duration(self.READY_POLL_INTERVAL)):
+            self.move_base_available.set()
+        return self.move_base_available.is_set()
+
+    def _probe_robot_pose(self):
+        listener = self._tf_listener()
+        return listener is not None and listener.canTransform('map', 'base_link', rospy.Time(0))
+
+    def _report_nav_progress(self, text):
+        if self.status_callback:
+            self.status_callback('navigation', 'navigation_status_label', text)
+
+    def _wait_navigation_ready(self, cancel_event, ready_callback):
+        start = time.monotonic()
+        total = len(self.NAV_READY_STAGES)
+        for index, (key, label, timeout) in enumerate(self.NAV_READY_STAGES, 1):
+            self._report_nav_progress(f"Menyiapkan navigasi ({index}/{total}):\n{label}...")
+            probe = getattr(self, f"_probe_{key}")
+            if not self._wait_for(probe, timeout, cancel_event):
+                if cancel_event.is_set(): return
+                message = f"GAGAL: {label} tidak siap\ndalam {timeout:.0f} detik"
+                print(f"ERROR: Navigasi tidak siap, tahap '{key}' timeout.")
+                self._nav_started_at = None
+                self._report_nav_progress(message)
+                if ready_callback: ready_callback(False, message)
+                return
+
+        if cancel_event.is_set(): return
+        if self.pose_listener:
+            self.pose_listener.start_listening()
+        self.nav_ready.set()
+        self.metrics.observe_since('navigation_start_to_ready_seconds', self._nav_started_at)
+        self._nav_started_at = None
+        message = f"Navigasi siap ({time.monotonic() - start:.1f} detik)"
+        print(f"INFO: {message}")
+        if ready_callback: ready_callback(True, message)
+
     def _init_ros_node(self):
         if not rospy: return
         try:
@@ -112,122 +639,315 @@ class RosManager:
             
             # Publisher Goal (Navigasi)
             self.goal_pub = rospy.Publisher('/move_base_simple/goal', PoseStamped, queue_size=1)
+
+            # Client Action move_base (status & feedback goal)
+            if actionlib:
+                self.move_base_client = actionlib.ActionClient('move_base', MoveBaseAction)
+
+            # Publisher Cancel Goal + thread burst STOP
+            self.cancel_pub = rospy.Publisher('/move_base/cancel', GoalID, queue_size=1)
+
+            # Publisher pose awal AMCL (reinisialisasi lokalisasi setelah ganti peta)
+            self.initialpose_pub = rospy.Publisher('/initialpose', PoseWithCovarianceStamped, queue_size=1, latch=True)
+            self._stop_msg = Twist()
+            threading.Thread(target=self._stop_burst_loop, daemon=True).start()
             
-            self.pose_listener = RosPoseListener()
+            self.map_listener = RosMapListener(preview=self.live_map)
+            self._register_overlays()
+
+            self.pose_listener = RosPoseListener(depth=self.POSE_HISTORY_DEPTH, on_pose=self._on_pose)
             self.pose_listener.start()
             print("INFO: Node ROS, Cmd_vel & Goal Publisher siap.")
         except Exception as e:
             print(f"FATAL: Gagal inisialisasi ROS: {e}")
             self.pose_listener = None
+            self.map_listener = None
             self.cmd_vel_pub = None
             self.goal_pub = None
+            self.cancel_pub = None
 
     # --- FUNGSI NAVIGASI LANGSUNG (NATIVE ROS) ---
-    def send_navigation_goal(self, x, y):
-        """Mengirim koordinat tujuan langsung ke topic ROS /move_base_simple/goal"""
+    GOAL_STATUS_NAMES = {}
+    if actionlib:
+        GOAL_STATUS_NAMES = {
+            GoalStatus.SUCCEEDED: 'succeeded',
+            GoalStatus.ABORTED: 'aborted',
+            GoalStatus.PREEMPTED: 'preempted',
+            GoalStatus.RECALLED: 'preempted',
+            GoalStatus.REJECTED: 'rejected',
+            GoalStatus.LOST: 'lost',
+        }
+
+    def _make_goal_pose(self, x, y):
+        goal = PoseStamped()
+        goal.header.frame_id = "map"
+        goal.header.stamp = rospy.Time.now()
+        
+        # Set Posisi (Meter)
+        goal.pose.position.x = float(x)
+        goal.pose.position.y = float(y)
+        goal.pose.position.z = 0.0
+        
+        # Set Orientasi (W=1.0 artinya netral/lurus)
+        goal.pose.orientation.x = 0.0
+        goal.pose.orientation.y = 0.0
+        goal.pose.orientation.z = 0.0
+        goal.pose.orientation.w = 1.0 
+        return goal
+
+    def send_navigation_goal(self, x, y, on_event=None, on_feedback=None, pressed_at=None):
+        """
+        Mengirim goal ke move_base. Lewat action server jika tersedia (status & feedback
+        dilaporkan ke handle), jika tidak fallback ke topic /move_base_simple/goal.
+        pressed_at (time.monotonic() saat START ditekan) opsional, untuk metrik latensi.
+        Mengembalikan NavigationGoalHandle, atau None jika gagal.
+        """
         if not self.goal_pub:
             print("ERROR: Publisher Goal belum siap (ROS Error)!")
-            return False
+            return None
             
         try:
-            goal = PoseStamped()
-            goal.header.frame_id = "map"
-            goal.header.stamp = rospy.Time.now()
-            
-            # Set Posisi (Meter)
-            goal.pose.position.x = float(x)
-            goal.pose.position.y = float(y)
-            goal.pose.position.z = 0.0
-            
-            # Set Orientasi (W=1.0 artinya netral/lurus)
-            goal.pose.orientation.x = 0.0
-            goal.pose.orientation.y = 0.0
-            goal.pose.orientation.z = 0.0
-            goal.pose.orientation.w = 1.0 
-            
-            self.goal_pub.publish(goal)
+            handle = NavigationGoalHandle(x, y, on_event, on_feedback)
+            pose = self._make_goal_pose(x, y)
+
+            if self.move_base_client and self.move_base_available.is_set():
+                goal = MoveBaseGoal()
+                goal.target_pose = pose
+                handle.tracked = True
+                handle._client_handle = self.move_base_client.send_goal(
+                    goal,
+                    transition_cb=lambda gh: self._on_goal_transition(handle, gh),
+                    feedback_cb=lambda gh, fb: self._on_goal_feedback(handle, fb))
+            else:
+                self.goal_pub.publish(pose)
+            self._watch_first_motion(pressed_at)
+
+            if self.active_goal:
+                self.active_goal.on_event = None
+            self.active_goal = handle
             print(f"SUKSES: Goal dikirim ke ROS -> X:{x}, Y:{y}")
-            return True
+            return handle
         except Exception as e:
             print(f"ERROR saat kirim goal: {e}")
-            return False
+            return None
 
-    def _stop_process_group(self, process, name):
-        # PERBAIKAN INDENTATION DI SINI
-        if process and process.poll() is None:
-            try:
-                os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                try:
-                    process.wait(timeout=0.5)
-                except subprocess.TimeoutExpired:
-                    os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-            except (ProcessLookupError, OSError):
-                pass
-        return None
-    
-    def _send_stop_command(self):
-        print("INFO: Mengirim perintah STOP.")
+    def _on_goal_transition(self, handle, gh):
+        comm_state = gh.get_comm_state()
+        if comm_state == actionlib.CommState.PENDING:
+            handle._set_status('accepted')
+        elif comm_state == actionlib.CommState.ACTIVE:
+            handle._set_status('active')
+        elif comm_state == actionlib.CommState.DONE:
+            handle.result = gh.get_result()
+            status = self.GOAL_STATUS_NAMES.get(gh.get_goal_status(), 'lost')
+            print(f"INFO: Goal ({handle.x:.2f}, {handle.y:.2f}) selesai: {status}")
+            handle._set_status(status)
+
+    def _on_goal_feedback(self, handle, feedback):
+        pos = feedback.base_position.pose.position
+        handle._set_feedback({'x': pos.x, 'y': pos.y})
+
+    def cancel_navigation_goal(self):
+        if self.active_goal:
+            self.active_goal.cancel()
+
+    def _send_stop_command(self, pressed_at=None):
+        """
+        STOP: Twist nol + cancel goal dikirim langsung, sisa burst Twist di thread latar.
+        Latensi hanya dicatat jika pressed_at (saat tombol ditekan) diberikan; STOP internal
+        (crash, ganti mode, target tercapai) tidak punya waktu tekan dan akan menyeret metrik ke 0.
+        """
         if rospy and self.cmd_vel_pub:
-            stop_msg = Twist()
-            for _ in range(10):
-                self.cmd_vel_pub.publish(stop_msg)
-                time.sleep(0.01) 
-        else:
-            stop_cmd = 'rostopic pub -1 /cmd_vel geometry_msgs/Twist "linear: {x: 0.0, y: 0.0, z: 0.0}, angular: {x: 0.0, y: 0.0, z: 0.0}"'
-            subprocess.run(stop_cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.cmd_vel_pub.publish(self._stop_msg)
+            if self.cancel_pub:
+                self.cancel_pub.publish(GoalID())
+            self._motion_watch = None
+            self._stop_burst_event.set()
+            if pressed_at is None:
+                print("INFO: Perintah STOP terkirim.")
+                return
+            latency_ms = (time.monotonic() - pressed_at) * 1000.0
+            self.stop_latencies.append(latency_ms)
+            self.metrics.observe('stop_press_to_publish_seconds', latency_ms / 1000.0)
+            print(f"INFO: Perintah STOP terkirim ({latency_ms:.2f} ms).")
+            return
 
+        print("INFO: Mengirim perintah STOP (rostopic).")
+        stop_cmd = 'rostopic pub -1 /cmd_vel geometry_msgs/Twist "linear: {x: 0.0, y: 0.0, z: 0.0}, angular: {x: 0.0, y: 0.0, z: 0.0}"'
+        subprocess.Popen(stop_cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         cancel_cmd = 'rostopic pub -1 /move_base/cancel actionlib_msgs/GoalID -- {}'
         subprocess.Popen(cancel_cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
+    def emergency_stop(self, pressed_at=None):
+        self._send_stop_command(pressed_at)
+
+    def _stop_burst_loop(self):
+        # Sisa burst Twist nol agar STOP tetap sampai walau satu pesan hilang
+        while True:
+            self._stop_burst_event.wait()
+            self._stop_burst_event.clear()
+            for _ in range(self.STOP_BURST_COUNT - 1):
+                if self._stop_burst_event.is_set(): break  # STOP baru -> burst diulang dari awal
+                try:
+                    self.cmd_vel_pub.publish(self._stop_msg)
+                except Exception:
+                    break
+                time.sleep(self.STOP_BURST_INTERVAL)
+
     # --- CONTROLLER ---
     def start_controller(self, launch_file="controller.launch"):
         if not self.is_controller_running:
-            command = f"roslaunch my_robot_pkg {launch_file}"
-            self.controller_process = subprocess.Popen(command, shell=True, preexec_fn=os.setsid, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            self.is_controller_running = True
+            self._start_launch('controller', f"roslaunch my_robot_pkg {launch_file}")
             return "Status: AKTIF"
         return "Status: Sudah Aktif"
 
     def stop_controller(self):
         if self.is_controller_running:
-            self.controller_process = self._stop_process_group(self.controller_process, "Controller")
-            self.is_controller_running = False
             self._send_stop_command()
+            self.supervisor.stop('controller', self.LAUNCH_STOP_TIMEOUT, wait=False)
         return "Status: DIMATIKAN"
 
     # --- NAVIGATION ---
-    def start_navigation(self, map_name):
-        if not self.is_navigation_running:
-            try:
-                self.current_map_name = map_name
-                pkg_path = self.rospack.get_path('autonomus_mobile_robot')
-                map_file_path = os.path.join(pkg_path, 'maps', f"{map_name}.yaml")
-                
-                command = f"roslaunch autonomus_mobile_robot gui_navigation.launch map_file:={map_file_path}"
-                self.navigation_process = subprocess.Popen(command, shell=True, preexec_fn=os.setsid)
-                self.is_navigation_running = True
-                
-                self.start_controller("controller.launch")
-                
-                if self.pose_listener:
-                    time.sleep(5) 
-                    self.pose_listener.start_listening()
+    def _navigation_command(self, map_name):
+        map_file_path = os.path.join(self.maps_dir, f"{map_name}.yaml")
+        return f"roslaunch autonomus_mobile_robot gui_navigation.launch map_file:={map_file_path}"
+
+    def _start_readiness_check(self, ready_callback, target=None, args=()):
+        self.nav_ready.clear()
+        self.move_base_available.clear()
+        self._nav_ready_callback = ready_callback
+        self._nav_ready_cancel.set()
+        self._nav_ready_cancel = threading.Event()
+        threading.Thread(target=target or self._wait_navigation_ready,
+                         args=args + (self._nav_ready_cancel, ready_callback), daemon=True).start()
 
+    def start_navigation(self, map_name, ready_callback=None):
+        """
+        Menjalankan navigasi tanpa blocking; kesiapan dicek di thread latar.
+        Jika stack navigasi masih hidup (warm standby), peta diganti di tempat tanpa relaunch.
+        """
+        if self.is_navigation_running and not self.nav_standby:
+            return "Status: Navigasi Sudah Aktif"
+        if self._nav_started_at is None:
+            # Fallback relaunch dari _switch_map tetap dihitung dari permintaan awal
+            self._nav_started_at = time.monotonic()
+
+        if self.is_navigation_running and rospy and self.pose_listener:
+            self.nav_standby = False
+            # Controller bisa saja sudah dimatikan dari mode controller selama standby
+            self.start_controller("controller.launch")
+            if map_name == self.current_map_name:
+                self._start_readiness_check(ready_callback)
                 return f"Navigasi dengan peta\n'{map_name}' AKTIF"
-            except Exception as e:
-                print(f"FATAL: Gagal menjalankan navigasi: {e}")
-                return f"GAGAL memulai navigasi!\nError: {e}"
-        return "Status: Navigasi Sudah Aktif"
+            previous, self.current_map_name = self.current_map_name, map_name
+            self.map_metadata = None
+            self._start_readiness_check(ready_callback, self._switch_map, (previous, map_name))
+            return f"Mengganti peta ke\n'{map_name}'..."
+
+        try:
+            self.nav_standby = False
+            self.current_map_name = map_name
+            self._start_launch('navigation', self._navigation_command(map_name))
+            
+            self.start_controller("controller.launch")
+
+            if rospy and self.pose_listener:
+                self._start_readiness_check(ready_callback)
+            else:
+                self.nav_ready.set()
+                self._nav_started_at = None
+                if ready_callback: ready_callback(True, "Navigasi aktif (tanpa ROS)")
+
+            return f"Navigasi dengan peta\n'{map_name}' AKTIF"
+        except Exception as e:
+            print(f"FATAL: Gagal menjalankan navigasi: {e}")
+            return f"GAGAL memulai navigasi!\nError: {e}"
+
+    def _switch_map(self, previous, map_name, cancel_event, ready_callback):
+        """Ganti peta di tempat: change_map -> reset lokalisasi -> clear costmap -> cek kesiapan."""
+        start = time.monotonic()
+        self._report_nav_progress(f"Mengganti peta ke '{map_name}'...")
+        entry = self.map_catalog.get(map_name)
+        if not entry or not self._call_change_map(entry['yaml_path']):
+            if cancel_event.is_set(): return
+            # map_server lama / service tidak ada: relaunch penuh seperti biasa
+            print(f"WARNING: Ganti peta '{previous}' -> '{map_name}' gagal, relaunch navigasi.")
+            self.supervisor.stop(['controller', 'navigation'], self.LAUNCH_STOP_TIMEOUT)
+            self.current_map_name = None
+            self.start_navigation(map_name, ready_callback)
+            return
+
+        # Restart oleh supervisor (jika crash) harus memakai peta yang baru
+        self.supervisor.set_command('navigation', self._navigation_command(map_name))
+        if self.pose_listener:
+            self.pose_listener.stop_listening()
+        self._reset_localization(entry['metadata'])
+        self._call_empty_service(self.CLEAR_COSTMAPS_SERVICE)
+        print(f"INFO: Peta diganti '{previous}' -> '{map_name}' ({time.monotonic() - start:.2f} detik).")
+        if cancel_event.is_set(): return
+        self._wait_navigation_ready(cancel_event, ready_callback)
+
+    def _call_change_map(self, yaml_path):
+        if LoadMap is None: return False
+        try:
+            rospy.wait_for_service(self.CHANGE_MAP_SERVICE, timeout=self.SERVICE_TIMEOUT)
+            response = rospy.ServiceProxy(self.CHANGE_MAP_SERVICE, LoadMap)(yaml_path)
+            if response.result != 0:
+                print(f"ERROR: change_map menolak '{yaml_path}' (kode {response.result}).")
+                return False
+            return True
+        except Exception as e:
+            print(f"ERROR: Service {self.CHANGE_MAP_SERVICE} gagal: {e}")
+            return False
+
+    def _call_empty_service(self, name):
+        try:
+            rospy.wait_for_service(name, timeout=self.SERVICE_TIMEOUT)
+            rospy.ServiceProxy(name, Empty)()
+            return True
+        except Exception as e:
+            print(f"WARNING: Service {name} gagal: {e}")
+            return False
+
+    def _reset_localization(self, metadata):
+        """Pose awal dari metadata peta (initial_pose: [x, y, yaw]) jika ada, jika tidak global localization."""
+        initial = (metadata or {}).get('initial_pose')
+        if initial and self.initialpose_pub:
+            x, y, yaw = (list(initial) + [0.0])[:3]
+            msg = PoseWithCovarianceStamped()
+            msg.header.frame_id = 'map'
+            msg.header.stamp = rospy.Time.now()
+            msg.pose.pose.position.x = float(x)
+            msg.pose.pose.position.y = float(y)
+            msg.pose.pose.orientation.z = math.sin(float(yaw) / 2.0)
+            msg.pose.pose.orientation.w = math.cos(float(yaw) / 2.0)
+            sx, sy, syaw = self.INITIAL_POSE_STDDEV
+            msg.pose.covariance[0] = sx * sx
+            msg.pose.covariance[7] = sy * sy
+            msg.pose.covariance[35] = syaw * syaw
+            self.initialpose_pub.publish(msg)
+            return
+        self._call_empty_service(self.GLOBAL_LOCALIZATION_SERVICE)
         
-    def stop_navigation(self):
+    def stop_navigation(self, pressed_at=None, keep_warm=False):
+        """keep_warm=True (dan NAV_WARM_STANDBY): robot berhenti, tapi move_base/amcl tetap hidup."""
+        self._nav_started_at = None
         if self.is_navigation_running:
+            # STOP dulu, baru proses dimatikan (paralel, di latar; start berikutnya menunggu)
+            self._send_stop_command(pressed_at)
+            self._nav_ready_cancel.set()
+            self.nav_ready.clear()
+            self.move_base_available.clear()
+            self._nav_ready_callback = None
             if self.pose_listener:
                 self.pose_listener.stop_listening()
-           
-            self.stop_controller() 
-            self.navigation_process = self._stop_process_group(self.navigation_process, "Navigation")
-            self.is_navigation_running = False
-            self._send_stop_command()
+
+            if keep_warm and self.NAV_WARM_STANDBY and rospy:
+                self.nav_standby = True
+                return "Status: STANDBY"
+
+            self.nav_standby = False
+            self.supervisor.stop(['controller', 'navigation'], self.LAUNCH_STOP_TIMEOUT, wait=False)
            
             self.current_map_name = None
             self.map_metadata = None
@@ -236,11 +956,20 @@ class RosManager:
     # --- MAPPING ---
     def start_mapping(self, map_name):
         if not self.is_mapping_running:
+            # map_server/amcl (juga yang standby) bentrok dengan SLAM: /map latched lama masuk ke
+            # listener & checkpoint, dan map->odom dipublish ganda. Matikan & tunggu teardown-nya
+            # (juga teardown latar dari keluar mode navigasi sebelumnya) benar-benar selesai.
+            if self.is_navigation_running:
+                self.stop_navigation()
+            if not self.supervisor.wait_stopped(['controller', 'navigation'], self.LAUNCH_STOP_TIMEOUT + 1.0):
+                print("WARNING: Navigasi belum berhenti sepenuhnya, mapping tetap dimulai.")
             self.current_map_name = map_name
             command = "roslaunch autonomus_mobile_robot mapping.launch"
             try:
-                self.mapping_process = subprocess.Popen(command, shell=True, preexec_fn=os.setsid)
-                self.is_mapping_running = True
+                if self.map_listener:
+                    self.map_listener.start()
+                    self._start_checkpointing(map_name)
+                self._start_launch('mapping', command)
                 self.start_controller("mapping_controller.launch")
                 return "Mode Pemetaan AKTIF.\nSilakan gerakkan robot."
             except Exception as e:
@@ -249,83 +978,429 @@ class RosManager:
 
     def stop_mapping(self):
         if self.is_mapping_running:
+            self._stop_checkpointing()
             self._save_map_on_exit()
-            self.stop_controller()
-            self.mapping_process = self._stop_process_group(self.mapping_process, "Mapping")
-            self.is_mapping_running = False
+            if self.map_listener:
+                self.map_listener.stop()
             self._send_stop_command()
+            self.supervisor.stop(['controller', 'mapping'], self.LAUNCH_STOP_TIMEOUT, wait=False)
             self.current_map_name = None
         return "Status: DIMATIKAN"
         
     def cancel_mapping(self):
         if self.is_mapping_running:
-            self.stop_controller()
-            self.mapping_process = self._stop_process_group(self.mapping_process, "Mapping")
-            self.is_mapping_running = False
+            self._stop_checkpointing()
+            self.checkpointer.discard(self.current_map_name)
+            if self.map_listener:
+                self.map_listener.stop()
             self._send_stop_command()
+            self.supervisor.stop(['controller', 'mapping'], self.LAUNCH_STOP_TIMEOUT, wait=False)
             self.current_map_name = None
         return "Status: DIBATALKAN"
 
     # --- UTILS ---
     def _save_map_on_exit(self):
-        if not self.current_map_name: return
+        """Menyimpan /map terakhir ke maps_dir di thread latar; fallback ke map_saver tanpa data /map."""
+        if not self.current_map_name: return None
+        msg = self.map_listener.latest if self.map_listener else None
+        map_save_path = os.path.join(self.maps_dir, self.current_map_name)
+        if msg is None:
+            return self._run_map_saver(map_save_path)
+        thread = threading.Thread(target=self._write_map, args=(msg, map_save_path))
+        thread.start()
+        self._map_save_thread = thread
+        return thread
+
+    def _write_map(self, msg, map_save_path):
+        try:
+            start = time.monotonic()
+            grid, resolution, origin = occupancy_grid_arrays(msg)
+            save_map(map_save_path, occupancy_to_pgm(grid), resolution, origin)
+            print(f"INFO: Peta berhasil disimpan ke {map_save_path} ({(time.monotonic() - start) * 1000:.0f} ms).")
+            # Peta final sudah aman: checkpoint sesi ini tidak diperlukan lagi
+            self.checkpointer.discard(os.path.basename(map_save_path))
+            self.map_catalog.refresh(force=True)
+        except Exception as e:
+            print(f"ERROR: Gagal menyimpan peta: {e}")
+
+    # --- CHECKPOINT MAPPING ---
+    def _start_checkpointing(self, map_name):
+        self._stop_checkpointing()
+        self._checkpoint_stop = threading.Event()
+        self.checkpointer.reset()
+        self._checkpoint_thread = threading.Thread(target=self._checkpoint_loop,
+                                                   args=(map_name, self._checkpoint_stop), daemon=True)
+        self._checkpoint_thread.start()
+
+    def _stop_checkpointing(self):
+        # Ditunggu agar checkpoint yang sedang ditulis tidak muncul lagi setelah sesi dibuang
+        self._checkpoint_stop.set()
+        if self._checkpoint_thread:
+            self._checkpoint_thread.join(self.MAP_SAVE_TIMEOUT)
+            self._checkpoint_thread = None
+
+    def _checkpoint_loop(self, map_name, stop_event):
+        last_seq = None
+        while not stop_event.wait(self.CHECKPOINT_POLL):
+            msg, seq = self.map_listener.latest, self.map_listener.seq
+            if msg is None or seq == last_seq: continue
+            last_seq = seq
+            try:
+                grid, resolution, origin = occupancy_grid_arrays(msg)
+                path = self.checkpointer.maybe_checkpoint(map_name, grid, resolution, origin)
+                if path:
+                    print(f"INFO: Checkpoint peta '{map_name}' disimpan ({os.path.basename(path)}).")
+            except Exception as e:
+                print(f"ERROR: Checkpoint peta gagal: {e}")
+
+    def get_live_map_changes(self):
+        """Bagian preview peta yang berubah sejak panggilan terakhir (lihat LiveMapImage.take_changes)."""
+        return self.live_map.take_changes()
+
+    def get_map_checkpoints(self):
+        """Sesi mapping yang terputus (checkpoint tersisa), terbaru dulu."""
+        return self.checkpointer.pending()
+
+    def restore_map_checkpoint(self, map_name):
+        try:
+            yaml_path = self.checkpointer.restore(map_name, self.maps_dir)
+        except Exception as e:
+            print(f"ERROR: Gagal memulihkan checkpoint '{map_name}': {e}")
+            return None
+        self.map_catalog.refresh(force=True)
+        return yaml_path
+
+    def discard_map_checkpoint(self, map_name):
+        self.checkpointer.discard(map_name)
+
+    def _run_map_saver(self, map_save_path):
         try:
-            pkg_path = self.rospack.get_path('autonomus_mobile_robot')
-            map_save_path = os.path.join(pkg_path, 'maps', self.current_map_name)
             command = f"rosrun map_server map_saver -f {map_save_path}"
             subprocess.run(command, shell=True, check=True, timeout=15, capture_output=True, text=True)
             print("INFO: Peta berhasil disimpan!")
         except Exception as e:
             print(f"ERROR: Gagal menyimpan peta saat keluar: {e}")
+        return None
 
     def shutdown(self):
         print("INFO: Shutdown dipanggil...")
+        self._send_stop_command()
+        self._nav_ready_cancel.set()
+        for source in list(self.overlay_feeds.values()) + list(self.costmap_layers.values()):
+            source.stop()
+        self.metrics.stop_exporter()
+        report = self.metrics.report()
+        if report:
+            print(f"INFO: Latensi:\n{report}")
         if self.pose_listener:
             self.pose_listener.stop_thread()
             self.pose_listener.join()
+        if self.is_mapping_running:
+            self._stop_checkpointing()
+            self._save_map_on_exit()
         
-        self.stop_mapping()
-        self.stop_navigation()
-        self.stop_controller() 
-        self._send_stop_command()
-        
-        if self.roscore_process:
-            self._stop_process_group(self.roscore_process, "roscore")
+        # Semua launch dimatikan bersamaan dengan satu deadline, roscore paling akhir
+        self.supervisor.stop_all(self.LAUNCH_STOP_TIMEOUT, exclude=('roscore',))
+        if self._map_save_thread:
+            self._map_save_thread.join(self.MAP_SAVE_TIMEOUT)
+        self.supervisor.shutdown(self.ROSCORE_STOP_TIMEOUT)
     
     def get_robot_pose(self):
         if self.pose_listener:
             return self.pose_listener.get_pose()
         return None
 
+    # --- INSTRUMENTASI LATENSI ---
+    def _watch_first_motion(self, pressed_at):
+        published_at = time.monotonic()
+        if pressed_at is not None:
+            self.metrics.observe('goal_tap_to_publish_seconds', published_at - pressed_at)
+        self._motion_watch = {'pressed_at': pressed_at, 'published_at': published_at, 'pose': self.get_robot_pose()}
+
+    def _on_pose(self, pose):
+        """Thread ROS: umur stamp TF + deteksi gerakan pertama setelah goal terkirim."""
+        self.metrics.observe('pose_tf_to_listener_seconds', pose['tf_age'])
+        watch = self._motion_watch
+        if watch is None: return
+        if pose['recv_time'] - watch['published_at'] > self.FIRST_MOTION_TIMEOUT:
+            self._motion_watch = None
+            return
+        start = watch['pose']
+        if start is None:
+            watch['pose'] = pose
+            return
+        turn = abs((pose['yaw'] - start['yaw'] + math.pi) % (2 * math.pi) - math.pi)
+        if (math.hypot(pose['x'] - start['x'], pose['y'] - start['y']) < self.FIRST_MOTION_DISTANCE
+                and turn < self.FIRST_MOTION_ANGLE):
+            return
+        self._motion_watch = None
+        self.metrics.observe('goal_publish_to_motion_seconds', pose['recv_time'] - watch['published_at'])
+        if watch['pressed_at'] is not None:
+            self.metrics.observe('goal_tap_to_motion_seconds', pose['recv_time'] - watch['pressed_at'])
+
+    def record_pose_drawn(self, pose):
+        """Dipanggil GUI setelah pose digambar; tiap pose (seq) hanya dihitung sekali."""
+        if pose['seq'] == self._last_drawn_pose_seq: return
+        self._last_drawn_pose_seq = pose['seq']
+        waited = time.monotonic() - pose['recv_time']
+        self.metrics.observe('pose_listener_to_draw_seconds', waited)
+        if 'tf_age' in pose:
+            self.metrics.observe('pose_age_at_draw_seconds', pose['tf_age'] + waited)
+
+    def get_robot_pose_history(self, n):
+        if self.pose_listener:
+            return self.pose_listener.get_pose_history(n)
+        return []
+
     def get_available_maps(self):
-        try:
-            pkg_path = self.rospack.get_path('autonomus_mobile_robot')
-            maps_dir = os.path.join(pkg_path, 'maps')
-            map_files = glob.glob(os.path.join(maps_dir, '*.yaml'))
-            return [os.path.splitext(os.path.basename(f))[0] for f in map_files]
-        except Exception:
-            return []
+        return self.map_catalog.names()
 
     def get_map_image_path(self, map_name):
+        entry = self.map_catalog.get(map_name)
+        if not entry: return None
+        if entry['display_path'] != entry['image_path']:
+            print (f"INFO: Memuat peta visualisasi pgm untuk {map_name}")
+        return entry['display_path']
+
+    def load_map_metadata(self, map_name):
+        entry = self.map_catalog.get(map_name)
+        self.map_metadata = entry['metadata'] if entry else None
+        if entry:
+            self.load_map_analysis(entry)
+
+    # --- ANALISIS PETA (free space & distance field) ---
+    def load_map_analysis(self, entry):
+        """Membangun OccupancyMap peta (bukan gambar visualisasi) di thread latar, sekali per mtime."""
+        key = (entry['image_path'], entry['mtime'])
+        if key == self._analysis_key: return
+        self._analysis_key = key
+        self.map_analysis = None
+        self.path_planner = None
+        if not entry['image_path']: return
+        threading.Thread(target=self._build_map_analysis, args=(key, entry), daemon=True).start()
+
+    def _build_map_analysis(self, key, entry):
         try:
-            pkg_path = self.rospack.get_path('autonomus_mobile_robot')
-            TARGET_EXPERIMENT_MAP ='test1'
-            if map_name == TARGET_EXPERIMENT_MAP:
-                pgm_point_path = os.path.join(pkg_path, 'maps', f"{map_name}edited.pgm")
-                if os.path.exists(pgm_point_path):
-                   print (f"INFO: Memuat peta visualisasi pgm untuk {map_name}")
-                   return pgm_point_path
-    
-            path = os.path.join(pkg_path, 'maps', f"{map_name}.pgm")
-            return path if os.path.exists(path) else None
-        except Exception as e: 
-            print (f"Error getting map path: {e}")
+            start = time.monotonic()
+            analysis = self._load_analysis_from_bundle(entry)
+            if analysis is None:
+                analysis = OccupancyMap(load_pgm(entry['image_path']), entry['metadata'], robot_radius=self.ROBOT_RADIUS)
+            planner = GridPlanner(analysis)
+        except Exception as e:
+            print(f"ERROR: Analisis peta '{entry['name']}' gagal: {e}")
+            return
+        if key == self._analysis_key:
+            self.map_analysis = analysis
+            self.path_planner = planner
+            print(f"INFO: Analisis peta '{entry['name']}' siap ({time.monotonic() - start:.2f} detik).")
+
+    def _load_analysis_from_bundle(self, entry):
+        """Distance field & mask dari bundle (.mapb); bundle dibuat otomatis jika belum ada / basi."""
+        try:
+            bundle = self.map_bundles.load(entry)
+            return bundle.occupancy_map(self.ROBOT_RADIUS) if bundle else None
+        except Exception as e:
+            print(f"WARNING: Bundle peta '{entry['name']}' tidak bisa dipakai: {e}")
             return None
 
-    def load_map_metadata(self, map_name):
+    def load_display_pixels(self, path):
+        """Piksel tampilan (top-down) untuk path gambar peta: dari bundle jika ada, jika tidak dari PGM."""
+        entry = self.map_catalog.find_by_display_path(path)
+        if entry:
+            try:
+                # Tanpa build: bundle dibuat oleh thread analisis, tampilan tidak ikut menunggu
+                bundle = self.map_bundles.load(entry, build=False)
+                if bundle:
+                    overlay = bundle.overlay
+                    return overlay if overlay is not None else bundle.display
+            except Exception as e:
+                print(f"WARNING: Bundle peta '{entry['name']}' tidak bisa dipakai: {e}")
+        return load_pgm(path, mmap=True)
+
+    def validate_goal(self, x, y):
+        """('ok'|'snapped'|'invalid'|'unchecked', (x, y) atau None) - cek O(1) terhadap peta statis."""
+        analysis = self.map_analysis
+        if analysis is None:
+            return 'unchecked', (x, y)
+        return analysis.validate_goal(x, y, self.GOAL_SNAP_RADIUS)
+
+    # --- PREVIEW JALUR ---
+    def request_path_preview(self, x, y, callback):
+        """
+        Menghitung jalur dari pose robot ke (x, y) di thread planner; callback(result) dipanggil
+        dari thread itu dengan PlanResult atau None. False jika planner/pose belum tersedia.
+        """
+        planner = self.path_planner
+        pose = self.get_robot_pose()
+        if planner is None or not pose: return False
+        self.planner_worker.submit(planner, (pose['x'], pose['y']), (x, y), callback)
+        return True
+
+    def prepare_path_preview(self):
+        """Menyiapkan medan jarak dari pose robot sekarang agar preview berikutnya instan."""
+        planner = self.path_planner
+        pose = self.get_robot_pose()
+        if planner is None or not pose: return False
+        self.planner_worker.prepare(planner, (pose['x'], pose['y']))
+        return True
+
+    # --- OPTIMASI URUTAN RUTE ---
+    def optimize_visit_order(self, waypoints, callback):
+        """
+        Mengurutkan waypoint (jarak jalur terpendek dari pose robot) di thread latar.
+        callback((waypoint terurut, panjang meter, waypoint tak terjangkau)) atau callback(None) jika
+        peta tidak siap (lihat RouteOptimizer.optimize).
+        """
+        threading.Thread(target=self._optimize_visit_order, args=(list(waypoints), callback), daemon=True).start()
+
+    def _optimize_visit_order(self, waypoints, callback):
+        if not self._wait_for(lambda: self.path_planner is not None, self.ROUTE_OPTIMIZE_TIMEOUT):
+            print("WARNING: Peta belum siap, urutan rute tidak dioptimalkan.")
+            callback(None)
+            return
+        planner, map_key = self.path_planner, self._analysis_key
+        # Pose robot opsional: tanpa pose, titik awal dipilih bebas
+        self._wait_for(lambda: self.get_robot_pose() is not None, self.ROUTE_POSE_TIMEOUT)
+        pose = self.get_robot_pose()
+        start = (pose['x'], pose['y']) if pose else None
         try:
-            pkg_path = self.rospack.get_path('autonomus_mobile_robot')
-            with open(os.path.join(pkg_path, 'maps', f"{map_name}.yaml"), 'r') as f:
-                self.map_metadata = yaml.safe_load(f)
-        except Exception:
-            self.map_metadata = None
+            t0 = time.monotonic()
+            result = self.route_optimizer.optimize(planner, map_key, waypoints, start)
+            print(f"INFO: Urutan rute dioptimalkan ({time.monotonic() - t0:.2f} detik).")
+        except Exception as e:
+            print(f"ERROR: Optimasi rute gagal: {e}")
+            result = None
+        callback(result)
+
+    # --- OVERLAY PETA (plan, costmap, dll.) ---
+    def _register_overlays(self):
+        self.overlay_feeds['global_plan'] = RosOverlayFeed(
+            self.GLOBAL_PLAN_TOPIC, Path, self._convert_global_plan, self.GLOBAL_PLAN_INTERVAL)
+        for name, config in self.COSTMAP_LAYERS.items():
+            self.costmap_layers[name] = RosCostmapListener(config['topic'], self._transform_to_map)
+        # Tanpa batas interval: setiap scan dikonversi (< 0.1 ms), GUI menggambar yang terbaru
+        self.overlay_feeds['scan'] = RosOverlayFeed(self.SCAN_TOPIC, LaserScan, self._convert_scan)
+        self.overlay_feeds['particles'] = RosOverlayFeed(
+            self.PARTICLE_TOPIC, PoseArray, self._convert_particles, self.PARTICLE_INTERVAL)
+        self.overlay_feeds['localization'] = RosOverlayFeed(
+            self.AMCL_POSE_TOPIC, PoseWithCovarianceStamped, self._convert_localization)
+
+    def set_overlay_enabled(self, name, enabled):
+        """Subscribe/unsubscribe topik overlay; overlay yang mati tidak memakan CPU sama sekali."""
+        source = self.overlay_feeds.get(name) or self.costmap_layers.get(name)
+        if source is None: return False
+        if enabled:
+            self._costmap_next_refresh.pop(name, None)
+            return source.start()
+        source.stop()
+        return True
+
+    def get_costmap_changes(self, name):
+        """
+        (perubahan LiveMapImage.take_changes(), (resolution, origin di frame map)) untuk layer costmap,
+        paling sering sekali per 'refresh' detik layer itu; None jika belum waktunya / tidak ada perubahan.
+        """
+        layer = self.costmap_layers.get(name)
+        if layer is None or not layer.active: return None
+        now = time.monotonic()
+        if now < self._costmap_next_refresh.get(name, 0.0): return None
+        changes = layer.preview.take_changes()
+        if changes is None: return None
+        self._costmap_next_refresh[name] = now + self.COSTMAP_LAYERS[name]['refresh']
+        return changes, layer.preview.placement()
+
+    def get_overlay(self, name, since_seq=None):
+        """(seq, data) overlay terbaru, atau None jika belum ada yang baru sejak since_seq."""
+        feed = self.overlay_feeds.get(name)
+        return feed.get(since_seq) if feed else None
+
+    def _transform_to_map(self, frame_id):
+        """Pose (x, y, yaw) frame_id di frame map saat ini, atau None jika TF belum tersedia."""
+        frame_id = frame_id.lstrip('/')
+        if not frame_id or frame_id == 'map':
+            return (0.0, 0.0, 0.0)
+        listener = self._tf_listener()
+        if listener is None: return None
+        try:
+            trans, rot = listener.lookupTransform('map', frame_id, rospy.Time(0))
+        except (tf.Exception, tf.LookupException, tf.ConnectivityException, tf.ExtrapolationException):
+            return None
+        _, _, yaw = euler_from_quaternion(rot)
+        return (trans[0], trans[1], yaw)
+
+    def _convert_global_plan(self, msg):
+        """nav_msgs/Path -> array Nx2 (meter, frame map) yang sudah disederhanakan."""
+        if not msg.poses:
+            return np.empty((0, 2))
+        transform = self._transform_to_map(msg.header.frame_id)
+        if transform is None: return None
+        points = np.array([(p.pose.position.x, p.pose.position.y) for p in msg.poses], dtype=np.float64)
+        if transform != (0.0, 0.0, 0.0):
+            points = transform_points(points, transform)
+        return douglas_peucker_array(points, self.GLOBAL_PLAN_TOLERANCE)
+
+    def _sensor_offset(self, frame_id):
+        """Pose statis frame sensor relatif base_link (di-cache, sensor terpasang tetap di robot)."""
+        frame_id = frame_id.lstrip('/')
+        offset = self._sensor_offsets.get(frame_id)
+        if offset is not None: return offset
+        listener = self._tf_listener()
+        robot_frame = self.pose_listener.robot_frame if self.pose_listener else 'base_link'
+        if listener is None: return None
+        if frame_id == robot_frame:
+            offset = (0.0, 0.0, 0.0)
+        else:
+            try:
+                trans, rot = listener.lookupTransform(robot_frame, frame_id, rospy.Time(0))
+            except (tf.Exception, tf.LookupException, tf.ConnectivityException, tf.ExtrapolationException):
+                return None
+            offset = (trans[0], trans[1], euler_from_quaternion(rot)[2])
+        self._sensor_offsets[frame_id] = offset
+        return offset
+
+    def _convert_scan(self, msg):
+        """LaserScan -> array Nx2 float32 (meter, frame map) memakai pose robot terbaru dari RosPoseListener."""
+        pose = self.get_robot_pose()
+        offset = self._sensor_offset(msg.header.frame_id)
+        if pose is None or offset is None: return None
+        sensor_pose = compose_poses((pose['x'], pose['y'], pose['yaw']), offset)
+        return self.scan_projector.project(msg.ranges, msg.angle_min, msg.angle_increment,
+                                           msg.range_min, msg.range_max, sensor_pose)
+
+    def _convert_particles(self, msg):
+        """PoseArray AMCL -> array Nx2 (frame map), didesimasi ke MAX_PARTICLES_DRAWN sebelum dibaca."""
+        transform = self._transform_to_map(msg.header.frame_id)
+        if transform is None: return None
+        step = max(1, -(-len(msg.poses) // self.MAX_PARTICLES_DRAWN))
+        poses = msg.poses[::step]
+        points = np.array([(p.position.x, p.position.y) for p in poses], dtype=np.float64).reshape(-1, 2)
+        if transform != (0.0, 0.0, 0.0):
+            points = transform_points(points, transform)
+        return points
+
+    def _convert_localization(self, msg):
+        """
+        PoseWithCovarianceStamped AMCL -> {'ellipse', 'stddev', 'yaw_stddev', 'degraded'} (frame map).
+        Status 'degraded' juga disimpan di self.localization_degraded dan dicatat saat berubah.
+        """
+        transform = self._transform_to_map(msg.header.frame_id)
+        if transform is None: return None
+        cov = msg.pose.covariance
+        position = msg.pose.pose.position
+        center = (position.x, position.y)
+        cov_xy = np.array([[cov[0], cov[1]], [cov[6], cov[7]]])
+        if transform != (0.0, 0.0, 0.0):
+            center = compose_poses(transform, (position.x, position.y, 0.0))[:2]
+            c, s = math.cos(transform[2]), math.sin(transform[2])
+            rotation = np.array([[c, -s], [s, c]])
+            cov_xy = rotation @ cov_xy @ rotation.T
+        ellipse, stddev = covariance_ellipse(center, cov_xy, self.LOCALIZATION_ELLIPSE_SIGMA)
+        yaw_stddev = math.sqrt(max(cov[35], 0.0))
+        degraded = stddev > self.LOCALIZATION_DEGRADED_STDDEV or yaw_stddev > self.LOCALIZATION_DEGRADED_YAW
+        if degraded != self.localization_degraded:
+            self.localization_degraded = degraded
+            if degraded:
+                print(f"WARNING: Lokalisasi menurun (±{stddev:.2f} m, ±{math.degrees(yaw_stddev):.0f}°).")
+            else:
+                print("INFO: Lokalisasi kembali normal.")
+        return {'ellipse': ellipse, 'stddev': stddev, 'yaw_stddev': yaw_stddev, 'degraded': degraded}
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Format bundle peta (.mapb): satu file berisi semua yang dibutuhkan GUI untuk satu peta.
+
+    MAGIC (8 byte) | panjang index (uint32 LE) | index JSON | padding | section...
+
+Setiap section rata 64 byte dan dicatat di index (offset, nbytes, dtype, shape, codec):
+- raw      : array apa adanya, dibaca sebagai view memmap (tidak ada decode)
+- packbits : mask bool dipadatkan 1 bit/sel (np.packbits), di-unpack saat pertama diakses
+- zlib     : array terkompresi zlib, didekompresi saat pertama diakses
+
+Section: free & occupied (packbits, baris 0 = bawah), display (zlib, gambar PGM top-down),
+overlay (zlib, gambar visualisasi opsional), distance (zlib, uint16 = sel x DISTANCE_SCALE),
+thumbnail (raw). Gambar peta didominasi area seragam (bebas / unknown), jadi zlib membuat bundle
+lebih kecil dari PGM-nya; decode sekali (~puluhan ms per 4 MP) terjadi di thread decode tekstur.
+Bundle dibuat otomatis dari PGM + YAML dan dibuat ulang jika sumbernya atau parameternya
+(max_distance, robot_radius) berubah.
+"""
+import json
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from map_tools import CACHE_DIR, OccupancyMap, write_atomic, load_pgm
+
+MAGIC = b'MAPBNDL1'
+VERSION = 1
+ALIGN = 64
+DISTANCE_SCALE = 16
+THUMBNAIL_SIZE = 256
+BUNDLE_DIR = os.path.join(CACHE_DIR, 'bundles')
+
+
+def make_thumbnail(pixels, max_size=THUMBNAIL_SIZE):
+    """Thumbnail dengan min-pooling (dinding tipis tetap terlihat)."""
+    h, w = pixels.shape
+    step = max(1, -(-max(h, w) // max_size))
+    th, tw = h // step, w // step
+    if step == 1 or th == 0 or tw == 0:
+        return np.ascontiguousarray(pixels)
+    return np.ascontiguousarray(pixels[:th * step, :tw * step].reshape(th, step, tw, step).min(axis=(1, 3)))
+
+
+def _source_stamp(path):
+    if not path: return None
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_mtime, stat.st_size]
+
+
+def build_bundle(path, entry, robot_radius=0.25, max_distance=1.0):
+    """Membuat bundle dari entry MapCatalog (YAML + PGM + gambar visualisasi opsional)."""
+    metadata = entry['metadata']
+    pixels = load_pgm(entry['image_path'])
+    analysis = OccupancyMap(pixels, metadata, robot_radius=robot_radius, max_distance=max_distance)
+    distance_cells = np.round(analysis.distance / analysis.resolution * DISTANCE_SCALE)
+    distance_cells = np.minimum(distance_cells, np.iinfo(np.uint16).max).astype(np.uint16)
+
+    sections = [
+        ('free', 'packbits', analysis.free),
+        ('occupied', 'packbits', analysis.occupied),
+        ('display', 'zlib', np.ascontiguousarray(pixels)),
+        ('distance', 'zlib', distance_cells),
+        ('thumbnail', 'raw', make_thumbnail(pixels)),
+    ]
+    overlay_path = entry.get('display_path')
+    if overlay_path and overlay_path != entry['image_path'] and overlay_path.endswith('.pgm'):
+        sections.append(('overlay', 'zlib', np.ascontiguousarray(load_pgm(overlay_path))))
+
+    index = {
+        'version': VERSION,
+        'name': entry['name'],
+        'metadata': metadata,
+        'sources': {
+            'yaml': _source_stamp(entry['yaml_path']),
+            'image': _source_stamp(entry['image_path']),
+            'overlay': _source_stamp(overlay_path) if overlay_path != entry['image_path'] else None,
+        },
+        'max_distance': max_distance,
+        'robot_radius': robot_radius,
+        'sections': {},
+    }
+    payloads = []
+    for name, codec, array in sections:
+        if codec == 'packbits':
+            data = np.packbits(array, axis=None).tobytes()
+        elif codec == 'zlib':
+            data = zlib.compress(array.tobytes(), 6)
+        else:
+            data = array.tobytes()
+        index['sections'][name] = {'codec': codec, 'dtype': array.dtype.str, 'shape': list(array.shape),
+                                   'nbytes': len(data)}
+        payloads.append((name, data))
+
+    # Offset dihitung setelah ukuran index diketahui (index ikut berubah panjang saat offset diisi)
+    header_size = 0
+    while True:
+        offset = _align(len(MAGIC) + 4 + header_size)
+        for name, data in payloads:
+            index['sections'][name]['offset'] = offset
+            offset = _align(offset + len(data))
+        encoded = json.dumps(index, default=float).encode('utf-8')
+        if len(encoded) == header_size: break
+        header_size = len(encoded)
+
+    parts = [MAGIC, struct.pack('<I', len(encoded)), encoded]
+    position = len(MAGIC) + 4 + len(encoded)
+    for name, data in payloads:
+        start = index['sections'][name]['offset']
+        parts.append(b'\0' * (start - position))
+        parts.append(data)
+        position = start + len(data)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    write_atomic(path, b''.join(parts))
+    return path
+
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+class MapBundle(object):
+    """Pembaca bundle: hanya index yang di-parse saat dibuka; section dibaca lewat memmap saat diakses."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} bukan map bundle")
+            (length,) = struct.unpack('<I', f.read(4))
+            self.index = json.loads(f.read(length).decode('utf-8'))
+        if self.index.get('version') != VERSION:
+            raise ValueError(f"Versi bundle {self.index.get('version')} tidak didukung")
+        self.metadata = self.index['metadata']
+        self._mmap = np.memmap(path, dtype=np.uint8, mode='r')
+        self._decoded = {}
+        self._lock = threading.Lock()
+
+    def has(self, name):
+        return name in self.index['sections']
+
+    def section(self, name):
+        """Array section `name` (view memmap untuk raw; hasil decode di-cache untuk yang lain)."""
+        spec = self.index['sections'][name]
+        raw = self._mmap[spec['offset']:spec['offset'] + spec['nbytes']]
+        shape = tuple(spec['shape'])
+        if spec['codec'] == 'raw':
+            return raw.view(np.dtype(spec['dtype'])).reshape(shape)
+        with self._lock:
+            array = self._decoded.get(name)
+            if array is None:
+                if spec['codec'] == 'packbits':
+                    array = np.unpackbits(raw, count=int(np.prod(shape))).reshape(shape).astype(bool)
+                else:
+                    array = np.frombuffer(zlib.decompress(raw), dtype=np.dtype(spec['dtype'])).reshape(shape)
+                self._decoded[name] = array
+            return array
+
+    @property
+    def display(self):
+        return self.section('display')
+
+    @property
+    def overlay(self):
+        return self.section('overlay') if self.has('overlay') else None
+
+    @property
+    def thumbnail(self):
+        return self.section('thumbnail')
+
+    def occupancy_map(self, robot_radius=None):
+        if robot_radius is None:
+            robot_radius = self.index.get('robot_radius', 0.25)
+        resolution = float(self.metadata['resolution'])
+        distance = self.section('distance').astype(np.float32) * (resolution / DISTANCE_SCALE)
+        return OccupancyMap.from_fields(self.metadata, self.section('free'), self.section('occupied'),
+                                        distance, robot_radius)
+
+    def is_current(self, entry, max_distance, robot_radius):
+        """True jika bundle dibuat dari file sumber yang sama (mtime & ukuran) dan parameter sama."""
+        overlay_path = entry.get('display_path')
+        try:
+            sources = {
+                'yaml': _source_stamp(entry['yaml_path']),
+                'image': _source_stamp(entry['image_path']),
+                'overlay': _source_stamp(overlay_path) if overlay_path != entry['image_path'] else None,
+            }
+        except OSError:
+            return False
+        return (self.index['sources'] == sources and self.index.get('max_distance') == max_distance
+                and self.index.get('robot_radius') == robot_radius)
+
+
+class MapBundleStore(object):
+    """
+    Bundle per peta di BUNDLE_DIR; dibuat (ulang) otomatis saat belum ada atau sumbernya berubah.
+    Pembuatan bundle (detik untuk peta besar) berjalan di luar lock: lock hanya melindungi _open
+    dan _building, jadi pemanggil lain untuk peta berbeda tidak ikut menunggu.
+    """
+    def __init__(self, bundle_dir=BUNDLE_DIR, robot_radius=0.25, max_distance=1.0):
+        self.bundle_dir = bundle_dir
+        self.robot_radius = robot_radius
+        self.max_distance = max_distance
+        self._open = {}
+        self._building = set() # path bundle yang sedang dibuat
+        self._lock = threading.Lock()
+        self._built = threading.Condition(self._lock)
+
+    def bundle_path(self, entry):
+        return os.path.join(self.bundle_dir, f"{entry['name']}.mapb")
+
+    def _cached(self, path, entry):
+        bundle = self._open.get(path)
+        if bundle is not None and bundle.is_current(entry, self.max_distance, self.robot_radius):
+            return bundle
+        return None
+
+    def _open_current(self, path, entry):
+        if not os.path.exists(path): return None
+        try:
+            bundle = MapBundle(path)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Bundle '{path}' rusak, dibuat ulang: {e}")
+            return None
+        return bundle if bundle.is_current(entry, self.max_distance, self.robot_radius) else None
+
+    def load(self, entry, build=True):
+        """
+        Bundle yang up to date untuk entry. build=False: None daripada membuat bundle (mahal),
+        termasuk saat bundle peta itu sedang dibuat thread lain.
+        """
+        if not entry or not entry.get('image_path'): return None
+        path = self.bundle_path(entry)
+        with self._lock:
+            bundle = self._cached(path, entry)
+            if bundle is not None: return bundle
+            if not build and path in self._building: return None
+
+        # Membuka bundle yang ada hanya mem-parse index, aman di luar lock
+        bundle = self._open_current(path, entry)
+        if bundle is None:
+            if not build: return None
+            with self._built:
+                # Satu pembuat per path; yang lain menunggu hasilnya
+                while path in self._building:
+                    self._built.wait()
+                bundle = self._cached(path, entry)
+                if bundle is not None: return bundle
+                self._building.add(path)
+            try:
+                # build_bundle menulis ke file sementara lalu rename (write_atomic)
+                build_bundle(path, entry, self.robot_radius, self.max_distance)
+                bundle = MapBundle(path)
+            finally:
+                with self._built:
+                    # _open diisi sebelum penunggu dibangunkan, agar mereka tidak membuat ulang
+                    if bundle is not None:
+                        self._open[path] = bundle
+                    self._building.discard(path)
+                    self._built.notify_all()
+            return bundle
+        with self._lock:
+            self._open[path] = bundle
+        return bundle
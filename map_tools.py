@@ -0,0 +1,902 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import yaml
+
+# SciPy opsional: distance transform Euclid yang cepat & eksak
+try:
+    from scipy import ndimage
+except ImportError:
+    ndimage = None
+
+# Folder cache turunan peta (matriks jarak rute, dll.) - aman dihapus kapan saja
+CACHE_DIR = os.path.expanduser('~/.ros/kivy_gui_cache')
+
+
+def douglas_peucker(points, tolerance):
+    """Menyederhanakan polyline [(x, y), ...] dengan toleransi (satuan sama dengan titik)."""
+    if len(points) < 3 or tolerance <= 0:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    tol_sq = tolerance * tolerance
+
+    # Versi iteratif agar tidak kena batas rekursi di jejak yang panjang
+    while stack:
+        first, last = stack.pop()
+        ax, ay = points[first]
+        bx, by = points[last]
+        dx, dy = bx - ax, by - ay
+        seg_sq = dx * dx + dy * dy
+
+        max_dist_sq = -1.0
+        index = first
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if seg_sq == 0:
+                dist_sq = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                cross = dx * (py - ay) - dy * (px - ax)
+                dist_sq = cross * cross / seg_sq
+            if dist_sq > max_dist_sq:
+                max_dist_sq = dist_sq
+                index = i
+
+        if max_dist_sq > tol_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+def douglas_peucker_array(points, tolerance):
+    """douglas_peucker untuk array Nx2 yang panjang: jarak satu segmen ke semua titiknya dihitung sekaligus."""
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(pts) < 3 or tolerance <= 0:
+        return pts
+
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(pts) - 1)]
+    tol_sq = tolerance * tolerance
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2: continue
+        start = pts[first]
+        dx, dy = pts[last] - start
+        seg_sq = dx * dx + dy * dy
+        rel = pts[first + 1:last] - start
+        if seg_sq == 0:
+            dist_sq = np.einsum('ij,ij->i', rel, rel)
+        else:
+            cross = dx * rel[:, 1] - dy * rel[:, 0]
+            dist_sq = cross * cross / seg_sq
+        i = int(np.argmax(dist_sq))
+        if dist_sq[i] > tol_sq:
+            index = first + 1 + i
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return pts[keep]
+
+
+def transform_points(points, pose):
+    """Titik Nx2 di frame lokal -> frame induk, pose = (x, y, yaw) frame lokal di frame induk."""
+    x, y, yaw = pose
+    c, s = math.cos(yaw), math.sin(yaw)
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return pts @ np.array([[c, s], [-s, c]]) + (x, y)
+
+
+def compose_poses(parent, child):
+    """Pose child (relatif terhadap parent) dinyatakan di frame induk parent; pose = (x, y, yaw)."""
+    x, y = transform_points([child[:2]], parent)[0]
+    return (float(x), float(y), parent[2] + child[2])
+
+
+_UNIT_CIRCLE = {}
+
+
+def covariance_ellipse(center, cov_xy, sigma=2.0, segments=48):
+    """
+    Elips ketidakpastian (polyline tertutup Nx2) dari kovarians 2x2 posisi, dengan sumbu sigma x simpangan
+    baku. Mengembalikan (titik, simpangan baku sumbu terpanjang).
+    """
+    unit = _UNIT_CIRCLE.get(segments)
+    if unit is None:
+        angles = np.linspace(0.0, 2 * math.pi, segments + 1)
+        unit = _UNIT_CIRCLE[segments] = np.column_stack((np.cos(angles), np.sin(angles)))
+    eigvals, eigvecs = np.linalg.eigh(np.asarray(cov_xy, dtype=np.float64).reshape(2, 2))
+    stddev = np.sqrt(np.maximum(eigvals, 0.0))
+    points = unit @ (eigvecs * (stddev * sigma)).T + np.asarray(center, dtype=np.float64)
+    return points, float(stddev.max())
+
+
+class ScanProjector(object):
+    """
+    LaserScan (polar) -> titik Nx2 di frame peta dalam satu operasi NumPy. Tabel cos/sin disimpan
+    dan hanya dihitung ulang jika jumlah beam / sudut scanner berubah.
+    """
+    def __init__(self):
+        self._key = None
+        self._cos = None
+        self._sin = None
+
+    def _angles(self, count, angle_min, angle_increment):
+        key = (count, angle_min, angle_increment)
+        if key != self._key:
+            angles = angle_min + angle_increment * np.arange(count, dtype=np.float64)
+            self._cos = np.cos(angles).astype(np.float32)
+            self._sin = np.sin(angles).astype(np.float32)
+            self._key = key
+        return self._cos, self._sin
+
+    def project(self, ranges, angle_min, angle_increment, range_min, range_max, sensor_pose):
+        """sensor_pose = (x, y, yaw) scanner di frame peta. Beam inf/NaN/di luar jangkauan dibuang."""
+        ranges = np.asarray(ranges, dtype=np.float32)
+        cos, sin = self._angles(len(ranges), angle_min, angle_increment)
+        with np.errstate(invalid='ignore'):
+            valid = (ranges >= range_min) & (ranges <= range_max)
+        r = ranges[valid]
+        x, y, yaw = sensor_pose
+        c, s = math.cos(yaw), math.sin(yaw)
+        # Rotasi beam digabung dengan rotasi scanner: cos(a + yaw), sin(a + yaw) tanpa trigonometri per beam
+        bc, bs = cos[valid], sin[valid]
+        points = np.empty((len(r), 2), dtype=np.float32)
+        points[:, 0] = r * (bc * c - bs * s) + x
+        points[:, 1] = r * (bs * c + bc * s) + y
+        return points
+
+
+class TrailChunk(object):
+    def __init__(self, chunk_id, points=None):
+        self.id = chunk_id
+        self.points = points or []
+        self.frozen = False
+
+
+class RobotTrail(object):
+    """
+    Jejak robot dalam koordinat peta (meter).
+    Titik baru didesimasi berdasarkan jarak & sudut, disimpan per chunk berukuran tetap.
+    Chunk yang penuh dibekukan (opsional disederhanakan Douglas-Peucker) dan tidak berubah lagi,
+    jadi renderer cukup meng-upload chunk aktif yang kecil.
+    """
+    def __init__(self, min_distance=0.05, min_angle_deg=8.0, max_points=20000,
+                 chunk_size=256, simplify_tolerance=0.02):
+        self.min_distance = min_distance
+        self.min_angle = math.radians(min_angle_deg)
+        self.max_points = max_points
+        self.chunk_size = max(4, chunk_size)
+        self.simplify_tolerance = simplify_tolerance
+
+        self.chunks = deque()
+        self.total_points = 0
+        self._next_id = 0
+        self._new_chunk(None)
+
+    def _new_chunk(self, start_point):
+        chunk = TrailChunk(self._next_id, [start_point] if start_point else [])
+        self._next_id += 1
+        self.chunks.append(chunk)
+        self.total_points += len(chunk.points)
+        return chunk
+
+    @property
+    def active(self):
+        return self.chunks[-1]
+
+    def clear(self):
+        self.chunks.clear()
+        self.total_points = 0
+        self._new_chunk(None)
+
+    def append(self, x, y):
+        """Menambah posisi robot. Mengembalikan True jika jejak berubah."""
+        pts = self.active.points
+        if pts:
+            ax, ay = pts[-1]
+            if math.hypot(x - ax, y - ay) < self.min_distance:
+                return False
+
+            # Segmen lurus cukup diperpanjang: titik terakhir digeser, bukan ditambah
+            if len(pts) >= 2:
+                bx, by = pts[-2]
+                heading_prev = math.atan2(ay - by, ax - bx)
+                heading_new = math.atan2(y - ay, x - ax)
+                turn = abs((heading_new - heading_prev + math.pi) % (2 * math.pi) - math.pi)
+                if turn < self.min_angle:
+                    pts[-1] = (x, y)
+                    return True
+
+        pts.append((x, y))
+        self.total_points += 1
+
+        if len(pts) >= self.chunk_size:
+            self._freeze_active()
+        self._enforce_limit()
+        return True
+
+    def _freeze_active(self):
+        chunk = self.active
+        if self.simplify_tolerance:
+            before = len(chunk.points)
+            chunk.points = douglas_peucker(chunk.points, self.simplify_tolerance)
+            self.total_points -= before - len(chunk.points)
+        chunk.frozen = True
+        # Chunk baru dimulai dari titik terakhir agar garis tetap menyambung
+        self._new_chunk(chunk.points[-1])
+
+    def _enforce_limit(self):
+        while self.total_points > self.max_points and len(self.chunks) > 1:
+            old = self.chunks.popleft()
+            self.total_points -= len(old.points)
+
+    def frozen_chunks(self):
+        return [c for c in self.chunks if c.frozen]
+
+
+class MapTransform(object):
+    """
+    Transformasi affine peta (meter) <-> layar (koordinat widget peta) untuk gambar letterbox.
+    Matriks dihitung sekali dan hanya diinvalidasi saat ukuran/posisi widget, ukuran gambar,
+    atau metadata peta (resolution/origin) berubah.
+    """
+    def __init__(self):
+        self.image_size = (0, 0)
+        self.widget_pos = (0.0, 0.0)
+        self.widget_size = (0.0, 0.0)
+        self.resolution = None
+        self.origin = None
+        self._dirty = True
+        self._valid = False
+        self.scale = 0.0
+        self.offset = (0.0, 0.0)
+        self.matrix = None
+        self.inverse = None
+
+    # --- Invalidasi ---
+    def set_image_size(self, size):
+        size = (int(size[0]), int(size[1])) if size else (0, 0)
+        if size != self.image_size:
+            self.image_size = size
+            self._dirty = True
+
+    def set_widget_geometry(self, pos=None, size=None):
+        if pos is not None and tuple(pos) != self.widget_pos:
+            self.widget_pos = (float(pos[0]), float(pos[1]))
+            self._dirty = True
+        if size is not None and tuple(size) != self.widget_size:
+            self.widget_size = (float(size[0]), float(size[1]))
+            self._dirty = True
+
+    def set_metadata(self, meta):
+        if meta:
+            resolution = float(meta['resolution'])
+            origin = (float(meta['origin'][0]), float(meta['origin'][1]))
+        else:
+            resolution, origin = None, None
+        if resolution != self.resolution or origin != self.origin:
+            self.resolution = resolution
+            self.origin = origin
+            self._dirty = True
+
+    # --- Perhitungan ---
+    def _update(self):
+        self._dirty = False
+        self._valid = False
+        norm_w, norm_h = self.image_size
+        widget_w, widget_h = self.widget_size
+        if norm_w == 0 or norm_h == 0 or widget_w == 0 or widget_h == 0 or not self.resolution:
+            return
+
+        img_ratio = norm_w / norm_h
+        widget_ratio = widget_w / widget_h
+        if widget_ratio > img_ratio:
+            scale = widget_h / norm_h
+            offset_x = (widget_w - norm_w * scale) / 2.0
+            offset_y = 0.0
+        else:
+            scale = widget_w / norm_w
+            offset_x = 0.0
+            offset_y = (widget_h - norm_h * scale) / 2.0
+        if scale == 0: return
+
+        self.scale = scale
+        self.offset = (offset_x, offset_y)
+        # layar = k * peta + t
+        k = scale / self.resolution
+        tx = self.widget_pos[0] + offset_x - self.origin[0] * k
+        ty = self.widget_pos[1] + offset_y - self.origin[1] * k
+        self.matrix = np.array([[k, 0.0, tx], [0.0, k, ty], [0.0, 0.0, 1.0]])
+        self.inverse = np.linalg.inv(self.matrix)
+        self._k, self._tx, self._ty = k, tx, ty
+        self._valid = True
+
+    @property
+    def valid(self):
+        if self._dirty: self._update()
+        return self._valid
+
+    # --- Titik tunggal ---
+    def map_to_screen(self, map_x, map_y):
+        if not self.valid: return None
+        return (map_x * self._k + self._tx, map_y * self._k + self._ty)
+
+    def screen_to_map(self, screen_x, screen_y):
+        if not self.valid: return None
+        return ((screen_x - self._tx) / self._k, (screen_y - self._ty) / self._k)
+
+    # --- Batch (array Nx2) ---
+    def map_to_screen_array(self, points, out=None):
+        """out: buffer float64 Nx2 yang sudah dialokasikan (dipakai ulang oleh renderer yang sering update)."""
+        if not self.valid: return None
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        out = np.matmul(pts, self.matrix[:2, :2].T, out=out)
+        out += self.matrix[:2, 2]
+        return out
+
+    def screen_to_map_array(self, points):
+        if not self.valid: return None
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return pts @ self.inverse[:2, :2].T + self.inverse[:2, 2]
+
+    # --- Piksel gambar (origin kiri-bawah, seperti tekstur) ---
+    def pixel_to_screen(self, px, py):
+        if not self.valid: return None
+        return (self.widget_pos[0] + self.offset[0] + px * self.scale,
+                self.widget_pos[1] + self.offset[1] + py * self.scale)
+
+    def screen_to_pixel(self, screen_x, screen_y):
+        if not self.valid: return None
+        return ((screen_x - self.widget_pos[0] - self.offset[0]) / self.scale,
+                (screen_y - self.widget_pos[1] - self.offset[1]) / self.scale)
+
+
+class MapTilePyramid(object):
+    """
+    Piramida multi-resolusi dari array peta (baris 0 = atas). Level 0 resolusi penuh (boleh memmap),
+    tiap level berikutnya setengahnya. Downsample memakai nilai minimum 2x2 agar dinding (gelap)
+    tidak hilang di level kasar.
+    """
+    def __init__(self, pixels, tile_size=512, overview_size=1024):
+        self.tile_size = tile_size
+        self.height, self.width = pixels.shape
+        self.levels = [pixels]
+        while max(self.levels[-1].shape) > overview_size:
+            self.levels.append(self._downsample(self.levels[-1]))
+
+    @staticmethod
+    def _downsample(pixels):
+        h, w = pixels.shape
+        if h % 2 or w % 2:
+            pixels = np.pad(pixels, ((0, h % 2), (0, w % 2)), mode='edge')
+        h, w = pixels.shape
+        return pixels.reshape(h // 2, 2, w // 2, 2).min(axis=(1, 3))
+
+    @property
+    def overview(self):
+        return self.levels[-1]
+
+    def level_for(self, pixels_per_screen_px):
+        """Level dengan detail cukup: satu piksel level ~ satu piksel layar."""
+        if pixels_per_screen_px <= 1.0: return 0
+        return min(int(math.floor(math.log2(pixels_per_screen_px))), len(self.levels) - 1)
+
+    def tiles_in_rect(self, level, px0, py0, px1, py1):
+        """Tile (row, col) level tertentu yang memotong persegi piksel level 0 (origin kiri-bawah)."""
+        factor = 2 ** level
+        size = self.tile_size * factor
+        rows = int(math.ceil(self.levels[level].shape[0] / self.tile_size))
+        cols = int(math.ceil(self.levels[level].shape[1] / self.tile_size))
+        # Konversi ke baris dari atas
+        top0, top1 = self.height - max(py0, py1), self.height - min(py0, py1)
+        c0 = max(0, int(min(px0, px1) // size))
+        c1 = min(cols - 1, int(max(px0, px1) // size))
+        r0 = max(0, int(top0 // size))
+        r1 = min(rows - 1, int(top1 // size))
+        return [(level, r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+    def tile(self, level, row, col):
+        """Array tile + batasnya dalam piksel level 0 (x0, y0, x1, y1), origin kiri-bawah."""
+        factor = 2 ** level
+        t = self.tile_size
+        pixels = self.levels[level][row * t:(row + 1) * t, col * t:(col + 1) * t]
+        h, w = pixels.shape
+        x0 = col * t * factor
+        top = row * t * factor
+        return pixels, (x0, self.height - (top + h * factor), x0 + w * factor, self.height - top)
+
+
+def read_pgm_header(path):
+    """Membaca header PGM (P2/P5) -> (format, width, height, maxval, offset awal data)."""
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+
+    tokens = []
+    i = 0
+    while len(tokens) < 4 and i < len(head):
+        c = head[i:i + 1]
+        if c == b'#':
+            # Komentar sampai akhir baris
+            while i < len(head) and head[i:i + 1] not in (b'\n', b'\r'):
+                i += 1
+        elif c.isspace():
+            i += 1
+        else:
+            start = i
+            while i < len(head) and not head[i:i + 1].isspace() and head[i:i + 1] != b'#':
+                i += 1
+            tokens.append(head[start:i])
+
+    if len(tokens) < 4 or tokens[0] not in (b'P2', b'P5'):
+        raise ValueError(f"Bukan file PGM yang valid: {path}")
+    # Tepat satu whitespace setelah maxval sebelum data biner
+    return tokens[0].decode(), int(tokens[1]), int(tokens[2]), int(tokens[3]), i + 1
+
+
+def load_pgm(path, mmap=False):
+    """
+    Membaca PGM menjadi array uint8 (baris 0 = baris paling atas gambar).
+    Dengan mmap=True file P5 8-bit tidak dibaca ke RAM, hanya dipetakan.
+    """
+    fmt, width, height, maxval, offset = read_pgm_header(path)
+    if fmt == 'P5':
+        dtype = np.uint8 if maxval < 256 else np.dtype('>u2')
+        if mmap and dtype == np.uint8:
+            return np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(height, width))
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = np.frombuffer(f.read(width * height * np.dtype(dtype).itemsize), dtype=dtype)
+        pixels = data.reshape(height, width)
+    else:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            pixels = np.array(f.read().split()[:width * height], dtype=np.int64).reshape(height, width)
+
+    if maxval != 255:
+        pixels = (pixels.astype(np.float32) * (255.0 / maxval)).round()
+    return pixels.astype(np.uint8, copy=False)
+
+
+# Ambang konversi OccupancyGrid -> PGM, sama dengan map_saver (map_server)
+FREE_THRESHOLD = 25
+OCCUPIED_THRESHOLD = 65
+
+
+def occupancy_to_pgm(grid, free_threshold=FREE_THRESHOLD, occupied_threshold=OCCUPIED_THRESHOLD):
+    """
+    Grid OccupancyGrid int8 (height, width), baris 0 = bawah peta -> piksel PGM uint8 top-down:
+    bebas 254, terisi 0, unknown / di antara ambang 205.
+    """
+    grid = np.asarray(grid, dtype=np.int8)
+    pixels = np.full(grid.shape, 205, dtype=np.uint8)
+    pixels[(grid >= 0) & (grid <= free_threshold)] = 254
+    pixels[grid >= occupied_threshold] = 0
+    return pixels[::-1]
+
+
+def _occupancy_lut():
+    """LUT 256 entri untuk nilai OccupancyGrid (int8 dibaca sebagai uint8) -> abu-abu tampilan."""
+    lut = np.full(256, 205, dtype=np.uint8)            # unknown (-1 = 255) & nilai tak valid
+    values = np.arange(101)
+    lut[:101] = np.round(254 - values * (254 / 100.0)).astype(np.uint8)
+    lut[:FREE_THRESHOLD + 1] = 254
+    lut[OCCUPIED_THRESHOLD:101] = 0
+    return lut
+
+
+OCCUPANCY_LUT = _occupancy_lut()
+
+
+def _costmap_lut():
+    """
+    LUT 256 x RGBA untuk costmap move_base (0-100, int8 dibaca sebagai uint8): bebas transparan,
+    biaya 1-98 gradasi biru -> merah, 99 (inscribed) cyan, 100 (lethal) magenta, unknown transparan.
+    """
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    t = np.linspace(0.0, 1.0, 98)
+    lut[1:99, 0] = np.round(255 * t)
+    lut[1:99, 2] = np.round(255 * (1.0 - t))
+    lut[1:99, 3] = np.round(60 + 120 * t)
+    lut[99] = (0, 255, 255, 200)
+    lut[100] = (255, 0, 255, 220)
+    return lut
+
+
+COSTMAP_LUT = _costmap_lut()
+
+
+class LiveMapImage(object):
+    """
+    Gambar grid yang berubah-ubah (peta yang sedang dibuat dari /map dan /map_updates, atau costmap),
+    baris 0 = bawah seperti OccupancyGrid (dan tekstur Kivy), jadi tidak perlu dibalik. Nilai sel
+    dipetakan lewat lut: 1D -> luminance, Nx4 -> RGBA. Diisi dari thread ROS; GUI mengambil hanya
+    persegi yang berubah (blok TILE x TILE, digabung per baris) lewat take_changes().
+    """
+    TILE = 64
+
+    def __init__(self, lut=OCCUPANCY_LUT):
+        self.lut = lut
+        self.colorfmt = 'luminance' if lut.ndim == 1 else 'rgba'
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.pixels = None
+            self.resolution = None
+            self.origin = None
+            self.version = 0
+            self._resized = False
+            self._moved = False
+            self._dirty = set()
+
+    def set_grid(self, grid, resolution, origin):
+        image = self.lut[np.asarray(grid, dtype=np.int8).view(np.uint8)]
+        with self._lock:
+            if self.pixels is None or self.pixels.shape != image.shape:
+                # Peta tumbuh: tekstur dibuat ulang
+                self._resized = True
+                self._dirty.clear()
+            elif not self._resized:
+                # Ukuran sama (mis. costmap lokal bergulir ikut robot): cukup persegi yang berubah,
+                # pergeseran origin dilaporkan sebagai perubahan penempatan saja
+                t = self.TILE
+                h, w = image.shape[:2]
+                th, tw = -(-h // t), -(-w // t)
+                diff = image != self.pixels
+                changed = np.zeros((th * t, tw * t), dtype=bool)
+                changed[:h, :w] = diff.any(axis=2) if diff.ndim == 3 else diff
+                rows, cols = np.nonzero(changed.reshape(th, t, tw, t).any(axis=(1, 3)))
+                self._dirty.update(zip(rows.tolist(), cols.tolist()))
+            if self.origin != tuple(origin) or self.resolution != resolution:
+                self._moved = True
+            self.pixels = image
+            self.resolution = resolution
+            self.origin = tuple(origin)
+            self.version += 1
+
+    def apply_update(self, x, y, width, height, data):
+        """Patch dari OccupancyGridUpdate (x, y dalam sel, data int8 width*height)."""
+        patch = self.lut[np.asarray(data, dtype=np.int8).view(np.uint8).reshape(height, width)]
+        with self._lock:
+            if self.pixels is None: return
+            h, w = self.pixels.shape[:2]
+            x0, y0, x1, y1 = max(0, x), max(0, y), min(w, x + width), min(h, y + height)
+            if x0 >= x1 or y0 >= y1: return
+            self.pixels[y0:y1, x0:x1] = patch[y0 - y:y1 - y, x0 - x:x1 - x]
+            if not self._resized:
+                t = self.TILE
+                self._dirty.update((r, c) for r in range(y0 // t, (y1 - 1) // t + 1)
+                                   for c in range(x0 // t, (x1 - 1) // t + 1))
+            self.version += 1
+
+    def take_changes(self):
+        """
+        (size, resized, [(x, y, w, h, bytes), ...]) sejak pemanggilan terakhir, atau None.
+        resized=True: seluruh gambar, dipecah per strip TILE baris agar upload bisa dicicil per tick.
+        Daftar persegi bisa kosong jika hanya penempatan (origin / resolution) yang berubah.
+        """
+        with self._lock:
+            if self.pixels is None or (not self._resized and not self._dirty and not self._moved): return None
+            h, w = self.pixels.shape[:2]
+            if self._resized:
+                t = self.TILE
+                rects = [(0, y0, w, min(t, h - y0), self.pixels[y0:y0 + t].tobytes()) for y0 in range(0, h, t)]
+            else:
+                rects = []
+                t = self.TILE
+                dirty = sorted(self._dirty)
+                i = 0
+                # Blok bersebelahan dalam satu baris blok digabung jadi satu persegi
+                while i < len(dirty):
+                    row, col = dirty[i]
+                    end = col
+                    while i + 1 < len(dirty) and dirty[i + 1] == (row, end + 1):
+                        i += 1
+                        end += 1
+                    x0, y0 = col * t, row * t
+                    x1, y1 = min(w, (end + 1) * t), min(h, y0 + t)
+                    rects.append((x0, y0, x1 - x0, y1 - y0, self.pixels[y0:y1, x0:x1].tobytes()))
+                    i += 1
+            resized = self._resized
+            self._resized = False
+            self._moved = False
+            self._dirty.clear()
+            return (w, h), resized, rects
+
+    def placement(self):
+        """(resolution, (x, y, yaw) origin) gambar sekarang, atau None jika kosong."""
+        with self._lock:
+            if self.pixels is None: return None
+            return self.resolution, self.origin
+
+
+def write_atomic(path, data):
+    """Tulis ke file sementara di folder yang sama lalu rename: pembaca tidak pernah melihat file setengah jadi."""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_map(base_path, pixels, resolution, origin):
+    """
+    Menyimpan <base_path>.pgm (P5) dan <base_path>.yaml format map_server secara atomik.
+    YAML ditulis terakhir, jadi peta baru terlihat di katalog hanya jika gambarnya sudah lengkap.
+    """
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width = pixels.shape
+    image_path = f"{base_path}.pgm"
+    yaml_path = f"{base_path}.yaml"
+
+    header = f"P5\n# CREATOR: kivy_gui {resolution:.3f} m/pix\n{width} {height}\n255\n".encode('ascii')
+    write_atomic(image_path, header + pixels.tobytes())
+
+    x, y, yaw = (list(origin) + [0.0, 0.0, 0.0])[:3]
+    metadata = (
+        f"image: {os.path.basename(image_path)}\n"
+        f"resolution: {resolution:.6f}\n"
+        f"origin: [{x:.6f}, {y:.6f}, {yaw:.6f}]\n"
+        f"negate: 0\n"
+        f"occupied_thresh: {OCCUPIED_THRESHOLD / 100.0:.2f}\n"
+        f"free_thresh: 0.196\n"
+    )
+    write_atomic(yaml_path, metadata.encode('ascii'))
+    return yaml_path
+
+
+class MapCatalog(object):
+    """
+    Indeks peta (YAML + gambar) dalam satu folder.
+    Metadata, path gambar, dimensi, dan mtime di-cache; refresh hanya mem-parse ulang
+    file YAML yang mtime-nya berubah.
+    """
+    VISUAL_SUFFIX = 'edited'
+
+    def __init__(self, maps_dir, visual_maps=('test1',), min_refresh_interval=1.0):
+        self.maps_dir = maps_dir
+        self.visual_maps = set(visual_maps)
+        self.min_refresh_interval = min_refresh_interval
+        self._entries = {}
+        self._last_refresh = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if (not force and self._last_refresh is not None
+                    and now - self._last_refresh < self.min_refresh_interval):
+                return
+            self._last_refresh = now
+
+            found = {}
+            try:
+                with os.scandir(self.maps_dir) as it:
+                    for entry in it:
+                        if entry.name.endswith('.yaml') and entry.is_file():
+                            found[entry.name[:-5]] = (entry.path, entry.stat().st_mtime)
+            except OSError as e:
+                print(f"WARNING: Folder peta {self.maps_dir} tidak bisa dibaca: {e}")
+
+            for name in list(self._entries):
+                if name not in found:
+                    del self._entries[name]
+
+            for name, (yaml_path, mtime) in found.items():
+                cached = self._entries.get(name)
+                if cached and cached['mtime'] == mtime:
+                    continue
+                entry = self._load_entry(name, yaml_path, mtime)
+                if entry:
+                    self._entries[name] = entry
+
+    def _load_entry(self, name, yaml_path, mtime):
+        try:
+            with open(yaml_path, 'r') as f:
+                metadata = yaml.safe_load(f)
+        except Exception as e:
+            print(f"WARNING: Gagal membaca metadata peta '{name}': {e}")
+            return None
+        if not isinstance(metadata, dict):
+            return None
+
+        image_path = metadata.get('image') or f"{name}.pgm"
+        if not os.path.isabs(image_path):
+            image_path = os.path.join(self.maps_dir, image_path)
+        if not os.path.exists(image_path):
+            image_path = os.path.join(self.maps_dir, f"{name}.pgm")
+        if not os.path.exists(image_path):
+            image_path = None
+
+        # Peta visualisasi khusus (mis. test1edited.pgm) dipakai untuk tampilan saja
+        display_path = image_path
+        if name in self.visual_maps:
+            visual_path = os.path.join(self.maps_dir, f"{name}{self.VISUAL_SUFFIX}.pgm")
+            if os.path.exists(visual_path):
+                display_path = visual_path
+
+        width = height = None
+        if image_path and image_path.endswith('.pgm'):
+            try:
+                _, width, height, _, _ = read_pgm_header(image_path)
+            except Exception:
+                pass
+
+        return {
+            'name': name,
+            'yaml_path': yaml_path,
+            'image_path': image_path,
+            'display_path': display_path,
+            'metadata': metadata,
+            'width': width,
+            'height': height,
+            'mtime': mtime,
+        }
+
+    def names(self):
+        self.refresh()
+        return sorted(self._entries)
+
+    def get(self, name):
+        self.refresh()
+        return self._entries.get(name)
+
+    def find_by_display_path(self, path):
+        with self._lock:
+            for entry in self._entries.values():
+                if entry['display_path'] == path:
+                    return entry
+        return None
+
+
+def _shift_slices(dy, dx):
+    """Slice (tujuan, sumber) untuk menggeser array 2D sejauh (dy, dx)."""
+    def axis(d):
+        if d > 0: return slice(d, None), slice(None, -d)
+        if d < 0: return slice(None, d), slice(-d, None)
+        return slice(None), slice(None)
+    (dst_y, src_y), (dst_x, src_x) = axis(dy), axis(dx)
+    return (dst_y, dst_x), (src_y, src_x)
+
+
+def distance_field(blocked, max_cells=None):
+    """
+    Jarak Euclid (satuan sel) dari tiap sel ke sel `blocked` terdekat.
+    Memakai SciPy jika ada; jika tidak, propagasi koordinat sel terhalang terdekat
+    ke 8 tetangga secara vektor (hampir eksak), dibatasi max_cells iterasi.
+    """
+    if not blocked.any():
+        return np.full(blocked.shape, np.inf if max_cells is None else float(max_cells), dtype=np.float32)
+    if ndimage is not None:
+        dist = ndimage.distance_transform_edt(~blocked).astype(np.float32)
+        return dist if max_cells is None else np.minimum(dist, max_cells)
+
+    h, w = blocked.shape
+    far = np.int32(1 << 14)
+    ys = np.arange(h, dtype=np.int32)[:, None]
+    xs = np.arange(w, dtype=np.int32)[None, :]
+    near_y = np.where(blocked, ys, far).astype(np.int32)
+    near_x = np.where(blocked, xs, far).astype(np.int32)
+    dist2 = np.where(blocked, 0, np.iinfo(np.int32).max).astype(np.int32)
+
+    neighbours = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+    iterations = max_cells + 1 if max_cells is not None else h + w
+    for _ in range(int(iterations)):
+        changed = False
+        for dy, dx in neighbours:
+            dst, src = _shift_slices(dy, dx)
+            cand_y = near_y[src]
+            cand_x = near_x[src]
+            # far (2^14) dikuadratkan + dijumlah masih muat di int32
+            cand = (ys[dst[0]] - cand_y) ** 2 + (xs[:, dst[1]] - cand_x) ** 2
+            better = cand < dist2[dst]
+            if better.any():
+                changed = True
+                dist2[dst][better] = cand[better]
+                near_y[dst][better] = cand_y[better]
+                near_x[dst][better] = cand_x[better]
+        if not changed: break
+
+    dist = np.sqrt(dist2).astype(np.float32)
+    return dist if max_cells is None else np.minimum(dist, max_cells)
+
+
+class OccupancyMap(object):
+    """
+    Analisis peta statis (PGM + YAML, aturan map_server): mask free/occupied/unknown,
+    distance field ke halangan (meter), dan mask aman (free & jarak >= radius robot).
+    Array diindeks [iy, ix] dengan iy dari bawah, jadi cocok langsung dengan koordinat peta.
+    """
+    def __init__(self, pixels, metadata, robot_radius=0.25, max_distance=1.0):
+        occupied_thresh = float(metadata.get('occupied_thresh', 0.65))
+        free_thresh = float(metadata.get('free_thresh', 0.196))
+
+        # Baris PGM dari atas -> balik agar baris 0 = y terkecil
+        values = np.flipud(np.asarray(pixels)).astype(np.float32) / 255.0
+        occupancy = values if int(metadata.get('negate', 0)) else 1.0 - values
+        free = occupancy < free_thresh
+
+        # Unknown dianggap halangan juga
+        resolution = float(metadata['resolution'])
+        max_cells = int(math.ceil(max_distance / resolution))
+        distance = distance_field(~free, max_cells) * resolution
+        self._set_fields(metadata, free, occupancy > occupied_thresh, distance, robot_radius)
+
+    @classmethod
+    def from_fields(cls, metadata, free, occupied, distance, robot_radius=0.25):
+        """Dari mask & distance field (meter) yang sudah dihitung sebelumnya (mis. map bundle)."""
+        self = cls.__new__(cls)
+        self._set_fields(metadata, free, occupied, distance, robot_radius)
+        return self
+
+    def _set_fields(self, metadata, free, occupied, distance, robot_radius):
+        self.resolution = float(metadata['resolution'])
+        self.origin = (float(metadata['origin'][0]), float(metadata['origin'][1]))
+        self.robot_radius = robot_radius
+        self.free = free
+        self.occupied = occupied
+        self.distance = distance
+        self.height, self.width = free.shape
+        self.safe = distance >= robot_radius
+
+    def map_to_cell(self, map_x, map_y):
+        ix = int(math.floor((map_x - self.origin[0]) / self.resolution))
+        iy = int(math.floor((map_y - self.origin[1]) / self.resolution))
+        if 0 <= ix < self.width and 0 <= iy < self.height:
+            return ix, iy
+        return None
+
+    def cell_to_map(self, ix, iy):
+        return (self.origin[0] + (ix + 0.5) * self.resolution,
+                self.origin[1] + (iy + 0.5) * self.resolution)
+
+    def is_safe(self, map_x, map_y):
+        cell = self.map_to_cell(map_x, map_y)
+        return cell is not None and bool(self.safe[cell[1], cell[0]])
+
+    def clearance(self, map_x, map_y):
+        cell = self.map_to_cell(map_x, map_y)
+        return float(self.distance[cell[1], cell[0]]) if cell else 0.0
+
+    def nearest_safe(self, map_x, map_y, max_search=2.0):
+        """Sel aman terdekat dari (map_x, map_y) dalam radius max_search meter, atau None."""
+        ix = int(math.floor((map_x - self.origin[0]) / self.resolution))
+        iy = int(math.floor((map_y - self.origin[1]) / self.resolution))
+        r = int(math.ceil(max_search / self.resolution))
+        x0, x1 = max(0, ix - r), min(self.width, ix + r + 1)
+        y0, y1 = max(0, iy - r), min(self.height, iy + r + 1)
+        if x0 >= x1 or y0 >= y1: return None
+
+        ys, xs = np.nonzero(self.safe[y0:y1, x0:x1])
+        if len(xs) == 0: return None
+        d2 = (xs + x0 - ix) ** 2 + (ys + y0 - iy) ** 2
+        k = int(np.argmin(d2))
+        if d2[k] > r * r: return None
+        return self.cell_to_map(int(xs[k] + x0), int(ys[k] + y0))
+
+    def validate_goal(self, map_x, map_y, max_search=2.0):
+        """('ok', titik) jika aman, ('snapped', titik aman terdekat), atau ('invalid', None)."""
+        if self.is_safe(map_x, map_y):
+            return 'ok', (map_x, map_y)
+        snapped = self.nearest_safe(map_x, map_y, max_search)
+        if snapped:
+            return 'snapped', snapped
+        return 'invalid', None
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentasi latensi jalur kritis GUI (pose -> layar, tap -> goal -> robot bergerak, start navigasi).
+
+Setiap tahap dicatat dalam detik (selisih time.monotonic(), kecuali umur stamp TF yang memakai jam ROS)
+ke LatencyHistogram: jendela bergulir untuk persentil + total kumulatif count/sum. Hasilnya diekspor
+dalam format teks Prometheus ke file (cocok untuk textfile collector node_exporter) dan/atau ke
+endpoint http://127.0.0.1:<port>/metrics.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from map_tools import CACHE_DIR, write_atomic
+
+METRICS_FILE = os.path.join(CACHE_DIR, 'latency.prom')
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Tahap yang diukur: nama metrik -> keterangan (HELP di output Prometheus)
+LATENCY_STAGES = {
+    'pose_tf_to_listener_seconds': "Stamp TF map->base_link sampai dibaca RosPoseListener (jam ROS)",
+    'pose_listener_to_draw_seconds': "Pose dibaca listener sampai digambar update_robot_display",
+    'pose_age_at_draw_seconds': "Umur pose (sejak stamp TF) saat digambar di layar",
+    'goal_tap_to_publish_seconds': "Tombol START ditekan sampai goal terkirim ke move_base",
+    'goal_publish_to_motion_seconds': "Goal terkirim sampai robot mulai bergerak",
+    'goal_tap_to_motion_seconds': "Tombol START ditekan sampai robot mulai bergerak",
+    'stop_press_to_publish_seconds': "Tombol STOP ditekan sampai Twist nol & cancel terkirim",
+    'navigation_start_to_ready_seconds': "start_navigation dipanggil sampai navigasi siap dipakai",
+}
+
+
+class LatencyHistogram(object):
+    """Sampel latensi (detik): `window` sampel terakhir untuk persentil, count/sum sejak awal."""
+    def __init__(self, name, help_text='', window=1000):
+        self.name = name
+        self.help_text = help_text
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentiles(self, quantiles=QUANTILES):
+        """Persentil jendela bergulir, atau None jika belum ada sampel."""
+        samples = list(self.samples)
+        if not samples: return None
+        return np.percentile(samples, [q * 100 for q in quantiles]).tolist()
+
+
+class LatencyMetrics(object):
+    """Kumpulan LatencyHistogram per tahap + ekspor berkala ke file dan/atau HTTP localhost."""
+    PREFIX = 'kivy_gui_'
+
+    def __init__(self, stages=LATENCY_STAGES, window=1000):
+        self.window = window
+        self._histograms = {name: LatencyHistogram(name, help_text, window) for name, help_text in stages.items()}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._server = None
+        self.path = None
+
+    def observe(self, name, seconds):
+        """Mencatat satu sampel; nilai negatif / NaN (mis. jam ROS mundur) diabaikan."""
+        if seconds is None or not math.isfinite(seconds) or seconds < 0: return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram(name, window=self.window)
+            histogram.observe(seconds)
+
+    def observe_since(self, name, start):
+        """Mencatat time.monotonic() - start (start None diabaikan)."""
+        if start is not None:
+            self.observe(name, time.monotonic() - start)
+
+    # --- Ekspor ---
+    def render_prometheus(self):
+        with self._lock:
+            histograms = list(self._histograms.values())
+            snapshots = [(h, h.percentiles(), h.count, h.total) for h in histograms]
+        lines = []
+        for histogram, values, count, total in snapshots:
+            name = self.PREFIX + histogram.name
+            if histogram.help_text:
+                lines.append(f"# HELP {name} {histogram.help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for q, value in zip(QUANTILES, values or [math.nan] * len(QUANTILES)):
+                text = f"{value:.6f}" if math.isfinite(value) else 'NaN'
+                lines.append(f'{name}{{quantile="{q}"}} {text}')
+            lines.append(f"{name}_sum {total:.6f}")
+            lines.append(f"{name}_count {count}")
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """Ringkasan satu baris per tahap yang sudah punya sampel (untuk log)."""
+        rows = []
+        with self._lock:
+            histograms = list(self._histograms.values())
+        for histogram in histograms:
+            values = histogram.percentiles()
+            if values is None: continue
+            p50, p90, p99 = (v * 1000 for v in values)
+            rows.append(f"{histogram.name}: p50 {p50:.1f} ms, p90 {p90:.1f} ms, p99 {p99:.1f} ms (n={histogram.count})")
+        return "\n".join(rows)
+
+    def write_textfile(self, path=None):
+        path = path or self.path
+        if not path: return
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            write_atomic(path, self.render_prometheus().encode('utf-8'))
+        except OSError as e:
+            print(f"WARNING: Metrik latensi tidak tersimpan: {e}")
+
+    def start_exporter(self, path=METRICS_FILE, interval=10.0, port=None):
+        """path: file ditulis ulang tiap `interval` detik; port: endpoint HTTP di 127.0.0.1 (None = mati)."""
+        self.path = path
+        if path:
+            threading.Thread(target=self._export_loop, args=(interval,), daemon=True).start()
+        if port:
+            try:
+                self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+            except OSError as e:
+                print(f"WARNING: Endpoint metrik port {port} tidak bisa dibuka: {e}")
+                return
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            print(f"INFO: Metrik latensi di http://127.0.0.1:{port}/metrics")
+
+    def stop_exporter(self):
+        self._stop_event.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.write_textfile()
+
+    def _export_loop(self, interval):
+        while not self._stop_event.wait(interval):
+            self.write_textfile()
+
+    def _handler_class(self):
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return MetricsHandler
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import math
+import threading
+from collections import OrderedDict
+
+import yaml
+
+MISSIONS_FILE = 'missions.yaml'
+
+
+class Waypoint(object):
+    def __init__(self, name, x, y, label='', audio=None):
+        self.name = name
+        self.x = float(x)
+        self.y = float(y)
+        self.label = label
+        self.audio = audio
+
+
+class Route(object):
+    def __init__(self, name, stops, label='', approach_radius=0.5, optimize=False):
+        self.name = name
+        self.stops = stops
+        self.label = label or name
+        self.approach_radius = float(approach_radius)
+        self.optimize = bool(optimize)  # True: urutan stops diatur ulang agar jarak tempuh terpendek
+
+
+class MissionCatalog(object):
+    """Waypoint & rute per peta dari file YAML (lihat missions.yaml)."""
+    def __init__(self, path=MISSIONS_FILE):
+        self.path = path
+        self.maps = {}
+        self.load()
+
+    def load(self):
+        self.maps = {}
+        try:
+            with open(self.path, 'r') as f:
+                data = yaml.safe_load(f) or {}
+        except Exception as e:
+            print(f"WARNING: Gagal membaca misi '{self.path}': {e}")
+            return
+
+        for map_name, spec in data.items():
+            spec = spec or {}
+            waypoints = OrderedDict()
+            for name, wp in (spec.get('waypoints') or {}).items():
+                try:
+                    waypoints[str(name)] = Waypoint(str(name), wp['x'], wp['y'], wp.get('label', ''), wp.get('audio'))
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"WARNING: Waypoint '{name}' di peta '{map_name}' tidak valid: {e}")
+
+            routes = OrderedDict()
+            for name, rt in (spec.get('routes') or {}).items():
+                stops = [waypoints.get(str(s)) for s in rt.get('stops', [])]
+                if not stops or None in stops:
+                    print(f"WARNING: Rute '{name}' di peta '{map_name}' memakai waypoint yang tidak ada.")
+                    continue
+                routes[str(name)] = Route(str(name), stops, rt.get('label', ''), rt.get('approach_radius', 0.5),
+                                          rt.get('optimize', False))
+
+            self.maps[str(map_name)] = {'waypoints': waypoints, 'routes': routes}
+
+    def waypoints(self, map_name):
+        return list(self.maps.get(map_name, {}).get('waypoints', {}).values())
+
+    def routes(self, map_name):
+        return list(self.maps.get(map_name, {}).get('routes', {}).values())
+
+    def waypoint(self, map_name, name):
+        return self.maps.get(map_name, {}).get('waypoints', {}).get(name)
+
+    def route(self, map_name, name):
+        return self.maps.get(map_name, {}).get('routes', {}).get(name)
+
+    def audio_files(self):
+        """File audio cue waypoint di semua peta (unik, urutan kemunculan)."""
+        files = OrderedDict()
+        for spec in self.maps.values():
+            for wp in spec['waypoints'].values():
+                if wp.audio: files[wp.audio] = None
+        return list(files)
+
+
+class MissionRunner(object):
+    """
+    Menjalankan antrian waypoint. Goal berikutnya dikirim begitu robot masuk approach radius
+    titik sekarang (move_base langsung mengganti goal lama), jadi robot tidak berhenti
+    di tiap titik. Hanya titik terakhir yang ditunggu sampai selesai.
+
+    on_event(runner, event, waypoint) dipanggil dari thread mana pun dengan event:
+    'dispatched', 'passed', 'finished', 'failed', 'cancelled'.
+    """
+    FINAL_TOLERANCE = 0.20
+
+    def __init__(self, manager, stops, approach_radius=0.5, on_event=None):
+        self.manager = manager
+        self.stops = list(stops)
+        self.approach_radius = approach_radius
+        self.on_event = on_event
+        self.index = -1
+        self.handle = None
+        self.state = 'idle'
+        self._lock = threading.RLock()
+
+    @property
+    def current(self):
+        if 0 <= self.index < len(self.stops):
+            return self.stops[self.index]
+        return None
+
+    @property
+    def is_last(self):
+        return self.index == len(self.stops) - 1
+
+    def start(self):
+        with self._lock:
+            if self.state != 'idle' or not self.stops: return False
+            self.state = 'running'
+            return self._dispatch(0)
+
+    def cancel(self):
+        with self._lock:
+            if self.state != 'running': return
+            self.state = 'cancelled'
+            handle, self.handle = self.handle, None
+        if handle:
+            handle.cancel()
+        self._emit('cancelled', self.current)
+
+    def _dispatch(self, index):
+        self.index = index
+        stop = self.stops[index]
+        self.handle = self.manager.send_navigation_goal(
+            stop.x, stop.y, on_event=self._on_goal_event, on_feedback=self._on_feedback)
+        if self.handle is None:
+            self._finish('failed')
+            return False
+        self._emit('dispatched', stop)
+        return True
+
+    def _advance(self):
+        passed = self.current
+        self._emit('passed', passed)
+        self._dispatch(self.index + 1)
+
+    def _finish(self, event):
+        self.state = event
+        self.handle = None
+        self._emit(event, self.current)
+
+    def _emit(self, event, waypoint):
+        if self.on_event:
+            self.on_event(self, event, waypoint)
+
+    # --- Input posisi: feedback move_base atau pose listener ---
+    def _on_feedback(self, handle, feedback):
+        if handle is self.handle:
+            self.update_pose(feedback)
+
+    def update_pose(self, pose):
+        if not pose: return
+        with self._lock:
+            stop = self.current
+            if self.state != 'running' or stop is None: return
+            distance = math.hypot(pose['x'] - stop.x, pose['y'] - stop.y)
+            if not self.is_last:
+                if distance < self.approach_radius:
+                    self._advance()
+            elif self.handle is not None and not self.handle.tracked and distance < self.FINAL_TOLERANCE:
+                # Tanpa action server tidak ada status 'succeeded'
+                self._finish('finished')
+
+    def _on_goal_event(self, handle, event):
+        with self._lock:
+            # Goal lama yang diganti (preempted) oleh dispatch berikutnya diabaikan
+            if handle is not self.handle or self.state != 'running': return
+            if event == 'succeeded':
+                if self.is_last:
+                    self._finish('finished')
+                else:
+                    self._advance()
+            elif event == 'preempted':
+                self._finish('cancelled')
+            elif event in ('aborted', 'rejected', 'lost'):
+                self._finish('failed')
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import heapq
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from map_tools import douglas_peucker
+
+SQRT2 = math.sqrt(2.0)
+EAST, NORTH = 1, 2  # bit sisi terbuka per sel kasar: ke (x+1, y) dan ke (x, y+1)
+
+
+def _crossings(safe, f):
+    """
+    (ch, cw-1) bool untuk mask safe (ch*f, cw*f): sel kasar (cy, cx) -> (cy, cx+1) bisa dilewati jika
+    ada satu baris halus di blok cy yang aman dari kolom tengah sel cx sampai kolom tengah sel cx+1.
+    Celah (pintu) sempit yang tidak sejajar grid kasar tetap tersambung, dinding tipis tetap menutup.
+    """
+    rows, cols = safe.shape
+    n = cols // f - 1
+    if n <= 0: return np.zeros((rows // f, 0), dtype=bool)
+    c0 = f // 2
+    runs = safe[:, c0:c0 + n * f].reshape(rows, n, f).all(axis=2) & safe[:, c0 + f::f][:, :n]
+    return runs.reshape(rows // f, f, n).any(axis=1)
+
+
+class PlanResult(object):
+    def __init__(self, path, length, expanded, elapsed, cached=False):
+        self.path = path            # [(x, y), ...] koordinat peta (meter), sudah disederhanakan
+        self.length = length        # panjang jalur (meter)
+        self.expanded = expanded    # jumlah node A* yang diekspansi
+        self.elapsed = elapsed      # detik
+        self.cached = cached
+
+
+class GridPlanner(object):
+    """
+    Planner grid 8-arah di atas grid kasar dari OccupancyMap, untuk preview jalur
+    (bukan pengganti move_base). Grid kasar (sudah terinflasi radius robot lewat mask 'safe')
+    dibuat sekali per peta; yang disimpan adalah sisi antar sel yang bisa dilewati (lihat _crossings),
+    bukan sel bebas/terhalang, agar konektivitas grid halus tetap terjaga. Selama robot diam, start-nya sama untuk setiap tap, jadi medan jarak
+    Dijkstra dari start di-cache: query berikutnya cukup menelusuri parent (< 1 ms).
+    Tanpa medan jarak, query dijawab A* (heuristik octile).
+    """
+    MAX_CELLS = 90000
+    FIELD_CACHE_SIZE = 4
+    CACHE_SIZE = 64
+
+    def __init__(self, occupancy, max_cells=MAX_CELLS):
+        self.occupancy = occupancy
+        h, w = occupancy.safe.shape
+        self.factor = max(1, int(math.ceil(math.sqrt(float(w * h) / max_cells))))
+        self.cell_size = occupancy.resolution * self.factor
+
+        # Sisi antar sel kasar dari lintasan aman di grid halus (bukan sampling / pooling per sel,
+        # yang bocor lewat dinding tipis atau menutup pintu yang tidak sejajar grid).
+        # Tepi peta yang tidak genap f di-pad sebagai terhalang.
+        f = self.factor
+        ch, cw = -(-h // f), -(-w // f)
+        safe = np.zeros((ch * f, cw * f), dtype=bool)
+        safe[:h, :w] = occupancy.safe
+        # Border 1 sel tanpa sisi terbuka agar pencarian tidak perlu cek batas
+        edges = np.zeros((ch + 2, cw + 2), dtype=np.uint8)
+        edges[1:-1, 1:cw] |= _crossings(safe, f).astype(np.uint8) * EAST
+        edges[1:ch, 1:-1] |= _crossings(safe.T, f).T.astype(np.uint8) * NORTH
+
+        # Sel yang punya minimal satu sisi terbuka (untuk snap start/goal)
+        passable = edges != 0
+        passable[:, 1:] |= (edges[:, :-1] & EAST) != 0
+        passable[1:, :] |= (edges[:-1, :] & NORTH) != 0
+        self.passable = passable
+        self.height, self.width = passable.shape
+        self._edges = bytearray(edges.ravel().tobytes())
+
+        w = self.width
+        # (langkah, biaya, [(offset sel asal sisi, bit sisi), ...] yang semuanya harus terbuka)
+        self._moves = [
+            (1, 1.0, ((0, EAST),)), (-1, 1.0, ((-1, EAST),)),
+            (w, 1.0, ((0, NORTH),)), (-w, 1.0, ((-w, NORTH),)),
+            # Diagonal hanya jika kedua jalur L-nya terbuka (tidak memotong sudut)
+            (w + 1, SQRT2, ((0, NORTH), (w, EAST), (0, EAST), (1, NORTH))),
+            (w - 1, SQRT2, ((0, NORTH), (w - 1, EAST), (-1, EAST), (-1, NORTH))),
+            (-w + 1, SQRT2, ((-w, NORTH), (-w, EAST), (0, EAST), (1 - w, NORTH))),
+            (-w - 1, SQRT2, ((-w, NORTH), (-w - 1, EAST), (-1, EAST), (-w - 1, NORTH))),
+        ]
+        self._cache = OrderedDict()
+        self._fields = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- Konversi koordinat ---
+    def world_to_cell(self, map_x, map_y):
+        ox, oy = self.occupancy.origin
+        cx = int(math.floor((map_x - ox) / self.cell_size)) + 1
+        cy = int(math.floor((map_y - oy) / self.cell_size)) + 1
+        return cx, cy
+
+    def cell_to_world(self, cx, cy):
+        ox, oy = self.occupancy.origin
+        f = self.factor
+        res = self.occupancy.resolution
+        return (ox + ((cx - 1) * f + f // 2 + 0.5) * res, oy + ((cy - 1) * f + f // 2 + 0.5) * res)
+
+    def _nearest_passable(self, cx, cy, radius=10):
+        x0, x1 = max(0, cx - radius), min(self.width, cx + radius + 1)
+        y0, y1 = max(0, cy - radius), min(self.height, cy + radius + 1)
+        if x0 >= x1 or y0 >= y1: return None
+        ys, xs = np.nonzero(self.passable[y0:y1, x0:x1])
+        if len(xs) == 0: return None
+        k = int(np.argmin((xs + x0 - cx) ** 2 + (ys + y0 - cy) ** 2))
+        return (ys[k] + y0) * self.width + (xs[k] + x0)
+
+    def _to_index(self, point):
+        return self._nearest_passable(*self.world_to_cell(*point))
+
+    # --- Medan jarak dari start (Dijkstra penuh) ---
+    def prepare(self, start, cancelled=None):
+        """Menghitung & meng-cache medan jarak dari start. Aman dipanggil berulang."""
+        s_idx = self._to_index(start)
+        if s_idx is None: return False
+        return self._field(s_idx, cancelled) is not None
+
+    def _field(self, s_idx, cancelled=None, store=True):
+        with self._lock:
+            field = self._fields.get(s_idx)
+        if field is not None: return field
+        field = self._dijkstra(s_idx, cancelled)
+        if field is None or not store: return field
+        with self._lock:
+            self._fields[s_idx] = field
+            while len(self._fields) > self.FIELD_CACHE_SIZE:
+                self._fields.popitem(last=False)
+        return field
+
+    def path_lengths(self, source, targets, cancelled=None):
+        """
+        Panjang jalur (meter) dari source ke setiap target dengan satu Dijkstra.
+        math.inf untuk target yang tidak terjangkau; None jika dibatalkan / source di luar peta.
+        """
+        s_idx = self._to_index(source)
+        if s_idx is None: return None
+        # Medan dari waypoint tidak disimpan agar tidak menggusur medan pose robot
+        field = self._field(s_idx, cancelled, store=False)
+        if field is None: return None
+        dist = field[0]
+        lengths = []
+        for target in targets:
+            t_idx = self._to_index(target)
+            lengths.append(math.inf if t_idx is None else dist[t_idx] * self.cell_size)
+        return lengths
+
+    def _dijkstra(self, source, cancelled=None):
+        edges = self._edges
+        moves = self._moves
+        dist = [math.inf] * len(edges)
+        parent = [-1] * len(edges)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        popped = 0
+        while heap:
+            d0, cur = heapq.heappop(heap)
+            if d0 > dist[cur]: continue
+            popped += 1
+            if cancelled and not popped & 0xFFF and cancelled():
+                return None
+            for step, cost, sides in moves:
+                for offset, bit in sides:
+                    if not edges[cur + offset] & bit: break
+                else:
+                    nxt = cur + step
+                    nd = d0 + cost
+                    if nd < dist[nxt]:
+                        dist[nxt] = nd
+                        parent[nxt] = cur
+                        heapq.heappush(heap, (nd, nxt))
+        return dist, parent
+
+    # --- Query ---
+    def plan(self, start, goal, cancelled=None):
+        """Jalur dari start ke goal (x, y meter). None jika tidak ada jalur / dibatalkan."""
+        t0 = time.monotonic()
+        s_idx, g_idx = self._to_index(start), self._to_index(goal)
+        if s_idx is None or g_idx is None: return None
+
+        key = (s_idx, g_idx)
+        with self._lock:
+            cached = self._cache.get(key, False)
+            field = self._fields.get(s_idx)
+        if cached is not False:
+            if cached is None: return None
+            return PlanResult(cached.path, cached.length, 0, time.monotonic() - t0, cached=True)
+
+        if field is not None:
+            dist, parent = field
+            if dist[g_idx] == math.inf:
+                result = None
+            else:
+                cells = [g_idx]
+                while cells[-1] != s_idx:
+                    cells.append(parent[cells[-1]])
+                cells.reverse()
+                result = (cells, dist[g_idx], 0)
+        else:
+            result = self._astar(s_idx, g_idx, cancelled)
+            if result is False: return None  # dibatalkan, jangan di-cache
+
+        if result is not None:
+            cells, cost, expanded = result
+            w = self.width
+            raw = [self.cell_to_world(i % w, i // w) for i in cells]
+            raw[0], raw[-1] = tuple(start), tuple(goal)
+            path = douglas_peucker(raw, self.cell_size * 0.5)
+            result = PlanResult(path, cost * self.cell_size, expanded, time.monotonic() - t0,
+                                cached=field is not None)
+
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
+
+    def _astar(self, start, goal, cancelled=None):
+        w = self.width
+        edges = self._edges
+        moves = self._moves
+        gx, gy = goal % w, goal // w
+
+        g_cost = {start: 0.0}
+        parent = {start: -1}
+        heap = [(0.0, 0.0, start)]
+        expanded = 0
+        while heap:
+            _, g0, cur = heapq.heappop(heap)
+            if cur == goal: break
+            if g0 > g_cost[cur]: continue
+            expanded += 1
+            if cancelled and not expanded & 0x3FF and cancelled():
+                return False
+            for step, cost, sides in moves:
+                for offset, bit in sides:
+                    if not edges[cur + offset] & bit: break
+                else:
+                    nxt = cur + step
+                    ng = g0 + cost
+                    if ng < g_cost.get(nxt, math.inf):
+                        g_cost[nxt] = ng
+                        parent[nxt] = cur
+                        dx = abs(nxt % w - gx)
+                        dy = abs(nxt // w - gy)
+                        # Heuristik octile
+                        heapq.heappush(heap, (ng + dx + dy + (SQRT2 - 2.0) * min(dx, dy), ng, nxt))
+        else:
+            return None
+
+        cells = [goal]
+        while cells[-1] != start:
+            cells.append(parent[cells[-1]])
+        cells.reverse()
+        return cells, g_cost[goal], expanded
+
+
+class PlannerWorker(object):
+    """
+    Thread planner tunggal: hanya permintaan terbaru yang dikerjakan, yang lama dibatalkan.
+    Saat idle, medan jarak dari start terakhir disiapkan agar tap berikutnya instan.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._request = None
+        self._generation = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, planner, start, goal, callback):
+        with self._cond:
+            self._generation += 1
+            self._request = (self._generation, planner, start, goal, callback)
+            self._cond.notify()
+
+    def prepare(self, planner, start):
+        self.submit(planner, start, None, None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._request is None:
+                    self._cond.wait()
+                generation, planner, start, goal, callback = self._request
+                self._request = None
+            cancelled = lambda: generation != self._generation
+            try:
+                if goal is not None:
+                    result = planner.plan(start, goal, cancelled=cancelled)
+                    if not cancelled():
+                        callback(result)
+                if not cancelled():
+                    planner.prepare(start, cancelled=cancelled)
+            except Exception as e:
+                print(f"ERROR: Planner gagal: {e}")
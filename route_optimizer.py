@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import itertools
+import json
+import math
+import os
+import threading
+
+from map_tools import CACHE_DIR
+
+EXACT_MAX_STOPS = 10
+
+
+def tour_length(dist, order, start=None):
+    """Panjang jalur terbuka melalui order (indeks matriks), opsional diawali node start."""
+    nodes = ([start] if start is not None else []) + list(order)
+    return sum(dist[a][b] for a, b in zip(nodes, nodes[1:]))
+
+
+def held_karp(dist, stops, start=None):
+    """Urutan optimal (eksak) jalur terbuka lewat semua stops. O(2^n * n^2), untuk n kecil."""
+    n = len(stops)
+    if n <= 1: return list(stops)
+    # best[(mask, j)] = (biaya, node sebelumnya) untuk mengunjungi mask dan berakhir di stops[j]
+    best = {}
+    for j in range(n):
+        best[(1 << j, j)] = (dist[start][stops[j]] if start is not None else 0.0, None)
+    for size in range(2, n + 1):
+        for subset in itertools.combinations(range(n), size):
+            mask = 0
+            for j in subset: mask |= 1 << j
+            for j in subset:
+                prev_mask = mask & ~(1 << j)
+                best[(mask, j)] = min(
+                    (best[(prev_mask, k)][0] + dist[stops[k]][stops[j]], k)
+                    for k in subset if k != j)
+
+    full = (1 << n) - 1
+    j = min(range(n), key=lambda k: best[(full, k)][0])
+    order, mask = [], full
+    while j is not None:
+        order.append(stops[j])
+        mask, j = mask & ~(1 << j), best[(mask, j)][1]
+    order.reverse()
+    return order
+
+
+def nearest_neighbor_2opt(dist, stops, start=None, max_rounds=50):
+    """Heuristik untuk n besar: nearest neighbour lalu perbaikan 2-opt sampai tidak ada yang lebih pendek."""
+    remaining = list(stops)
+    if start is not None:
+        current = start
+    else:
+        current = remaining.pop(0)
+    order = [] if start is not None else [current]
+    while remaining:
+        nxt = min(remaining, key=lambda k: dist[current][k])
+        remaining.remove(nxt)
+        order.append(nxt)
+        current = nxt
+
+    def edge(a, b):
+        return 0.0 if a is None else dist[a][b]
+
+    for _ in range(max_rounds):
+        improved = False
+        for i in range(len(order) - 1):
+            a = order[i - 1] if i > 0 else start
+            for j in range(i + 1, len(order)):
+                b, c = order[i], order[j]
+                d = order[j + 1] if j + 1 < len(order) else None
+                # Jalur terbuka: ujung akhir tidak punya sisi keluar
+                before = edge(a, b) + (dist[c][d] if d is not None else 0.0)
+                after = edge(a, c) + (dist[b][d] if d is not None else 0.0)
+                if after < before - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+        if not improved: break
+    return order
+
+
+def solve_visit_order(dist, stops, start=None):
+    """Urutan kunjungan terpendek untuk stops (indeks matriks dist); start = indeks posisi awal."""
+    if len(stops) <= EXACT_MAX_STOPS:
+        return held_karp(dist, stops, start)
+    return nearest_neighbor_2opt(dist, stops, start)
+
+
+class RouteOptimizer(object):
+    """
+    Mengurutkan waypoint agar total jarak tempuh terpendek, memakai panjang jalur di grid
+    (GridPlanner), bukan jarak garis lurus. Matriks jarak antar waypoint di-cache per peta
+    (kunci: path gambar + mtime) di memori dan di CACHE_DIR, jadi hanya dihitung sekali.
+    """
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    # --- Cache matriks ---
+    def _cache_path(self, map_key):
+        digest = hashlib.sha1(repr(map_key).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"route_matrix_{digest}.json")
+
+    @staticmethod
+    def _wp_key(wp):
+        return f"{wp.name}@{wp.x:.3f},{wp.y:.3f}"
+
+    def _load(self, map_key):
+        with self._lock:
+            pairs = self._memory.get(map_key)
+            if pairs is not None: return pairs
+        pairs = {}
+        try:
+            with open(self._cache_path(map_key), 'r') as f:
+                data = json.load(f)
+            if data.get('map_key') == repr(map_key):
+                pairs = data.get('pairs', {})
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            return self._memory.setdefault(map_key, pairs)
+
+    def _save(self, map_key, pairs):
+        path = self._cache_path(map_key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'map_key': repr(map_key), 'pairs': pairs}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"WARNING: Cache matriks rute tidak tersimpan: {e}")
+
+    def distance_matrix(self, planner, map_key, waypoints, cancelled=None):
+        """Matriks jarak jalur (meter) antar waypoint; baris yang belum ada di cache dihitung."""
+        pairs = self._load(map_key)
+        keys = [self._wp_key(wp) for wp in waypoints]
+        points = [(wp.x, wp.y) for wp in waypoints]
+        changed = False
+        for i, key in enumerate(keys):
+            if all(f"{key}|{other}" in pairs for other in keys): continue
+            lengths = planner.path_lengths(points[i], points, cancelled)
+            if lengths is None: return None
+            with self._lock:
+                for other, length in zip(keys, lengths):
+                    pairs[f"{key}|{other}"] = length if math.isfinite(length) else None
+            changed = True
+        if changed:
+            self._save(map_key, dict(pairs))
+
+        inf = math.inf
+        return [[inf if pairs[f"{a}|{b}"] is None else pairs[f"{a}|{b}"] for b in keys] for a in keys]
+
+    def optimize(self, planner, map_key, waypoints, start=None, cancelled=None):
+        """
+        Mengembalikan (waypoint terurut, total panjang meter, waypoint tak terjangkau) atau None jika
+        dibatalkan. start (x, y) opsional: posisi robot, tidak di-cache karena selalu berubah.
+        Jika ada waypoint yang tak terjangkau, urutan asli dipertahankan dan panjangnya math.inf.
+        """
+        waypoints = list(waypoints)
+        if len(waypoints) <= 1:
+            return waypoints, 0.0, []
+        matrix = self.distance_matrix(planner, map_key, waypoints, cancelled)
+        if matrix is None: return None
+
+        stops = list(range(len(waypoints)))
+        start_index = None
+        if start is not None:
+            row = planner.path_lengths(start, [(wp.x, wp.y) for wp in waypoints], cancelled)
+            if row is None: return None
+            start_index = len(waypoints)
+            matrix = [r + [math.inf] for r in matrix] + [row + [0.0]]
+
+        order = solve_visit_order(matrix, stops, start_index)
+        length = tour_length(matrix, order, start_index)
+        if not math.isfinite(length):
+            # Sisi grid planner simetris: cukup cek jangkauan dari titik acuan (pose robot / waypoint pertama)
+            reference = start_index if start_index is not None else 0
+            unreachable = [waypoints[i] for i in stops if not math.isfinite(matrix[reference][i])]
+            return waypoints, math.inf, unreachable
+        return [waypoints[i] for i in order], length, []
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import signal
+import subprocess
+import threading
+import time
+
+# Status proses launch
+STOPPED = 'stopped'
+RUNNING = 'running'
+STOPPING = 'stopping'
+CRASHED = 'crashed'
+RESTARTING = 'restarting'
+FAILED = 'failed'
+STARTING = 'starting'     # start() diminta saat teardown sebelumnya masih berjalan
+
+
+class LaunchProcess(object):
+    """
+    Satu proses roslaunch (satu process group) dengan state machine:
+    stopped -> running -> stopping -> stopped
+    starting -> running                           (setelah teardown launch lama selesai)
+    running -> crashed -> restarting -> running   (jika restart diizinkan)
+    crashed -> failed                             (restart habis / tidak diizinkan)
+
+    Sinyal selalu dikirim ke process group (pgid dicatat saat spawn), bukan hanya ke roslaunch:
+    node anak yang tersisa setelah roslaunch mati tetap ikut dibersihkan.
+    """
+    def __init__(self, name, command, restart=False, max_restarts=3, backoff=1.0, max_backoff=10.0, quiet=True):
+        self.name = name
+        self.command = command
+        self.restart = restart
+        self.max_restarts = max_restarts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.quiet = quiet
+        self.state = STOPPED
+        self.process = None
+        self.pgid = None
+        self.restarts = 0
+        self.exit_code = None
+        self.started_at = None
+        self.restart_at = None
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def spawn(self):
+        output = subprocess.DEVNULL if self.quiet else None
+        self.process = subprocess.Popen(self.command, shell=True, preexec_fn=os.setsid,
+                                        stdout=output, stderr=output)
+        # setsid: proses menjadi leader group baru, jadi pgid == pid
+        self.pgid = self.process.pid
+        self.state = RUNNING
+        self.exit_code = None
+        self.started_at = time.monotonic()
+
+    def signal(self, sig):
+        """Mengirim sig ke seluruh process group (juga setelah leader-nya mati & di-reap)."""
+        if self.pgid is None: return
+        try:
+            os.killpg(self.pgid, sig)
+        except ProcessLookupError:
+            pass
+        except OSError as e:
+            print(f"WARNING: [{self.name}] sinyal {sig} gagal: {e}")
+
+    def group_alive(self):
+        """True selama masih ada proses di process group (leader yang sudah keluar di-reap dulu)."""
+        if self.pgid is None: return False
+        if self.process is not None:
+            self.process.poll()
+        try:
+            os.killpg(self.pgid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def next_backoff(self):
+        return min(self.max_backoff, self.backoff * (2 ** self.restarts))
+
+
+class ProcessSupervisor(object):
+    """
+    Mengelola semua proses launch: deteksi crash lewat poll() berkala, restart dengan
+    backoff eksponensial, dan teardown paralel dengan satu deadline bersama
+    (SIGINT -> SIGTERM -> SIGKILL ke seluruh process group, jadi tidak ada node yatim).
+
+    on_event(name, state, launch) dipanggil dari thread monitor setiap status berubah
+    karena crash / restart.
+    """
+    POLL_INTERVAL = 0.5
+    STOP_TIMEOUT = 2.0
+    TERM_FRACTION = 0.6   # SIGTERM dikirim setelah 60% deadline, SIGKILL di akhir deadline
+    STABLE_AFTER = 30.0   # hitungan restart di-reset jika proses hidup selama ini
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.launches = {}
+        self._lock = threading.RLock()
+        self._teardowns = {}
+        self._wake = threading.Event()
+        self._running = True
+        threading.Thread(target=self._monitor_loop, daemon=True).start()
+
+    # --- Query ---
+    def state(self, name):
+        launch = self.launches.get(name)
+        return launch.state if launch else STOPPED
+
+    def is_running(self, name):
+        """True jika proses diinginkan hidup (running / sedang di-restart / menunggu teardown)."""
+        return self.state(name) in (RUNNING, CRASHED, RESTARTING, STARTING)
+
+    # --- Start / stop ---
+    def start(self, name, command, **options):
+        """
+        Menjalankan launch. Jika teardown launch lama dengan nama sama masih berjalan, start tidak
+        menunggu (pemanggilnya thread UI): launch baru berstatus starting dan di-spawn oleh thread
+        teardown begitu process group lama habis.
+        """
+        with self._lock:
+            launch = self.launches.get(name)
+            if launch and launch.state in (RUNNING, RESTARTING, CRASHED, STARTING):
+                return False
+            launch = LaunchProcess(name, command, **options)
+            self.launches[name] = launch
+            if name in self._teardowns:
+                launch.state = STARTING
+                print(f"INFO: [{name}] dimulai setelah teardown sebelumnya selesai.")
+                return True
+            launch.spawn()
+        print(f"INFO: [{name}] dimulai (pid {launch.process.pid}).")
+        return True
+
+    def _spawn_deferred(self, launch):
+        with self._lock:
+            if self.launches.get(launch.name) is not launch or launch.state != STARTING: return
+            try:
+                launch.spawn()
+            except Exception as e:
+                print(f"ERROR: [{launch.name}] gagal dimulai: {e}")
+                launch.state = FAILED
+        if launch.state == FAILED:
+            if self.on_event:
+                self.on_event(launch.name, FAILED, launch)
+            return
+        print(f"INFO: [{launch.name}] dimulai (pid {launch.process.pid}).")
+
+    def set_command(self, name, command):
+        """Mengganti command untuk restart berikutnya (proses yang sedang jalan tidak disentuh)."""
+        launch = self.launches.get(name)
+        if launch:
+            launch.command = command
+
+    def stop(self, names, timeout=STOP_TIMEOUT, wait=True):
+        """
+        Mematikan beberapa launch sekaligus dengan satu deadline bersama.
+        wait=False: teardown berjalan di thread latar (start() berikutnya menunggu teardown ini).
+        """
+        if isinstance(names, str):
+            names = [names]
+        with self._lock:
+            launches = []
+            for name in names:
+                launch = self.launches.get(name)
+                if launch is None or launch.state in (STOPPED, STOPPING): continue
+                if launch.state == STARTING:
+                    # Belum pernah di-spawn: cukup dibatalkan
+                    launch.state = STOPPED
+                    continue
+                launch.state = STOPPING
+                launch.restart_at = None
+                launches.append(launch)
+            if not launches: return True
+            thread = None
+            if not wait:
+                thread = threading.Thread(target=self._teardown, args=(launches, timeout), daemon=True)
+                for launch in launches:
+                    self._teardowns[launch.name] = thread
+        if thread is None:
+            return self._teardown(launches, timeout)
+        thread.start()
+        return True
+
+    def wait_stopped(self, names, timeout=STOP_TIMEOUT):
+        """
+        Menunggu teardown latar (stop(wait=False)) untuk names selesai, maksimal timeout detik.
+        True jika tidak ada lagi teardown yang berjalan untuk names.
+        """
+        if isinstance(names, str):
+            names = [names]
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            threads = {self._teardowns[name] for name in names if name in self._teardowns}
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in threads)
+
+    def stop_all(self, timeout=STOP_TIMEOUT, exclude=()):
+        return self.stop([name for name in list(self.launches) if name not in exclude], timeout)
+
+    def _teardown(self, launches, timeout):
+        start = time.monotonic()
+        deadline = start + timeout
+        term_at = start + timeout * self.TERM_FRACTION
+        # roslaunch mematikan node-nya dengan rapi saat menerima SIGINT
+        for launch in launches:
+            launch.signal(signal.SIGINT)
+
+        # Ditunggu sampai seluruh process group habis, bukan hanya roslaunch (leader)
+        pending = [launch for launch in launches if launch.group_alive()]
+        escalated = False
+        while pending:
+            now = time.monotonic()
+            if now >= deadline: break
+            if not escalated and now >= term_at:
+                for launch in pending:
+                    launch.signal(signal.SIGTERM)
+                escalated = True
+            time.sleep(0.02)
+            pending = [launch for launch in pending if launch.group_alive()]
+
+        for launch in pending:
+            print(f"WARNING: [{launch.name}] tidak berhenti dalam {timeout:.1f} detik, SIGKILL.")
+            launch.signal(signal.SIGKILL)
+        for launch in launches:
+            if launch.process is not None:
+                try:
+                    launch.process.wait(timeout=0.2)
+                except subprocess.TimeoutExpired:
+                    pass
+            launch.state = STOPPED
+            launch.exit_code = launch.process.poll() if launch.process else None
+
+        deferred = []
+        with self._lock:
+            for launch in launches:
+                if self._teardowns.get(launch.name) is not threading.current_thread(): continue
+                del self._teardowns[launch.name]
+                successor = self.launches.get(launch.name)
+                if successor is not launch and successor is not None and successor.state == STARTING:
+                    deferred.append(successor)
+        print(f"INFO: {', '.join(l.name for l in launches)} berhenti ({time.monotonic() - start:.2f} detik).")
+        for successor in deferred:
+            self._spawn_deferred(successor)
+        return not pending
+
+    def shutdown(self, timeout=STOP_TIMEOUT):
+        self._running = False
+        self._wake.set()
+        with self._lock:
+            threads = set(self._teardowns.values())
+        for thread in threads:
+            thread.join(timeout)
+        return self.stop_all(timeout)
+
+    # --- Monitor crash & restart ---
+    def _monitor_loop(self):
+        while self._running:
+            self._wake.wait(self.POLL_INTERVAL)
+            self._wake.clear()
+            if not self._running: break
+            events = []
+            with self._lock:
+                now = time.monotonic()
+                for launch in self.launches.values():
+                    event = self._check(launch, now)
+                    if event: events.append((launch, event))
+            for launch, event in events:
+                if self.on_event:
+                    try:
+                        self.on_event(launch.name, event, launch)
+                    except Exception as e:
+                        print(f"ERROR: Callback supervisor gagal: {e}")
+
+    def _check(self, launch, now):
+        if launch.state == RUNNING:
+            if launch.alive:
+                if launch.restarts and now - launch.started_at > self.STABLE_AFTER:
+                    launch.restarts = 0
+                return None
+            launch.exit_code = launch.process.returncode
+            launch.state = CRASHED
+            print(f"WARNING: [{launch.name}] berhenti tak terduga (exit {launch.exit_code}).")
+            # Sisa node di process group dibersihkan sebelum restart / menyerah
+            launch.signal(signal.SIGKILL)
+            if launch.restart and launch.restarts < launch.max_restarts:
+                delay = launch.next_backoff()
+                launch.restarts += 1
+                launch.restart_at = now + delay
+                launch.state = RESTARTING
+                print(f"INFO: [{launch.name}] restart ke-{launch.restarts} dalam {delay:.1f} detik.")
+                return RESTARTING
+            launch.state = FAILED
+            return FAILED
+
+        if launch.state == RESTARTING and launch.restart_at is not None and now >= launch.restart_at:
+            launch.restart_at = None
+            try:
+                launch.spawn()
+            except Exception as e:
+                print(f"ERROR: [{launch.name}] gagal restart: {e}")
+                launch.state = FAILED
+                return FAILED
+            return RUNNING
+        return None
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pytest
+
+from checkpoint import MapCheckpointer
+
+
+@pytest.mark.parametrize('name', ['', '..', '.hidden', '../maps', 'a/b', os.sep + 'tmp'])
+def test_unsafe_map_names_are_rejected(tmp_path, name):
+    checkpointer = MapCheckpointer(str(tmp_path / 'checkpoints'))
+    with pytest.raises(ValueError):
+        checkpointer.session_dir(name)
+
+
+def test_discard_never_leaves_root_dir(tmp_path):
+    victim = tmp_path / 'maps'
+    victim.mkdir()
+    (victim / 'keep.pgm').write_bytes(b'P5')
+    root = tmp_path / 'checkpoints'
+    root.mkdir()
+    os.symlink(victim, root / 'lab')
+
+    checkpointer = MapCheckpointer(str(root))
+    checkpointer.discard('..')
+    checkpointer.discard('lab')
+    assert (victim / 'keep.pgm').exists()
+    assert root.exists()
+
+
+def test_checkpoint_then_discard(tmp_path):
+    checkpointer = MapCheckpointer(str(tmp_path / 'checkpoints'))
+    grid = np.zeros((20, 30), dtype=np.int8)
+    assert checkpointer.maybe_checkpoint('lab', grid, 0.05, (0.0, 0.0, 0.0), force=True)
+    assert [s['map_name'] for s in checkpointer.pending()] == ['lab']
+    checkpointer.discard('lab')
+    assert checkpointer.pending() == []
@@ -0,0 +1,32 @@
+import numpy as np
+
+from map_tools import COSTMAP_LUT, LiveMapImage
+
+
+def test_full_image_is_split_into_tile_strips():
+    image = LiveMapImage(COSTMAP_LUT)
+    image.set_grid(np.zeros((150, 100), dtype=np.int8), 0.05, (0.0, 0.0, 0.0))
+    (w, h), resized, rects = image.take_changes()
+    assert resized and (w, h) == (100, 150)
+    assert [(y, rh) for _, y, _, rh, _ in rects] == [(0, 64), (64, 64), (128, 22)]
+    assert all(len(data) == 100 * rh * 4 for _, _, _, rh, data in rects)
+
+
+def test_origin_only_change_is_placement_update():
+    image = LiveMapImage(COSTMAP_LUT)
+    grid = np.zeros((100, 100), dtype=np.int8)
+    image.set_grid(grid, 0.05, (0.0, 0.0, 0.0))
+    image.take_changes()
+
+    # Jendela bergulir: isi bergeser satu blok, origin ikut bergeser
+    shifted = grid.copy()
+    shifted[:, :10] = 100
+    image.set_grid(shifted, 0.05, (0.5, 0.0, 0.0))
+    size, resized, rects = image.take_changes()
+    assert not resized
+    assert [(x, y) for x, y, _, _, _ in rects] == [(0, 0), (0, 64)]
+    assert image.placement() == (0.05, (0.5, 0.0, 0.0))
+
+    image.set_grid(shifted, 0.05, (1.0, 0.0, 0.0))
+    assert image.take_changes() == ((100, 100), False, [])
+    assert image.take_changes() is None
@@ -0,0 +1,93 @@
+import os
+import threading
+
+import numpy as np
+
+import map_bundle
+from map_bundle import MapBundle, MapBundleStore, build_bundle
+from map_tools import MapCatalog, OccupancyMap, load_pgm, save_map
+
+
+def make_map(maps_dir, name='lab', shape=(60, 80)):
+    pixels = np.full(shape, 254, dtype=np.uint8)
+    pixels[10:50, 30] = 0       # dinding
+    pixels[:5, :] = 205         # unknown
+    save_map(os.path.join(maps_dir, name), pixels, 0.05, (-1.0, -2.0, 0.0))
+    catalog = MapCatalog(str(maps_dir))
+    catalog.refresh(force=True)
+    return catalog.get(name)
+
+
+def test_bundle_round_trip_matches_pgm_analysis(tmp_path):
+    entry = make_map(tmp_path)
+    path = build_bundle(str(tmp_path / 'bundles' / 'lab.mapb'), entry)
+    bundle = MapBundle(path)
+
+    pixels = load_pgm(entry['image_path'])
+    expected = OccupancyMap(pixels, entry['metadata'])
+    loaded = bundle.occupancy_map()
+    assert np.array_equal(bundle.display, pixels)
+    assert np.array_equal(loaded.free, expected.free)
+    assert np.array_equal(loaded.occupied, expected.occupied)
+    # distance disimpan dengan kuantisasi 1/DISTANCE_SCALE sel
+    tolerance = expected.resolution / map_bundle.DISTANCE_SCALE
+    assert np.abs(loaded.distance - expected.distance).max() <= tolerance
+    assert loaded.origin == expected.origin
+    assert bundle.is_current(entry, 1.0, 0.25)
+    assert not bundle.is_current(entry, 2.0, 0.25)
+    assert not bundle.is_current(entry, 1.0, 0.3)
+    assert bundle.section('display').dtype == np.uint8
+
+
+def test_bundle_is_smaller_than_pgm(tmp_path):
+    entry = make_map(tmp_path, shape=(1000, 1000))
+    path = build_bundle(str(tmp_path / 'lab.mapb'), entry)
+    assert os.path.getsize(path) < os.path.getsize(entry['image_path'])
+
+
+def test_store_rebuilds_for_other_robot_radius(tmp_path):
+    entry = make_map(tmp_path)
+    bundle_dir = str(tmp_path / 'bundles')
+    MapBundleStore(bundle_dir, robot_radius=0.25).load(entry)
+    store = MapBundleStore(bundle_dir, robot_radius=0.4)
+    assert store.load(entry, build=False) is None
+    bundle = store.load(entry)
+    assert bundle.index['robot_radius'] == 0.4
+    assert bundle.occupancy_map().robot_radius == 0.4
+
+
+def test_store_rebuilds_when_source_changes(tmp_path):
+    entry = make_map(tmp_path)
+    store = MapBundleStore(str(tmp_path / 'bundles'))
+    assert store.load(entry, build=False) is None
+    bundle = store.load(entry)
+    assert store.load(entry, build=False) is bundle
+
+    stat = os.stat(entry['image_path'])
+    os.utime(entry['image_path'], (stat.st_atime, stat.st_mtime + 10))
+    assert store.load(entry, build=False) is None
+    assert store.load(entry) is not bundle
+
+
+def test_store_does_not_block_while_building(tmp_path, monkeypatch):
+    entry = make_map(tmp_path)
+    store = MapBundleStore(str(tmp_path / 'bundles'))
+    started, release = threading.Event(), threading.Event()
+    original = map_bundle.build_bundle
+
+    def slow_build(*args):
+        started.set()
+        release.wait(5)
+        return original(*args)
+
+    monkeypatch.setattr(map_bundle, 'build_bundle', slow_build)
+    builder = threading.Thread(target=store.load, args=(entry,))
+    builder.start()
+    try:
+        assert started.wait(5)
+        # Lock tidak dipegang selama build: build=False langsung kembali
+        assert store.load(entry, build=False) is None
+    finally:
+        release.set()
+        builder.join(5)
+    assert store.load(entry, build=False) is not None
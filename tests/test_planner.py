@@ -0,0 +1,48 @@
+import math
+
+import numpy as np
+import pytest
+
+from map_tools import OccupancyMap
+from planner import GridPlanner
+
+METADATA = {'resolution': 0.05, 'origin': [0.0, 0.0, 0.0]}
+
+
+def make_occupancy(shape, walls=()):
+    """Peta bebas semua kecuali kolom-kolom (x0, x1) yang dijadikan dinding (distance 0)."""
+    distance = np.ones(shape, dtype=np.float32)
+    for x0, x1 in walls:
+        distance[:, x0:x1] = 0.0
+    free = distance > 0
+    return OccupancyMap.from_fields(METADATA, free, ~free, distance, robot_radius=0.25)
+
+
+def test_plan_finds_straight_path():
+    planner = GridPlanner(make_occupancy((400, 400)))
+    result = planner.plan((2.0, 10.0), (18.0, 10.0))
+    assert result is not None
+    assert abs(result.length - 16.0) < 2 * planner.cell_size
+
+
+def test_thin_wall_on_large_map_is_not_crossed():
+    # 4000x4000 px @ 0.05 m -> faktor 14. Dinding 10 px (2 px + inflasi) di antara dua
+    # kolom tengah blok (1001 dan 1015) dulu lolos karena grid kasar hanya mencuplik satu sel.
+    planner = GridPlanner(make_occupancy((4000, 4000), walls=[(1002, 1012)]))
+    assert planner.factor == 14
+    assert planner.plan((25.0, 100.0), (150.0, 100.0)) is None
+    assert planner.path_lengths((25.0, 100.0), [(150.0, 100.0)]) == [float('inf')]
+
+
+@pytest.mark.parametrize('offset', range(0, 14, 2))
+def test_off_grid_doorway_on_large_map_is_found(offset):
+    # Dinding tebal dengan pintu 16 px aman (0.8 m) di posisi yang tidak sejajar grid kasar (faktor 14)
+    occupancy = make_occupancy((4000, 4000), walls=[(2000, 2030)])
+    y0 = 1400 + offset
+    occupancy.safe[y0:y0 + 16, 2000:2030] = True
+    planner = GridPlanner(occupancy)
+    assert planner.factor == 14
+    result = planner.plan((75.0, 40.0), (125.0, 40.0))
+    assert result is not None
+    # Lewat pintu (y ~ 70 m), bukan menembus dinding di y = 40 m
+    assert result.length > 2 * math.hypot(25.0, 30.0) - 2 * planner.cell_size
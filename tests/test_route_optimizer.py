@@ -0,0 +1,81 @@
+import itertools
+import math
+import random
+from collections import namedtuple
+
+import pytest
+
+from route_optimizer import RouteOptimizer, held_karp, nearest_neighbor_2opt, tour_length
+
+Waypoint = namedtuple('Waypoint', 'name x y')
+
+
+def random_matrix(n, seed):
+    rng = random.Random(seed)
+    points = [(rng.uniform(0, 50), rng.uniform(0, 50)) for _ in range(n)]
+    # Asimetris sedikit, seperti panjang jalur grid yang tidak selalu simetris
+    return [[0.0 if a == b else math.dist(pa, pb) * rng.uniform(1.0, 1.3)
+             for b, pb in enumerate(points)] for a, pa in enumerate(points)]
+
+
+def brute_force(dist, stops, start=None):
+    return min(tour_length(dist, order, start) for order in itertools.permutations(stops))
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('with_start', [False, True])
+def test_held_karp_matches_brute_force(seed, with_start):
+    n = 7
+    dist = random_matrix(n + 1, seed)
+    stops = list(range(n))
+    start = n if with_start else None
+    order = held_karp(dist, stops, start)
+    assert sorted(order) == stops
+    assert tour_length(dist, order, start) == pytest.approx(brute_force(dist, stops, start))
+
+
+def test_two_opt_visits_every_stop_once():
+    dist = random_matrix(15, seed=42)
+    order = nearest_neighbor_2opt(dist, list(range(14)), start=14)
+    assert sorted(order) == list(range(14))
+
+
+class LinePlanner(object):
+    """Planner palsu: panjang jalur = jarak lurus, mencatat jumlah panggilan."""
+    def __init__(self):
+        self.calls = 0
+
+    def path_lengths(self, source, targets, cancelled=None):
+        self.calls += 1
+        return [math.dist(source, target) for target in targets]
+
+
+def test_optimize_orders_and_caches_matrix(tmp_path):
+    waypoints = [Waypoint('c', 3.0, 0.0), Waypoint('a', 1.0, 0.0), Waypoint('b', 2.0, 0.0)]
+    planner = LinePlanner()
+    ordered, length, unreachable = RouteOptimizer(str(tmp_path)).optimize(planner, 'map', waypoints, start=(0.0, 0.0))
+    assert [wp.name for wp in ordered] == ['a', 'b', 'c']
+    assert length == pytest.approx(3.0)
+    assert unreachable == []
+
+    # Instance baru membaca matriks dari disk: hanya baris start yang dihitung ulang
+    planner = LinePlanner()
+    RouteOptimizer(str(tmp_path)).optimize(planner, 'map', waypoints, start=(0.0, 0.0))
+    assert planner.calls == 1
+
+
+class IslandPlanner(LinePlanner):
+    """Titik dengan x > 10 berada di pulau terpisah: tidak ada jalur dari / ke sana."""
+    def path_lengths(self, source, targets, cancelled=None):
+        lengths = super(IslandPlanner, self).path_lengths(source, targets, cancelled)
+        return [d if (source[0] > 10) == (t[0] > 10) else math.inf for d, t in zip(lengths, targets)]
+
+
+@pytest.mark.parametrize('start', [None, (0.0, 0.0)])
+def test_disconnected_stop_keeps_original_order(tmp_path, start):
+    waypoints = [Waypoint('a', 2.0, 0.0), Waypoint('x', 20.0, 0.0), Waypoint('b', 1.0, 0.0)]
+    ordered, length, unreachable = RouteOptimizer(str(tmp_path)).optimize(
+        IslandPlanner(), 'map', waypoints, start=start)
+    assert ordered == waypoints
+    assert length == math.inf
+    assert [wp.name for wp in unreachable] == ['x']
@@ -0,0 +1,88 @@
+import os
+import time
+
+from supervisor import FAILED, RUNNING, STARTING, STOPPED, ProcessSupervisor
+
+
+def group_gone(pgid, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.killpg(pgid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def wait_state(supervisor, name, state, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if supervisor.state(name) == state:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_crash_kills_leftover_children_in_group():
+    supervisor = ProcessSupervisor()
+    try:
+        # Leader keluar, anak 'sleep' tertinggal di process group yang sama
+        supervisor.start('node', 'sleep 30 & exit 3')
+        pgid = supervisor.launches['node'].pgid
+        assert wait_state(supervisor, 'node', FAILED)
+        assert group_gone(pgid)
+    finally:
+        supervisor.shutdown(1.0)
+
+
+def test_teardown_escalates_until_group_is_empty():
+    supervisor = ProcessSupervisor()
+    try:
+        # Anak mengabaikan SIGINT & SIGTERM: hanya SIGKILL di akhir deadline yang menghentikannya
+        supervisor.start('node', "(trap '' INT TERM; sleep 30) & wait")
+        pgid = supervisor.launches['node'].pgid
+        time.sleep(0.2)
+        assert supervisor.stop('node', timeout=1.0) is False
+        assert supervisor.state('node') == STOPPED
+        assert group_gone(pgid)
+    finally:
+        supervisor.shutdown(1.0)
+
+
+def test_start_does_not_wait_for_pending_teardown():
+    supervisor = ProcessSupervisor()
+    try:
+        supervisor.start('node', "(trap '' INT TERM; sleep 30) & wait")
+        old_pgid = supervisor.launches['node'].pgid
+        time.sleep(0.2)
+        supervisor.stop('node', timeout=1.0, wait=False)
+
+        started = time.monotonic()
+        assert supervisor.start('node', 'sleep 30')
+        assert time.monotonic() - started < 0.2
+        assert supervisor.state('node') == STARTING
+        assert supervisor.is_running('node')
+
+        assert wait_state(supervisor, 'node', RUNNING)
+        assert group_gone(old_pgid)
+        assert supervisor.launches['node'].pgid != old_pgid
+    finally:
+        supervisor.shutdown(1.0)
+
+
+def test_wait_stopped_blocks_until_async_teardown_finishes():
+    supervisor = ProcessSupervisor()
+    try:
+        supervisor.start('nav', "(trap '' INT; sleep 30) & wait")
+        time.sleep(0.3)
+        pgid = supervisor.launches['nav'].pgid
+        # stop() kedua untuk launch yang sudah STOPPING langsung kembali tanpa menunggu
+        supervisor.stop('nav', timeout=1.0, wait=False)
+        assert supervisor.stop('nav', timeout=1.0) is True
+        assert supervisor.state('nav') == 'stopping'
+        assert supervisor.wait_stopped(['nav'], timeout=3.0)
+        assert supervisor.state('nav') == STOPPED
+        assert group_gone(pgid)
+    finally:
+        supervisor.shutdown(1.0)